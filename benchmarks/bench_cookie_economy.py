@@ -0,0 +1,238 @@
+"""
+Stress test da economia de cookies: muitos usuários simultâneos rodando os
+fluxos que movem cookies (*slots, *duel, *transfer, *ticket/*sorteio, *tarot,
+imposto imperial do Comment e tags [[COOKIE:GIVE/TAKE]] da IA), além do +1 por
+mensagem e das leituras de saldo/leaderboard.
+
+Os fluxos chamam o `CookieSystem` do mesmo jeito que main.py e as features
+(slots.py, tarot.py, comment.py) chamam, sem Twitch nem Gemini no caminho.
+No fim mede ops/s e latência (p50/p99) por fluxo e confere os invariantes:
+
+- soma de todos os saldos (com a conta de emissão) == 0;
+- o saldo de cada conta bate com os lançamentos do ledger;
+- o pote do sorteio pago nunca passa do que foi arrecadado em tickets.
+
+Uso: python benchmarks/bench_cookie_economy.py --users 2000 --ops 20000 --threads 16
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from glorpinia_bot.features.cookie_system import CookieSystem
+from glorpinia_bot.storage import close_store
+
+BOT_NICK = "glorpinia"
+TICKET_PRICE = 100
+TAROT_COST = 20
+SLOTS_PAYOUT_CHANCE = 0.2
+
+# Peso de cada fluxo no tráfego simulado (o chat domina, como na live).
+FLOW_WEIGHTS = {
+    "chat": 50,
+    "balance": 10,
+    "leaderboard": 2,
+    "slots": 8,
+    "duel": 6,
+    "transfer": 6,
+    "ticket": 3,
+    "raffle": 1,
+    "tarot": 5,
+    "imperial_tax": 3,
+    "ai_tag": 5,
+}
+
+
+class EconomySimulation:
+    def __init__(self, cookies, users, seed):
+        self.cookies = cookies
+        self.users = users
+        self.seed = seed
+        self.raffle_lock = threading.Lock()
+        self.raffle_tickets = []
+        self.tickets_sold = 0
+        self.raffle_paid = 0
+        self.rejected = defaultdict(int)
+
+    # --- Fluxos (espelham os chamadores reais) ---
+
+    def chat(self, rng):
+        self.cookies.handle_interaction(rng.choice(self.users))
+
+    def balance(self, rng):
+        self.cookies.get_cookies(rng.choice(self.users))
+
+    def leaderboard(self, rng):
+        if rng.random() < 0.5:
+            self.cookies.get_leaderboard(5)
+        else:
+            self.cookies.get_debt_leaderboard(5)
+
+    def slots(self, rng):
+        user = rng.choice(self.users)
+        bet = rng.randint(10, 200)
+        if not self.cookies.remove_cookies(user, bet, require_funds=True):
+            self.rejected["slots"] += 1
+            return
+        if rng.random() < SLOTS_PAYOUT_CHANCE:
+            self.cookies.add_cookies(user, bet * rng.choice((5, 10, 20, 50)))
+
+    def duel(self, rng):
+        author, target = rng.sample(self.users, 2)
+        bet = rng.randint(1, 100)
+        winner, loser = (author, target) if rng.random() < 0.5 else (target, author)
+        if not self.cookies.transfer_cookies(loser, winner, bet, require_funds=True):
+            self.rejected["duel"] += 1
+
+    def transfer(self, rng):
+        author, target = rng.sample(self.users, 2)
+        if not self.cookies.transfer_cookies(author, target, rng.randint(1, 50), require_funds=True):
+            self.rejected["transfer"] += 1
+
+    def ticket(self, rng):
+        user = rng.choice(self.users)
+        with self.raffle_lock:
+            if user in self.raffle_tickets:
+                return
+            self.raffle_tickets.append(user)
+            self.tickets_sold += 1
+        # *ticket aceita "empréstimo": o saldo pode ficar negativo.
+        self.cookies.remove_cookies(user, TICKET_PRICE)
+
+    def raffle(self, rng):
+        with self.raffle_lock:
+            if not self.raffle_tickets:
+                return
+            tickets, self.raffle_tickets = self.raffle_tickets, []
+            prize = len(tickets) * TICKET_PRICE
+            self.raffle_paid += prize
+        self.cookies.add_cookies(rng.choice(tickets), prize)
+
+    def tarot(self, rng):
+        if not self.cookies.remove_cookies(rng.choice(self.users), TAROT_COST, require_funds=True):
+            self.rejected["tarot"] += 1
+
+    def imperial_tax(self, rng):
+        self.cookies.remove_cookies(rng.choice(self.users), rng.randint(5, 30))
+
+    def ai_tag(self, rng):
+        action = rng.choice(("GIVE", "TAKE"))
+        target = rng.choice(self.users)
+        self.cookies.process_ai_response(f"toma aqui glorp [[COOKIE:{action}:{target}:{rng.randint(1, 50)}]]", target)
+
+    # --- Execução ---
+
+    def run(self, ops, threads):
+        flows = list(FLOW_WEIGHTS)
+        weights = [FLOW_WEIGHTS[flow] for flow in flows]
+        latencies = defaultdict(list)
+        latencies_lock = threading.Lock()
+        per_thread = ops // threads
+
+        def worker(thread_id):
+            rng = random.Random(self.seed * 1000 + thread_id)
+            local = defaultdict(list)
+            for flow in rng.choices(flows, weights=weights, k=per_thread):
+                start = time.perf_counter()
+                getattr(self, flow)(rng)
+                local[flow].append(time.perf_counter() - start)
+            with latencies_lock:
+                for flow, values in local.items():
+                    latencies[flow].extend(values)
+
+        workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        return per_thread * threads / elapsed, latencies
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def check_invariants(cookies, sim):
+    """Retorna a lista de violações (vazia = economia consistente)."""
+    errors = []
+    supply = cookies.get_total_supply()
+    if supply != 0:
+        errors.append(f"soma dos saldos = {supply} (esperado 0)")
+
+    mismatched = cookies.store.query(
+        """
+        SELECT u.user_nick, u.cookie_count, COALESCE(c.total, 0) - COALESCE(d.total, 0)
+        FROM user_cookies u
+        LEFT JOIN (SELECT to_nick, SUM(amount) AS total FROM cookie_ledger GROUP BY to_nick) c ON c.to_nick = u.user_nick
+        LEFT JOIN (SELECT from_nick, SUM(amount) AS total FROM cookie_ledger GROUP BY from_nick) d ON d.from_nick = u.user_nick
+        WHERE u.cookie_count != COALESCE(c.total, 0) - COALESCE(d.total, 0)
+        """
+    )
+    for nick, balance, from_ledger in mismatched[:5]:
+        errors.append(f"{nick}: saldo {balance} != ledger {from_ledger}")
+
+    if sim.raffle_paid > sim.tickets_sold * TICKET_PRICE:
+        errors.append(f"sorteio pagou {sim.raffle_paid} com {sim.tickets_sold} tickets vendidos")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    bot = SimpleNamespace(auth=SimpleNamespace(bot_nick=BOT_NICK))
+    users = [f"viewer{i}" for i in range(args.users)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "cookies.db")
+        cookies = CookieSystem(bot, db_path=db_path)
+        try:
+            rng = random.Random(args.seed)
+            for user in users:
+                cookies.add_cookies(user, rng.randint(0, 300))
+
+            sim = EconomySimulation(cookies, users, args.seed)
+            throughput, latencies = sim.run(args.ops, args.threads)
+            cookies.flush_accruals()
+            errors = check_invariants(cookies, sim)
+        finally:
+            cookies.stop_thread()
+            close_store(db_path)
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    print(f"Usuários: {args.users} | operações: {len(all_latencies)} | threads: {args.threads}")
+    print(f"  vazão: {throughput:10.0f} ops/s")
+    print(f"  latência geral: p50 {percentile(all_latencies, 50) * 1000:7.2f} ms | p99 {percentile(all_latencies, 99) * 1000:7.2f} ms")
+    for flow in FLOW_WEIGHTS:
+        values = latencies.get(flow)
+        if not values:
+            continue
+        rejected = f" | recusadas por saldo: {sim.rejected[flow]}" if sim.rejected.get(flow) else ""
+        print(
+            f"  {flow:<13} n={len(values):6d} | p50 {percentile(values, 50) * 1000:7.2f} ms"
+            f" | p99 {percentile(values, 99) * 1000:7.2f} ms{rejected}"
+        )
+
+    if errors:
+        print("Invariantes VIOLADOS:")
+        for error in errors:
+            print(f"  - {error}")
+        sys.exit(1)
+    print("Invariantes OK: soma dos saldos = 0 e ledger consistente.")
+
+
+if __name__ == "__main__":
+    main()
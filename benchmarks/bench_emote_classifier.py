@@ -0,0 +1,109 @@
+"""
+Microbenchmark da classificação de emotes num sync do 7TV: `classify_emote_name`
+antigo (substring de cada raiz, um nome por vez) vs `classify_emotes_batch`
+(dedup + trie de raízes), a frio e com o memo persistente já populado.
+
+Gera nomes sintéticos no estilo do 7TV (raízes coladas com prefixos tipo
+"peepo"/"wide", nomes sem raiz nenhuma, repetições entre sets) e confere que
+as versões dão o mesmo resultado.
+
+Uso: python benchmarks/bench_emote_classifier.py --emotes 10000
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from glorpinia_bot.emote_classifier import (
+    ROOT_EMOTION_MAP,
+    WHOLE_NAME_OVERRIDES,
+    EmoteClassificationMemo,
+    classify_emotes_batch,
+    tokenize_emote_name,
+)
+from glorpinia_bot.storage import close_store, get_store
+
+PREFIXES = ["peepo", "wide", "pepe", "mona", "cat", "doge", "hmm", ""]
+
+
+def legacy_classify(name):
+    lowered = re.sub(r"[^a-z0-9]", "", name.lower())
+    if lowered in WHOLE_NAME_OVERRIDES:
+        return WHOLE_NAME_OVERRIDES[lowered]
+    score = defaultdict(int)
+    for token in tokenize_emote_name(name):
+        emotion = ROOT_EMOTION_MAP.get(token)
+        if emotion:
+            score[emotion] += 2
+    if not score:
+        for root, emotion in ROOT_EMOTION_MAP.items():
+            if len(root) >= 4 and root in lowered:
+                score[emotion] += 1
+    if not score:
+        return None
+    return max(score.items(), key=lambda kv: kv[1])[0]
+
+
+def make_names(count, rng):
+    roots = list(ROOT_EMOTION_MAP)
+    unique = set()
+    while len(unique) < count * 0.6:
+        kind = rng.random()
+        if kind < 0.4:
+            root = rng.choice(roots)
+            name = rng.choice(PREFIXES) + (root.capitalize() if rng.random() < 0.5 else root)
+        elif kind < 0.7:
+            name = "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(4, 12)))
+        else:
+            name = rng.choice(PREFIXES).capitalize() + rng.choice(roots) + rng.choice(["", "2", "HD", "Wide"])
+        unique.add(name)
+    unique = list(unique)
+    # Sets de canais diferentes repetem muitos emotes populares.
+    return unique + [rng.choice(unique) for _ in range(count - len(unique))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emotes", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    names = make_names(args.emotes, random.Random(args.seed))
+
+    start = time.perf_counter()
+    legacy = {name: legacy_classify(name) for name in names}
+    legacy_elapsed = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "emotes.db")
+        memo = EmoteClassificationMemo(get_store(db_path))
+
+        start = time.perf_counter()
+        cold = classify_emotes_batch(names, memo=memo)
+        cold_elapsed = time.perf_counter() - start
+
+        # Reinício do bot: memo novo lendo o mesmo banco.
+        warm_memo = EmoteClassificationMemo(get_store(db_path))
+        start = time.perf_counter()
+        warm = classify_emotes_batch(names, memo=warm_memo)
+        warm_elapsed = time.perf_counter() - start
+        close_store(db_path)
+
+    mismatches = sum(1 for name in legacy if legacy[name] != cold[name] or legacy[name] != warm[name])
+    print(f"Emotes: {len(names)} ({len(legacy)} nomes únicos)")
+    print(f"  antes  (substring por raiz)    : {legacy_elapsed * 1e3:8.1f} ms")
+    print(f"  depois (lote + trie, a frio)   : {cold_elapsed * 1e3:8.1f} ms")
+    print(f"  depois (lote + memo em disco)  : {warm_elapsed * 1e3:8.1f} ms")
+    print(f"  divergências: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
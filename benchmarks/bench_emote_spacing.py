@@ -0,0 +1,100 @@
+"""
+Microbenchmark de `EmoteManager.normalize_emote_spacing`: um `re.sub` por
+emote (implementação antiga) vs regex única em trie, compilada uma vez por
+versão do conjunto de emotes.
+
+Gera um pool sintético de emotes (padrão: 5000, como um canal com vários sets
+do 7TV) e mensagens de saída parecidas com as do bot, com emotes colados em
+pontuação. Confere que as duas versões produzem o mesmo texto.
+
+Uso: python benchmarks/bench_emote_spacing.py --emotes 5000 --messages 200
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from glorpinia_bot.emote_manager import EmoteManager
+
+WORDS = "a nave caiu de novo e o chat riu muito hoje glorp sabe tudo sobre isso".split()
+
+
+def legacy_normalize(message, emote_pool):
+    normalized = message
+    emote_pool = set(emote_pool)
+    emote_pool.update({"BALD"})
+    for emote in sorted(emote_pool, key=len, reverse=True):
+        escaped = re.escape(emote)
+        pattern = rf"(?<!\w)({escaped})([!?.,;:]+)(?!\w)"
+        normalized = re.sub(pattern, r"\1 \2", normalized, flags=re.IGNORECASE)
+    return re.sub(r"\s{2,}", " ", normalized).strip()
+
+
+def make_emotes(count, rng):
+    emotes = set()
+    while len(emotes) < count:
+        size = rng.randint(3, 12)
+        name = rng.choice(string.ascii_uppercase) + "".join(rng.choices(string.ascii_letters + string.digits, k=size))
+        emotes.add(name)
+    return sorted(emotes)
+
+
+def make_messages(emotes, count, rng):
+    messages = []
+    for _ in range(count):
+        parts = rng.sample(WORDS, 6)
+        for _ in range(2):
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(emotes) + rng.choice(["!", "?", ".", "", "!!"]))
+        messages.append(" ".join(parts))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emotes", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    emotes = make_emotes(args.emotes, rng)
+    messages = make_messages(emotes, args.messages, rng)
+
+    manager = EmoteManager(base_path=os.path.join(os.path.dirname(__file__), "nonexistent"))
+    manager.channel_emote_map = {}
+    # A regex é compilada na publicação do snapshot (thread do sync), não no envio.
+    start = time.perf_counter()
+    manager.global_emote_map = {"neutral": emotes}
+    compile_time = time.perf_counter() - start
+
+    # Só uma fração das mensagens na versão antiga: ela é lenta demais.
+    legacy_sample = messages[: max(1, args.messages // 10)]
+    start = time.perf_counter()
+    legacy_out = [legacy_normalize(m, manager.get_all_emotes()) for m in legacy_sample]
+    legacy_per_msg = (time.perf_counter() - start) / len(legacy_sample)
+
+    start = time.perf_counter()
+    manager.normalize_emote_spacing("aquecendo!")
+    first_send = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_out = [manager.normalize_emote_spacing(m) for m in messages]
+    new_per_msg = (time.perf_counter() - start) / len(messages)
+
+    mismatches = sum(1 for old, new in zip(legacy_out, new_out) if old != new)
+
+    print(f"Emotes: {args.emotes} | mensagens: {args.messages}")
+    print(f"  antes  (re.sub por emote)   : {legacy_per_msg * 1000:9.3f} ms/mensagem")
+    print(f"  depois (trie compilada)     : {new_per_msg * 1000:9.3f} ms/mensagem (compilação única: {compile_time * 1000:.1f} ms)")
+    print(f"  primeiro envio após publicar: {first_send * 1000:.3f} ms")
+    print(f"  ganho: {legacy_per_msg / new_per_msg:.0f}x | divergências: {mismatches}/{len(legacy_sample)}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Microbenchmark de `EmoteManager.infer_emotion`: implementação antiga (dict de
+regras montado a cada chamada + um `re.search` por regra) vs
+`EmotionRuleEngine` (uma alternação com grupos nomeados compilada a partir de
+emotion_rules.txt).
+
+Usa mensagens no formato que `prepare_final_bot_message` analisa (contexto do
+usuário + resposta do bot) e confere que as duas versões dão o mesmo
+resultado (primária, secundária).
+
+Uso: python benchmarks/bench_emotion_inference.py --messages 2000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+from glorpinia_bot.emote_manager import EmoteManager
+from glorpinia_bot.emotion_rules import load_emotion_rules
+
+CONTEXTS = [
+    "glorpinia o que você acha do boss final?",
+    "boa noite chat, cheguei agora",
+    "kkkkk ele caiu de novo no mesmo buraco",
+    "não creio que ele apostou tudo no cassino",
+    "to cansado demais, vou mimir",
+    "parabéns pela vitória ontem gg",
+    "alguém sabe onde tá o link da playlist?",
+    "isso foi muito cringe, vergonha alheia",
+]
+REPLIES = [
+    "Hmm, deixa eu ver... acho que a estratégia dele é péssima.",
+    "Salve salve! A nave agradece sua presença.",
+    "Que ruim, ficou triste mas bora de novo!",
+    "Mentira! Você tá sus demais hoje.",
+    "Ok, tanto faz, de boa.",
+    "Socorro, que pânico, ferrou tudo!",
+    "Tô comendo um lanche intergaláctico agora.",
+    "Aplausos! Mandou bem demais, brabo.",
+]
+
+
+def legacy_infer(text, rules):
+    t = (text or "").lower()
+    score = defaultdict(int)
+    rule_map = defaultdict(list)
+    for emotion, pattern in rules:
+        rule_map[emotion].append(pattern)
+    for emotion, patterns in rule_map.items():
+        for pattern in patterns:
+            if re.search(pattern, t):
+                score[emotion] += 2
+    if "?" in t:
+        score["attention"] += 1
+    if not score:
+        return "neutral", None
+    ranked = sorted(score.items(), key=lambda item: item[1], reverse=True)
+    primary = ranked[0][0]
+    secondary = ranked[1][0] if len(ranked) > 1 and ranked[1][1] == ranked[0][1] else None
+    return primary, secondary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = [f"{rng.choice(CONTEXTS)} {rng.choice(REPLIES)}" for _ in range(args.messages)]
+
+    rules = load_emotion_rules(os.path.join(ROOT, "emotion_rules.txt"))
+    manager = EmoteManager(base_path=ROOT)
+
+    start = time.perf_counter()
+    legacy = [legacy_infer(text, rules) for text in texts]
+    legacy_per_msg = (time.perf_counter() - start) / len(texts)
+
+    start = time.perf_counter()
+    compiled = [manager.infer_emotion(text) for text in texts]
+    compiled_per_msg = (time.perf_counter() - start) / len(texts)
+
+    mismatches = sum(1 for old, new in zip(legacy, compiled) if old != new)
+    print(f"Regras: {len(rules)} | mensagens: {len(texts)}")
+    print(f"  antes  (re.search por regra) : {legacy_per_msg * 1e6:8.1f} µs/mensagem")
+    print(f"  depois (alternação combinada): {compiled_per_msg * 1e6:8.1f} µs/mensagem")
+    print(f"  ganho: {legacy_per_msg / compiled_per_msg:.1f}x | divergências: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Microbenchmark de `SocialDynamicsEngine.observe_message` num canal com muitos
+perfis sociais (padrão: 10000): varredura completa de perfis e loops a cada
+mensagem (implementação antiga) vs decaimento preguiçoso + heap de expiração.
+
+Os perfis são criados com sinal alto o bastante para não expirarem durante a
+medição, então o custo medido é o do caminho normal do chat. A persistência
+em disco é desligada nas duas versões para isolar o custo de CPU.
+
+Uso: python benchmarks/bench_social_dynamics.py --profiles 10000 --messages 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from glorpinia_bot.narrative.social_dynamics import SocialDynamicsEngine, UserSocialProfile
+
+TEXTS = [
+    "boa glorp mandou bem",
+    "kkkkk que zoeira",
+    "alguém sabe quando começa?",
+    "caos total no chat",
+    "salve salve",
+    "cala boca bot ruim",
+]
+
+
+class QuietEngine(SocialDynamicsEngine):
+    def _persist_user_profiles(self, channel, state):
+        pass
+
+    def _persist_loops(self, channel, state):
+        pass
+
+
+class LegacyEngine(QuietEngine):
+    """Caminho antigo: decai loops e reavalia todos os perfis a cada mensagem."""
+
+    def observe_message(self, channel, author, content, bot_nick=None):
+        state = self._get_channel_state(channel)
+        self._maybe_reset_drama_for_interval(state, channel)
+        state.message_count += 1
+        state.users_seen.add(author.lower())
+        if state.message_count % 20 == 0:
+            for loop in state.memory_loops:
+                loop.weight *= 0.97
+        self._update_user_profile(state, channel=channel, author=author, content=content)
+        self._prune_loops(state, channel=channel)
+        self._prune_user_profiles(state, channel=channel)
+        self._roll_memory_loop(state)
+        self._roll_drama_events(state, author)
+        self._update_mood(state, author=author, content=content, bot_nick=bot_nick)
+
+
+def populate(engine, profiles):
+    state = engine._get_channel_state("bench")
+    state.message_count = 10
+    for i in range(profiles):
+        state.user_profiles[f"viewer{i}"] = UserSocialProfile(
+            positive_interactions=5.0, trusted_joke_level=0.8, last_updated_message=10
+        )
+    engine._rebuild_expiry_heap(state)
+    return state
+
+
+def run(engine, profiles, messages, seed):
+    populate(engine, profiles)
+    rng = random.Random(seed)
+    random.seed(seed)
+    authors = [f"viewer{rng.randrange(profiles)}" for _ in range(messages)]
+    texts = [rng.choice(TEXTS) for _ in range(messages)]
+    start = time.perf_counter()
+    for author, text in zip(authors, texts):
+        engine.observe_message("bench", author, text, bot_nick="glorpinia")
+    return (time.perf_counter() - start) / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        legacy = LegacyEngine(Path(tmpdir) / "legacy" / "loops.json")
+        current = QuietEngine(Path(tmpdir) / "current" / "loops.json")
+        legacy_per_msg = run(legacy, args.profiles, args.messages, args.seed)
+        current_per_msg = run(current, args.profiles, args.messages, args.seed)
+
+    legacy_profiles = legacy.channel_states["bench"].user_profiles
+    current_profiles = current.channel_states["bench"].user_profiles
+    mismatches = sum(
+        1 for user in set(legacy_profiles) | set(current_profiles)
+        if legacy_profiles.get(user) != current_profiles.get(user)
+    )
+    print(f"Perfis: {args.profiles} | mensagens: {args.messages}")
+    print(f"  antes  (varredura por mensagem): {legacy_per_msg * 1e6:10.1f} µs/mensagem")
+    print(f"  depois (heap de expiração)     : {current_per_msg * 1e6:10.1f} µs/mensagem")
+    print(f"  ganho: {legacy_per_msg / current_per_msg:.1f}x | perfis divergentes: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
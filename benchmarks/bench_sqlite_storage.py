@@ -0,0 +1,94 @@
+"""
+Microbenchmark da camada SQLite: conexão por operação (padrão antigo) vs
+`SQLiteStore` (WAL + escritor único com fila + pool de leitura).
+
+Simula o tráfego do CookieSystem: várias threads fazendo +1 cookie por
+mensagem e, de vez em quando, lendo o saldo.
+
+Uso: python benchmarks/bench_sqlite_storage.py --ops 2000 --threads 8
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from glorpinia_bot.storage import SQLiteStore
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS user_cookies (user_nick TEXT PRIMARY KEY, cookie_count INTEGER NOT NULL DEFAULT 0)"
+UPSERT = """
+    INSERT INTO user_cookies (user_nick, cookie_count) VALUES (?, 1)
+    ON CONFLICT(user_nick) DO UPDATE SET cookie_count = cookie_count + 1
+"""
+SELECT = "SELECT cookie_count FROM user_cookies WHERE user_nick = ?"
+READ_EVERY = 5
+
+
+def run_threads(worker, ops, threads):
+    per_thread = ops // threads
+    workers = [threading.Thread(target=worker, args=(t, per_thread)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+
+def bench_connect_per_op(db_path, ops, threads):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(SCHEMA)
+
+    def worker(thread_id, count):
+        for i in range(count):
+            nick = f"user{(thread_id * 31 + i) % 500}"
+            with sqlite3.connect(db_path, timeout=30) as conn:
+                if i % READ_EVERY == 0:
+                    conn.execute(SELECT, (nick,)).fetchone()
+                else:
+                    conn.execute(UPSERT, (nick,))
+                    conn.commit()
+
+    return run_threads(worker, ops, threads)
+
+
+def bench_store(db_path, ops, threads):
+    store = SQLiteStore(db_path)
+    store.execute(SCHEMA)
+
+    def worker(thread_id, count):
+        for i in range(count):
+            nick = f"user{(thread_id * 31 + i) % 500}"
+            if i % READ_EVERY == 0:
+                store.query_one(SELECT, (nick,))
+            else:
+                store.execute(UPSERT, (nick,))
+
+    try:
+        return run_threads(worker, ops, threads)
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        before = bench_connect_per_op(os.path.join(tmpdir, "before.db"), args.ops, args.threads)
+        after = bench_store(os.path.join(tmpdir, "after.db"), args.ops, args.threads)
+
+    print(f"Operações: {args.ops} ({args.threads} threads, 1 leitura a cada {READ_EVERY})")
+    print(f"  antes  (connect por operação): {before:10.0f} ops/s")
+    print(f"  depois (SQLiteStore, WAL)    : {after:10.0f} ops/s")
+    print(f"  ganho: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,14 @@ import json
 import sqlite3
 import os
 import re
+import sys
 from datetime import datetime
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 
+sys.path.insert(0, "src")
+from glorpinia_bot import vector_snapshot
+
 def _clean_completion(text):
     """
     Normaliza a string de 'completion' removendo lixo de roleplay,
@@ -70,15 +74,16 @@ for channel, user, path in rows:
     try:
         # Carrega o FAISS específico do user/channel
         if path and os.path.exists(path):
-            vectorstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
-            
-            # Extrai TODOS os docs
-            docs = vectorstore.docstore._dict.values()
+            # Extrai TODOS os docs (snapshot novo é lido direto, sem pickle)
+            if vector_snapshot.is_snapshot(path):
+                texts = [text for _, text, _ in vector_snapshot.iter_documents(path)]
+            else:
+                vectorstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+                texts = [doc.page_content for doc in vectorstore.docstore._dict.values()]
             
-            for doc in docs:
+            for full_str in texts:
                 # Parse do formato salvo: "Usuário {user} em {channel}: {query} -> {response}"
-                if " -> " in doc.page_content:
-                    full_str = doc.page_content
+                if " -> " in full_str:
                     # Certifique-se de que a separação por ": " lida com casos onde o username tem ": "
                     parts = full_str.split(" -> ", 1)
                     query_response_part = parts[0].split(": ", 1)[1] if ": " in parts[0] else parts[0]
@@ -3,6 +3,10 @@ import json
 import os
 import re
 import glob
+import sys
+
+sys.path.insert(0, "src")
+from glorpinia_bot import vector_snapshot
 
 OUTPUT_FILE = "dataset.jsonl"
 DB_PATH = "glorpinia_memory.db"
@@ -59,7 +63,7 @@ def create_example(user_msg, bot_resp):
 raw_interactions = []
 
 # 1. EXTRAÇÃO VIA SQLITE
-print(f"[1/2] Lendo SQLite ({DB_PATH})...")
+print(f"[1/3] Lendo SQLite ({DB_PATH})...")
 if os.path.exists(DB_PATH):
     try:
         conn = sqlite3.connect(DB_PATH)
@@ -77,8 +81,28 @@ if os.path.exists(DB_PATH):
 else:
     print("   -> DB não encontrado.")
 
-# 2. EXTRAÇÃO VIA ARQUIVOS BRUTOS (Pickle/FAISS)
-print(f"[2/2] Varrendo arquivos de memória (Modo Bruto)...")
+# 2. EXTRAÇÃO VIA SNAPSHOTS (.vsnap) -- leitura direta, sem LangChain nem pickle
+print(f"[2/3] Lendo snapshots de memória (.vsnap)...")
+
+snapshot_count = 0
+for root, dirs, files in os.walk("."):
+    for directory in dirs:
+        snapshot_path = os.path.join(root, directory)
+        if not directory.endswith(vector_snapshot.SNAPSHOT_SUFFIX) or not vector_snapshot.is_snapshot(snapshot_path):
+            continue
+        try:
+            for _, text, _ in vector_snapshot.iter_documents(snapshot_path):
+                match = re.match(r"Usuário\s+.*?\s+em\s+.*?:(.*?)\s*->\s*(.*)", text, flags=re.DOTALL)
+                if match and len(match.group(1)) > 1 and len(match.group(2)) > 1:
+                    raw_interactions.append((match.group(1), match.group(2)))
+                    snapshot_count += 1
+        except vector_snapshot.SnapshotError as e:
+            print(f"   -> Snapshot ignorado ({snapshot_path}): {e}")
+
+print(f"   -> {snapshot_count} interações extraídas dos snapshots.")
+
+# 3. EXTRAÇÃO VIA ARQUIVOS BRUTOS (Pickle/FAISS legado, ainda não migrado)
+print(f"[3/3] Varrendo arquivos de memória legados (Modo Bruto)...")
 
 pkl_files = []
 for root, dirs, files in os.walk("."):
@@ -111,7 +135,7 @@ for pkl_path in pkl_files:
 
 print(f"   -> {faiss_count} interações extraídas via força bruta dos arquivos!")
 
-# 3. PROCESSAMENTO, LIMPEZA E SALVAMENTO
+# 4. PROCESSAMENTO, LIMPEZA E SALVAMENTO
 print(f"\nConsolidando e limpando dados...")
 unique_set = set()
 final_count = 0
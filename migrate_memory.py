@@ -1,11 +1,15 @@
 import os
 import sqlite3
 import logging
+import sys
 import time
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from dotenv import load_dotenv
 
+sys.path.insert(0, "src")
+from glorpinia_bot import vector_snapshot
+
 # Configuração
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -46,16 +50,22 @@ def migrate_memories():
         logging.info(f"Migrando: {path}...")
 
         try:
-            old_vectorstore = FAISS.load_local(path, embeddings=None, allow_dangerous_deserialization=True)
+            if vector_snapshot.is_snapshot(path):
+                documents = [(text, metadata) for _, text, metadata in vector_snapshot.iter_documents(path)]
+            else:
+                old_vectorstore = FAISS.load_local(path, embeddings=None, allow_dangerous_deserialization=True)
+                documents = [(doc.page_content, doc.metadata) for doc in old_vectorstore.docstore._dict.values()]
             
-            raw_docs = list(old_vectorstore.docstore._dict.values())
-            texts = [doc.page_content for doc in raw_docs]
+            texts = [text for text, _ in documents]
             
             if not texts:
                 continue
 
-            new_vectorstore = FAISS.from_texts(texts, new_embeddings)
-            new_vectorstore.save_local(path)
+            new_vectorstore = FAISS.from_texts(texts, new_embeddings, metadatas=[metadata for _, metadata in documents])
+            if vector_snapshot.is_snapshot(path):
+                vector_snapshot.save_faiss(new_vectorstore, path)
+            else:
+                new_vectorstore.save_local(path)
             
             success_count += 1
             logging.info(f"  -> Sucesso! {path} atualizado.")
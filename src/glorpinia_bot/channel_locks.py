@@ -0,0 +1,63 @@
+"""Um lock por canal para o estado que é mutado de várias threads.
+
+O websocket, as features com thread própria (comment, listen, 8ball,
+fortune...) e as threads de background tocam o mesmo estado por canal. Cada
+componente com estado por canal guarda um `ChannelLocks` e faz as leituras e
+escritas desse estado dentro de `hold(channel)`. Canais diferentes nunca
+disputam o mesmo lock, então processar canais em paralelo continua livre.
+
+Os locks são reentrantes: um método público travado pode chamar outro do
+mesmo canal. Regra de ordem: quem precisar de um lock global do componente
+(ex.: histórico global de emotes) pega depois do lock do canal, nunca antes,
+e nunca segura dois canais ao mesmo tempo.
+"""
+
+import functools
+import threading
+from contextlib import contextmanager
+
+
+def normalize_channel_key(channel) -> str:
+    return str(channel or "").strip().lower().lstrip("#") or "global"
+
+
+class ChannelLocks:
+    def __init__(self):
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def lock_for(self, channel) -> threading.RLock:
+        key = normalize_channel_key(channel)
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._registry_lock:
+                lock = self._locks.setdefault(key, threading.RLock())
+        return lock
+
+    @contextmanager
+    def hold(self, channel):
+        with self.lock_for(channel):
+            yield
+
+    def discard(self, channel):
+        """Esquece o lock de um canal que não está em uso (ex.: estado descarregado)."""
+        with self._registry_lock:
+            self._locks.pop(normalize_channel_key(channel), None)
+
+    def __len__(self):
+        return len(self._locks)
+
+
+def channel_locked(method):
+    """
+    Roda o método com o lock do canal recebido como primeiro argumento (ou
+    `channel=`). A instância precisa ter `self._channel_locks`.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        channel = args[0] if args else kwargs.get("channel")
+        with self._channel_locks.hold(channel):
+            return method(self, *args, **kwargs)
+
+    return wrapper
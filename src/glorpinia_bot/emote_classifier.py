@@ -1,6 +1,13 @@
+import logging
 import re
 from collections import defaultdict
 
+# Suba quando ROOT_EMOTION_MAP/WHOLE_NAME_OVERRIDES ou a lógica mudarem:
+# classificações memoizadas de versões antigas deixam de valer.
+CLASSIFIER_VERSION = 1
+# Raízes menores que isso só contam como token inteiro, nunca como substring.
+MIN_SUBSTRING_ROOT_LENGTH = 4
+
 _TOKEN_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z0-9]+|[A-Z]+")
 
 
@@ -103,6 +110,42 @@ WHOLE_NAME_OVERRIDES = {
 }
 
 
+def _build_root_trie(roots):
+    """Trie (dicts aninhados) das raízes; o nó terminal guarda o índice da raiz em `roots`."""
+    trie = {}
+    for index, root in enumerate(roots):
+        node = trie
+        for char in root:
+            node = node.setdefault(char, {})
+        node[""] = index
+    return trie
+
+
+_SUBSTRING_ROOTS = [
+    (root, emotion) for root, emotion in ROOT_EMOTION_MAP.items()
+    if len(root) >= MIN_SUBSTRING_ROOT_LENGTH
+]
+_SUBSTRING_ROOT_TRIE = _build_root_trie([root for root, _ in _SUBSTRING_ROOTS])
+
+
+def _substring_roots(lowered):
+    """
+    Índices (em _SUBSTRING_ROOTS) das raízes que aparecem dentro de `lowered`,
+    numa passada pela trie a partir de cada posição -- pega nomes colados
+    ("peeposadge") sem testar `root in name` para cada raiz.
+    """
+    found = set()
+    for start in range(len(lowered)):
+        node = _SUBSTRING_ROOT_TRIE
+        for char in lowered[start:]:
+            node = node.get(char)
+            if node is None:
+                break
+            if "" in node:
+                found.add(node[""])
+    return found
+
+
 def classify_emote_name(name: str):
     """
     Tenta inferir a emoção/intenção de um emote a partir do nome.
@@ -123,11 +166,81 @@ def classify_emote_name(name: str):
             score[emotion] += 2
 
     if not score:
-        for root, emotion in ROOT_EMOTION_MAP.items():
-            if len(root) >= 4 and root in lowered:
-                score[emotion] += 1
+        # Ordem de ROOT_EMOTION_MAP preservada: o desempate do max() depende dela.
+        for index in sorted(_substring_roots(lowered)):
+            score[_SUBSTRING_ROOTS[index][1]] += 1
 
     if not score:
         return None
 
-    return max(score.items(), key=lambda kv: kv[1])[0]
\ No newline at end of file
+    return max(score.items(), key=lambda kv: kv[1])[0]
+
+
+class EmoteClassificationMemo:
+    """
+    Memo persistente de classificações, chaveado por (nome, CLASSIFIER_VERSION),
+    na tabela `emote_classifications` do store de emotes. A versão atual é
+    carregada inteira em memória no primeiro uso; depois, só nomes nunca
+    vistos passam pelo classificador.
+    """
+
+    def __init__(self, store, version=CLASSIFIER_VERSION):
+        self.store = store
+        self.version = version
+        self._memo = None
+        try:
+            self.store.execute("""
+                CREATE TABLE IF NOT EXISTS emote_classifications (
+                    name TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    emotion TEXT,
+                    PRIMARY KEY (name, version)
+                )
+            """)
+        except Exception as e:
+            logging.error("[EmoteClassifier] Falha ao inicializar o memo de classificações: %s", e)
+
+    def _load(self):
+        if self._memo is None:
+            try:
+                rows = self.store.query(
+                    "SELECT name, emotion FROM emote_classifications WHERE version = ?", (self.version,)
+                )
+            except Exception as e:
+                logging.error("[EmoteClassifier] Falha ao ler o memo de classificações: %s", e)
+                rows = []
+            self._memo = dict(rows)
+        return self._memo
+
+    def get_many(self, names):
+        """Retorna {nome: emoção ou None} só para os nomes já memoizados."""
+        memo = self._load()
+        return {name: memo[name] for name in names if name in memo}
+
+    def put_many(self, classifications):
+        if not classifications:
+            return
+        self._load().update(classifications)
+        try:
+            self.store.executemany(
+                "INSERT OR REPLACE INTO emote_classifications (name, version, emotion) VALUES (?, ?, ?)",
+                [(name, self.version, emotion) for name, emotion in classifications.items()],
+            )
+        except Exception as e:
+            logging.error("[EmoteClassifier] Falha ao gravar o memo de classificações: %s", e)
+
+
+def classify_emotes_batch(names, memo=None):
+    """
+    Classifica vários nomes de uma vez (ex.: todos os sets de um sync).
+    Nomes repetidos são classificados uma vez só; com `memo`, só os nomes
+    ainda não memoizados passam pelo `classify_emote_name`.
+    Retorna {nome: emoção ou None}.
+    """
+    unique = list(dict.fromkeys(names))
+    result = memo.get_many(unique) if memo else {}
+    fresh = {name: classify_emote_name(name) for name in unique if name not in result}
+    if memo:
+        memo.put_many(fresh)
+    result.update(fresh)
+    return result
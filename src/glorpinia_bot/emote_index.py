@@ -0,0 +1,148 @@
+"""Snapshot imutável dos emotes conhecidos, usado pelo `EmoteManager`.
+
+Cada carga dos .txt ou sync do 7TV gera um `EmoteIndex` novo, com versão
+própria, e o `EmoteManager` troca a referência de uma vez. Quem lê pega o
+snapshot atual sem lock: ele nunca muda depois de publicado. Tudo que antes
+era recalculado a cada mensagem (união de todos os emotes, rótulos de emoção,
+pool de candidatos por canal/emoção, partição zero-width, regex de
+espaçamento) fica pré-computado ou memoizado aqui.
+
+A regex de espaçamento é compilada por quem publica (sync/EventAPI), nunca
+no caminho de envio de mensagens; se o conjunto de nomes não mudou (só
+emoção ou flag zero-width), a regex anterior é reaproveitada.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+SPACING_PUNCTUATION = "!?.,;:"
+# Emotes que nem sempre estão nos mapas mas precisam do espaçamento.
+EXTRA_SPACING_EMOTES = ("BALD",)
+
+
+def build_trie_pattern(words):
+    """
+    Monta uma alternação regex em forma de trie ("Kappa|KappaPride|Keepo" ->
+    "K(?:appa(?:Pride)?|eepo)"). Com milhares de emotes o motor de regex
+    testa só os ramos compatíveis com o prefixo, em vez de cada alternativa.
+    Ramos mais longos vêm antes, então o casamento mais longo é preferido.
+    """
+    trie = {}
+    for word in words:
+        if not word:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def render(node):
+        terminal = "" in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            return f"(?:{body})?"
+        return body
+
+    return render(trie)
+
+
+def _freeze_map(emote_map):
+    return MappingProxyType({emotion: tuple(emotes) for emotion, emotes in emote_map.items()})
+
+
+@dataclass(frozen=True)
+class EmoteIndex:
+    version: int
+    global_map: Mapping[str, tuple]
+    channel_maps: Mapping[str, Mapping[str, tuple]]
+    all_emotes: frozenset
+    emotion_labels: frozenset
+    zero_width: frozenset
+    non_zero_width: tuple
+    # Pool base por (canal, emoção): emotes do canal, ou os globais se o canal não tiver.
+    pools: Mapping[tuple, tuple]
+    # Regex única (trie) de todos os emotes, já compilada.
+    spacing_matcher: Optional[re.Pattern] = None
+    # Combinações (canal, primária, secundária) já pedidas. Memo idempotente:
+    # duas threads calculando a mesma chave chegam ao mesmo valor.
+    _combined_pools: dict = field(default_factory=dict, compare=False, repr=False)
+
+    def pool(self, channel, emotion):
+        pool = self.pools.get((channel, emotion))
+        if pool is None:
+            pool = self.global_map.get(emotion, ())
+        return pool
+
+    def candidate_pool(self, channel, emotion, secondary_emotion=None):
+        key = (channel, emotion, secondary_emotion)
+        cached = self._combined_pools.get(key)
+        if cached is not None:
+            return cached
+
+        emotions = [emotion]
+        if secondary_emotion and secondary_emotion not in (emotion, "neutral"):
+            emotions.append(secondary_emotion)
+        emotions.append("neutral")
+
+        unique = []
+        seen = set()
+        for name in emotions:
+            for emote in self.pool(channel, name):
+                if emote not in seen:
+                    seen.add(emote)
+                    unique.append(emote)
+
+        result = tuple(unique)
+        self._combined_pools[key] = result
+        return result
+
+
+@lru_cache(maxsize=4)
+def _compile_spacing_matcher(emote_pool: frozenset) -> Optional[re.Pattern]:
+    alternation = build_trie_pattern(emote_pool)
+    if not alternation:
+        return None
+    return re.compile(
+        rf"(?<!\w)({alternation})([{re.escape(SPACING_PUNCTUATION)}]+)(?!\w)", flags=re.IGNORECASE
+    )
+
+
+def build_emote_index(global_map, channel_maps, zero_width, version):
+    """Congela os mapas atuais num `EmoteIndex` novo."""
+    frozen_global = _freeze_map(global_map)
+    frozen_channels = MappingProxyType({channel: _freeze_map(cmap) for channel, cmap in channel_maps.items()})
+
+    all_emotes = set()
+    labels = set(frozen_global)
+    for emotes in frozen_global.values():
+        all_emotes.update(emotes)
+    for cmap in frozen_channels.values():
+        labels.update(cmap)
+        for emotes in cmap.values():
+            all_emotes.update(emotes)
+
+    pools = {}
+    for channel, cmap in frozen_channels.items():
+        for emotion in set(cmap) | set(frozen_global):
+            pools[(channel, emotion)] = cmap.get(emotion) or frozen_global.get(emotion, ())
+
+    zero_width = frozenset(zero_width)
+    return EmoteIndex(
+        version=version,
+        global_map=frozen_global,
+        channel_maps=frozen_channels,
+        all_emotes=frozenset(all_emotes),
+        emotion_labels=frozenset(labels),
+        zero_width=zero_width,
+        non_zero_width=tuple(sorted(all_emotes - zero_width)),
+        pools=MappingProxyType(pools),
+        spacing_matcher=_compile_spacing_matcher(
+            frozenset(emote.lower() for emote in (*all_emotes, *EXTRA_SPACING_EMOTES))
+        ),
+    )
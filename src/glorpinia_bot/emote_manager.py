@@ -2,8 +2,16 @@ import os
 import random
 import re
 import logging
+import threading
 from collections import defaultdict, deque
 
+from .channel_locks import ChannelLocks, channel_locked
+from .emote_index import SPACING_PUNCTUATION, build_emote_index
+from .emotion_rules import EmotionRuleEngine
+
+# Com estatísticas de uso do chat (ver emote_usage.py), o emote mais popular
+# do canal pesa 1 + USAGE_BIAS no sorteio; um nunca usado pesa 1.
+USAGE_BIAS = 3.0
 
 class EmoteManager:
     """Gerencia emotes por contexto com anti-repetição global e por canal."""
@@ -12,17 +20,81 @@ class EmoteManager:
         self.base_path = base_path or os.getcwd()
         self.history_size = history_size
 
+        # Históricos por canal ficam sob o lock do canal; o histórico global,
+        # compartilhado por todos, tem lock próprio (sempre pego depois do do canal).
+        self._channel_locks = ChannelLocks()
+        self._global_history_lock = threading.Lock()
         self.global_emote_history = deque(maxlen=history_size)
         self.channel_emote_history = defaultdict(lambda: deque(maxlen=history_size))
         self.channel_phrase_history = defaultdict(lambda: deque(maxlen=history_size))
         self.channel_emotion_history = defaultdict(lambda: deque(maxlen=history_size))
         self.last_selected_emote_by_channel = {}
         self.last_resolved_emotion_by_channel = {}
-        self.zero_width_emotes = set()
-
-        self.global_emote_map = self._load_emote_map(os.path.join(self.base_path, "emotes_global.txt"))
-        self.channel_emote_map = self._load_channel_maps(os.path.join(self.base_path, "emotes_channels.txt"))
+        # EmoteUsageTracker opcional (ligado pelo bot); sem ele o sorteio é uniforme.
+        self.usage_tracker = None
+
+        # Mapas-fonte (nunca alterados depois de publicados: cada mudança cria
+        # cópias) e o snapshot imutável derivado deles, que é o que as leituras usam.
+        # Quem escreve faz leitura + merge + publicação inteiros dentro de
+        # `_index_lock` (reentrante: os merges chamam `_publish_index`);
+        # leitura não trava.
+        self._index_lock = threading.RLock()
+        self._index_version = 0
+        self._zero_width_emotes = frozenset()
+        # Zero-width por mapa de origem (None = global, senão o canal): remover
+        # um emote de um canal não apaga a flag do mesmo nome em outro mapa.
+        self._zero_width_by_map = {}
+        self._global_emote_map = {}
+        self._channel_emote_map = {}
+        self._publish_index(
+            global_map=self._load_emote_map(os.path.join(self.base_path, "emotes_global.txt")),
+            channel_maps=self._load_channel_maps(os.path.join(self.base_path, "emotes_channels.txt")),
+        )
         self.glitch_lines = self._load_list(os.path.join(self.base_path, "glitches.txt"))
+        self.emotion_rules = EmotionRuleEngine.from_file(os.path.join(self.base_path, "emotion_rules.txt"))
+
+    def _publish_index(self, global_map=None, channel_maps=None, zero_width_by_map=None):
+        """Troca atomicamente o snapshot de emotes (uma atribuição de referência)."""
+        with self._index_lock:
+            if global_map is not None:
+                self._global_emote_map = global_map
+            if channel_maps is not None:
+                self._channel_emote_map = channel_maps
+            if zero_width_by_map is not None:
+                self._zero_width_by_map = {key: frozenset(names) for key, names in zero_width_by_map.items() if names}
+                self._zero_width_emotes = frozenset().union(*self._zero_width_by_map.values())
+            self._index_version += 1
+            self.emote_index = build_emote_index(
+                self._global_emote_map, self._channel_emote_map, self._zero_width_emotes, self._index_version
+            )
+
+    @property
+    def global_emote_map(self):
+        return self._global_emote_map
+
+    @global_emote_map.setter
+    def global_emote_map(self, value):
+        self._publish_index(global_map=value)
+
+    @property
+    def channel_emote_map(self):
+        return self._channel_emote_map
+
+    @channel_emote_map.setter
+    def channel_emote_map(self, value):
+        self._publish_index(channel_maps=value)
+
+    @property
+    def zero_width_emotes(self):
+        return self.emote_index.zero_width
+
+    @zero_width_emotes.setter
+    def zero_width_emotes(self, value):
+        self._publish_index(zero_width_by_map={None: value})
+
+    @property
+    def emote_set_version(self):
+        return self.emote_index.version
 
     def _load_list(self, file_path):
         if not os.path.exists(file_path):
@@ -95,7 +167,7 @@ class EmoteManager:
         if not tokens:
             return message
 
-        all_emotes = self.get_all_emotes()
+        all_emotes = self.emote_index.all_emotes
         while tokens:
             last = tokens[-1]
             if last.startswith("@"):
@@ -114,7 +186,7 @@ class EmoteManager:
         if not tokens:
             return message
 
-        all_emotes = self.get_all_emotes()
+        all_emotes = self.emote_index.all_emotes
         cleaned_tokens = [
             token
             for token in tokens
@@ -134,7 +206,8 @@ class EmoteManager:
         if not tokens:
             return message
 
-        emotion_labels = self._get_known_emotion_labels()
+        index = self.emote_index
+        emotion_labels = index.emotion_labels
         if not emotion_labels:
             return message
 
@@ -147,8 +220,7 @@ class EmoteManager:
         if len(tokens) >= 2:
             penultimate_normalized = self._normalize_token(tokens[-2]).lower()
             final_emote_normalized = self._normalize_token(tokens[-1])
-            all_emotes = self.get_all_emotes()
-            if penultimate_normalized in emotion_labels and final_emote_normalized in all_emotes:
+            if penultimate_normalized in emotion_labels and final_emote_normalized in index.all_emotes:
                 logging.debug(
                     "[Emote] trailing_emotion_label_removed mode=label_plus_emote label=%s",
                     penultimate_normalized,
@@ -163,13 +235,10 @@ class EmoteManager:
             return message
 
         normalized = message
-        emote_pool = set(self.get_all_emotes())
-        emote_pool.update({"BALD"})
-
-        for emote in sorted(emote_pool, key=len, reverse=True):
-            escaped = re.escape(emote)
-            pattern = rf"(?<!\w)({escaped})([!?.,;:]+)(?!\w)"
-            normalized = re.sub(pattern, r"\1 \2", normalized, flags=re.IGNORECASE)
+        if any(char in SPACING_PUNCTUATION for char in message):
+            matcher = self.emote_index.spacing_matcher
+            if matcher is not None:
+                normalized = matcher.sub(r"\1 \2", normalized)
 
         return re.sub(r"\s{2,}", " ", normalized).strip()
 
@@ -185,23 +254,30 @@ class EmoteManager:
 
         channel=None -> alimenta o mapa global (self.global_emote_map).
         channel="nome" -> alimenta self.channel_emote_map[channel].
+
+        Os mapas publicados não são alterados: o merge é feito em cópias e o
+        snapshot novo entra no lugar do antigo de uma vez, então leituras
+        concorrentes ao sync nunca veem um estado pela metade.
         """
-        if channel is None:
-            target = self.global_emote_map
-        else:
-            normalized = channel.lower()
-            target = self.channel_emote_map.setdefault(normalized, {})
-
-        for emotion, names in emotes_by_emotion.items():
-            existing = target.setdefault(emotion, [])
-            seen = set(existing)
-            for name in names:
-                if name not in seen:
-                    existing.append(name)
-                    seen.add(name)
-        
-        if zero_width_names:
-            self.zero_width_emotes.update(zero_width_names)
+        map_key = channel.lower() if channel is not None else None
+        with self._index_lock:
+            if map_key is None:
+                target = dict(self._global_emote_map)
+            else:
+                target = dict(self._channel_emote_map.get(map_key, {}))
+
+            for emotion, names in emotes_by_emotion.items():
+                existing = list(target.get(emotion, []))
+                seen = set(existing)
+                for name in names:
+                    if name not in seen:
+                        existing.append(name)
+                        seen.add(name)
+                target[emotion] = existing
+
+            zero_width_by_map = dict(self._zero_width_by_map)
+            zero_width_by_map[map_key] = zero_width_by_map.get(map_key, frozenset()) | set(zero_width_names or ())
+            self._publish_merged(map_key, target, zero_width_by_map)
 
         logging.info(
             "[Emote][7TV] load_from_seventv channel=%s categorias=%s total_emotes=%s",
@@ -210,96 +286,67 @@ class EmoteManager:
             sum(len(v) for v in emotes_by_emotion.values()),
         )
 
+    def _publish_merged(self, map_key, target, zero_width_by_map):
+        """Publica `target` como o mapa global (map_key None) ou do canal. Chamar com `_index_lock`."""
+        if map_key is None:
+            self._publish_index(global_map=target, zero_width_by_map=zero_width_by_map)
+        else:
+            channel_maps = dict(self._channel_emote_map)
+            channel_maps[map_key] = target
+            self._publish_index(channel_maps=channel_maps, zero_width_by_map=zero_width_by_map)
+
+    def apply_seventv_diff(self, channel, added_by_emotion=None, removed_names=None, zero_width_names=None):
+        """
+        Aplica uma mudança incremental de um set do 7TV (EventAPI): remove
+        `removed_names` de todas as categorias do mapa alvo, acrescenta
+        `added_by_emotion` e atualiza a flag zero-width dos nomes tocados
+        (`zero_width_names` = quais dos adicionados são zero-width).
+        Publica um snapshot novo, como o load_from_seventv.
+        """
+        removed = set(removed_names or ())
+        added_by_emotion = added_by_emotion or {}
+        added = {name for names in added_by_emotion.values() for name in names}
+
+        map_key = channel.lower() if channel is not None else None
+        with self._index_lock:
+            if map_key is None:
+                source = self._global_emote_map
+            else:
+                source = self._channel_emote_map.get(map_key, {})
+
+            target = {}
+            for emotion, names in source.items():
+                kept = [name for name in names if name not in removed]
+                if kept:
+                    target[emotion] = kept
+            for emotion, names in added_by_emotion.items():
+                existing = target.setdefault(emotion, [])
+                for name in names:
+                    if name not in existing:
+                        existing.append(name)
+
+            zero_width_by_map = dict(self._zero_width_by_map)
+            zero_width_by_map[map_key] = (
+                (zero_width_by_map.get(map_key, frozenset()) - removed - added) | set(zero_width_names or ())
+            )
+            self._publish_merged(map_key, target, zero_width_by_map)
+
+        logging.info(
+            "[Emote][7TV] apply_seventv_diff channel=%s adicionados=%s removidos=%s",
+            channel or "global",
+            len(added),
+            len(removed),
+        )
+
     def get_all_emotes(self):
-        pool = set()
-        for values in self.global_emote_map.values():
-            pool.update(values)
-        for cmap in self.channel_emote_map.values():
-            for values in cmap.values():
-                pool.update(values)
-        return pool
+        return self.emote_index.all_emotes
 
     def _get_known_emotion_labels(self):
-        labels = set(self.global_emote_map.keys())
-        for cmap in self.channel_emote_map.values():
-            labels.update(cmap.keys())
-        return labels
+        return self.emote_index.emotion_labels
 
     def infer_emotion(self, text):
         t = (text or "").lower()
-        score = defaultdict(int)
-
-        rule_map = {
-            "angry": [r"\b(raiva|[óo]dio|irrit|burro|rid[íi]culo|palha[çc]ada|tilt|nervos[oa])\b"],
-            "anime": [r"\b(anime|otaku|kawaii|senpai|waifu|ayaya)\b"],
-            "approval": [r"\b(aprovad[oa]|concordo|boa escolha|perfeito|mandou bem)\b"],
-            "arrival": [r"\b(cheguei|acabei de chegar|to on|entrei|voltei)\b"],
-            "attention": [r"\b(olha|aten[çc][aã]o|escuta|psiu|ei)\b"],
-            "authority": [r"\b(regras?|modera[çc][aã]o|ban|comando|ordem)\b"],
-            "bald": [r"\b(careca|calv[oã]|sem cabelo|bald)\b"],
-            "business": [r"\b(neg[óo]cio|projeto|reuni[aã]o|produtividade|trampo)\b"],
-            "checking": [r"\b(modcheck|confere|checando|cad[eê]|onde t[aá])\b"],
-            "clap": [r"\b(aplaus|palmas|brabo|mandou bem)\b"],
-            "clown": [r"\b(palha[çc]o|clown|circo|piadista)\b"],
-            "cringe": [r"\b(cringe|vergonha alheia|que fase|eca)\b"],
-            "congratulation": [r"\b(parab[ée]ns|gg|vit[oó]ria|conquista|comemorar)\b"],
-            "cute": [r"\b(fof[oa]|lind[oa]|querid|meu bem|awn|nhom)\b"],
-            "dancing": [r"\b(dan[çc]a|dan[çc]ando|dance|rebola|passinho)\b"],
-            "denial": [r"\b(n[aã]o|jamais|nem ferrando|recuso|negado)\b"],
-            "dumb": [r"\b(burro|burrice|idiota|sem no[çc][aã]o|dumb)\b"],
-            "eating": [r"\b(comendo|comi|lanche|janta|almo[çc]o|fome)\b"],
-            "elegant": [r"\b(chique|elegante|classe|refinad[oa]|fino)\b"],
-            "evil": [r"\b(malvado|evil|vil[aã]o|caos|diab[oó]lico)\b"],
-            "euphoria": [r"\b(euforia|extasiad[oa]|alto astral|muito feliz)\b"],
-            "fabulous": [r"\b(fabuloso|maravilhoso|divino|ic[ôo]nico)\b"],
-            "farewell": [r"\b(fui|tchau|flw|at[eé] mais|vou nessa|partiu|indo nessa)\b"],
-            "fight": [r"\b(briga|x1|treta|porrada|duelo)\b"],
-            "gambling": [r"\b(gamba|aposta|odd|cassino|slot|roleta|bet)\b"],
-            "gay": [r"\b(gay|lgbt|orgulho|pride|viado)\b"],
-            "greeting": [r"\b(oi+|ol[áa]|salve|bom dia|boa tarde|boa noite|eae|hey)\b"],
-            "happy": [r"\b(feliz|alegr[ei]|sorriso|contente|deu bom)\b"],
-            "hiding": [r"\b(escondid[oa]|sumi|na moita|invis[ií]vel|hiding)\b"],
-            "hope": [r"\b(espero|tomara|f[eé]|vai dar certo|confio)\b"],
-            "hype": [r"\b(bora|vamo|boa+|insano|brabo|letsgo|hype|comemora)\b"],
-            "judge": [r"\b(julgando|julgar|veredito|culpad[oa]|senten[çc]a)\b"],
-            "kiss": [r"\b(beijo|selinho|kiss|beijinho|xoxo)\b"],
-            "laugh": [r"\b(kkk+|haha+|ri\w+|piada|meme|zuera|engra[çc])\b"],
-            "magic": [r"\b(magia|m[áa]gico|feiti[çc]o|abracadabra|spell)\b"],
-            "mesmerized": [r"\b(hipnotizado|mesmerizado|encantad[oa]|fascinad[oa])\b"],
-            "mockery": [r"\b(zoando|deboche|ironia|kappa|tirando sarro)\b"],
-            "music": [r"\b(m[úu]sica|som|playlist|dj|batida)\b"],
-            "neutral": [r"\b(ok|normal|tanto faz|suave|de boa)\b"],
-            "oblivious": [r"\b(perdid[oa]|boiando|nem vi|desligad[oa]|oblivious)\b"],
-            "overwhelmed": [r"\b(sobrecarregad[oa]|muita coisa|ca[oó]tico|atropelado)\b"],
-            "panic": [r"\b(p[aâ]nico|desespero|socorro|surtei|ferrou)\b"],
-            "peak": [r"\b(peak|auge|top 1|obra prima|cinema)\b"],
-            "praying": [r"\b(am[eé]m|rezando|ora[çc][aã]o|deus queira|🙏)\b"],
-            "rage": [r"\b(rage|tiltei|tiltado|furios[oa]|explodi)\b"],
-            "relaxing": [r"\b(relax|de boa|chill|tranquilo|descansando)\b"],
-            "relief": [r"\b(ufa|ainda bem|al[ií]vio|deu bom)\b"],
-            "running": [r"\b(corre|correndo|run|rush|vaza)\b"],
-            "sad": [r"\b(triste|sad|pena|depress|que ruim|droga|luto|chor)\b"],
-            "scared": [r"\b(medo|assust|tenso|socorro|pavor|cagac[oã])\b"],
-            "seduce": [r"\b(seduz|sedu[çc][aã]o|charmoso|cantada|flert)\b"],
-            "shock": [r"\b(chocado|nossa|caraca|mentira|n[aã]o creio)\b"],
-            "shy": [r"\b(vergonha|t[ií]mid|sem gra[çc]a)\b"],
-            "sleep": [r"\b(sono|dormir|mimir|boa noite|cansad[oa])\b"],
-            "smart": [r"\b(teoria|evid[êe]ncia|l[óo]gica|an[áa]lise|estrat[ée]gia)\b"],
-            "sneaky": [r"\b(sorrateiro|na surdina|quietinho|stealth|sneaky)\b"],
-            "sniffing": [r"\b(cheirando|sniff|farejando|nariz|snif)\b"],
-            "stare": [r"\b(encarando|olhar fixo|stare|te olhando)\b"],
-            "spinning": [r"\b(girando|rodando|spin|pi[aã]o|tontura)\b"],
-            "superiority": [r"\b(ez|f[áa]cil|amassei|melhor que|superior)\b"],
-            "suspicion": [r"\b(sus|suspeit|estranho|investiga|desconfi)\b"],
-            "tired": [r"\b(cansad[oa]|exaust[oa]|sem energia|mo[ií]do)\b"],
-            "thinking": [r"\b(hmm|pensando|deixa eu ver|talvez|ser[aá])\b"],
-            "waiting": [r"\b(espera|aguarda|esperando|j[áa] volto|fila)\b"],
-        }
-
-        for emotion, patterns in rule_map.items():
-            for pattern in patterns:
-                if re.search(pattern, t):
-                    score[emotion] += 2
+        score = self.emotion_rules.score(t)
 
         if "?" in t:
             score["attention"] += 1
@@ -313,35 +360,7 @@ class EmoteManager:
         return primary, secondary
 
     def _candidate_pool(self, channel, emotion, secondary_emotion=None):
-        normalized_channel = (channel or "").lower()
-        channel_map = self.channel_emote_map.get(normalized_channel, {})
-        has_channel_config = normalized_channel in self.channel_emote_map
-        candidates = []
-
-        emotions = [emotion]
-        if secondary_emotion and secondary_emotion not in (emotion, "neutral"):
-            emotions.append(secondary_emotion)
-        emotions.append("neutral")
-
-        for key in emotions:
-            channel_emotes = channel_map.get(key, [])
-            global_emotes = self.global_emote_map.get(key, [])
-
-            if channel_emotes:
-                candidates.extend(channel_emotes)
-            elif has_channel_config:
-                candidates.extend(global_emotes)
-            else:
-                candidates.extend(global_emotes)
-
-        unique = []
-        seen = set()
-        for e in candidates:
-            if e not in seen:
-                seen.add(e)
-                unique.append(e)
-
-        return unique
+        return self.emote_index.candidate_pool((channel or "").lower(), emotion, secondary_emotion)
 
     def _resolve_emotions(self, text, mood=None):
         """
@@ -386,6 +405,7 @@ class EmoteManager:
         )
         return inferred_primary, inferred_secondary
 
+    @channel_locked
     def choose_emote(self, channel, text, mood=None, context_text=None):
         analysis_text = " ".join([p for p in [context_text, text] if p])
         emotion, secondary_emotion = self._resolve_emotions(analysis_text, mood=mood)
@@ -397,10 +417,12 @@ class EmoteManager:
             mood,
             (analysis_text or "")[:180],
         )
-        candidates = self._candidate_pool(channel, emotion, secondary_emotion=secondary_emotion)
+        index = self.emote_index
+        candidates = index.candidate_pool(channel.lower(), emotion, secondary_emotion)
 
         channel_hist = self.channel_emote_history[channel.lower()]
-        blocked = set(channel_hist) | set(self.global_emote_history)
+        with self._global_history_lock:
+            blocked = set(channel_hist) | set(self.global_emote_history)
 
         non_repeated = [e for e in candidates if e not in blocked]
         if not non_repeated:
@@ -412,7 +434,7 @@ class EmoteManager:
             logging.debug("[Emote] Nenhum emote encontrado para canal=%s emotion=%s", channel, emotion)
             return ""
 
-        chosen = random.choice(non_repeated)
+        chosen = self._pick_candidate(channel, non_repeated, emotion)
         if chosen in blocked:
             alternatives = [e for e in candidates if e not in blocked and e != chosen]
             if alternatives:
@@ -424,9 +446,10 @@ class EmoteManager:
                 return ""
 
         last_channel_emote = channel_hist[-1] if channel_hist else None
-        last_global_emote = self.global_emote_history[-1] if self.global_emote_history else None
-
-        self.global_emote_history.append(chosen)
+        with self._global_history_lock:
+            last_global_emote = self.global_emote_history[-1] if self.global_emote_history else None
+            self.global_emote_history.append(chosen)
+            global_history = list(self.global_emote_history)
         channel_hist.append(chosen)
         self.channel_emotion_history[channel.lower()].append(emotion)
         self.last_selected_emote_by_channel[channel.lower()] = chosen
@@ -446,11 +469,11 @@ class EmoteManager:
             candidates,
             chosen,
             list(channel_hist),
-            list(self.global_emote_history),
+            global_history,
         )
         
-        if chosen in self.zero_width_emotes:
-            companion = self._find_zero_width_companion(chosen, candidates)
+        if chosen in index.zero_width:
+            companion = self._find_zero_width_companion(chosen, candidates, index=index)
             if companion:
                 logging.debug("[Emote] %s é zero_width, emparelhado com %s", chosen, companion)
                 return f"{companion} {chosen}"
@@ -458,36 +481,53 @@ class EmoteManager:
             
         return chosen
     
-    def _find_zero_width_companion(self, chosen, candidates):
+    def _pick_candidate(self, channel, candidates, emotion):
+        """Sorteia entre os candidatos, puxando para o que o chat do canal está usando agora."""
+        if self.usage_tracker is None:
+            return random.choice(candidates)
+        weights = [
+            1.0 + USAGE_BIAS * self.usage_tracker.popularity(channel, emote, emotion=emotion)
+            for emote in candidates
+        ]
+        if all(weight == 1.0 for weight in weights):
+            return random.choice(candidates)
+        return random.choices(candidates, weights=weights, k=1)[0]
+
+    def _find_zero_width_companion(self, chosen, candidates, index=None):
         """
         Escolhe um emote normal (não zero-width) pra acompanhar um emote
         zero-width, garantindo que ele nunca seja enviado sozinho -- mesmo
         que a flag zero_width do 7TV esteja errada pra algum emote, o pior
         caso vira "dois emotes juntos" em vez de algo quebrado/invisível.
         """
-        same_context = [e for e in candidates if e != chosen and e not in self.zero_width_emotes]
+        index = index or self.emote_index
+        same_context = [e for e in candidates if e != chosen and e not in index.zero_width]
         if same_context:
             return random.choice(same_context)
 
-        fallback_pool = [e for e in self.get_all_emotes() if e != chosen and e not in self.zero_width_emotes]
+        fallback_pool = [e for e in index.non_zero_width if e != chosen]
         if fallback_pool:
             return random.choice(fallback_pool)
 
         return None
 
+    @channel_locked
     def get_debug_state(self, channel):
         normalized_channel = channel.lower()
         channel_hist = list(self.channel_emote_history[normalized_channel])
+        with self._global_history_lock:
+            global_hist = list(self.global_emote_history)
         return {
             "last_selected_channel": self.last_selected_emote_by_channel.get(normalized_channel),
             "last_resolved_emotion": self.last_resolved_emotion_by_channel.get(normalized_channel),
             "last_channel_emote": channel_hist[-1] if channel_hist else None,
-            "last_global_emote": self.global_emote_history[-1] if self.global_emote_history else None,
+            "last_global_emote": global_hist[-1] if global_hist else None,
             "emotion_history": list(self.channel_emotion_history[normalized_channel]),
             "channel_history": channel_hist,
-            "global_history": list(self.global_emote_history),
+            "global_history": global_hist,
         }
 
+    @channel_locked
     def ensure_unique_phrase(self, channel, message):
         normalized = re.sub(r"\s+", " ", message.strip().lower())
         hist = self.channel_phrase_history[channel.lower()]
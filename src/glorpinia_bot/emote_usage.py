@@ -0,0 +1,264 @@
+"""Estatísticas em streaming de quais emotes o chat de cada canal está usando.
+
+Cada canal tem um `ChannelEmoteUsage` de tamanho fixo:
+
+- um count-min sketch (`depth` x `width` contadores) que estima quantas vezes
+  um emote foi usado, e em que emoção (chave "emoção:emote"), em O(depth);
+- um top-K no estilo SpaceSaving com os emotes mais usados, que dá a escala
+  (o mais popular do momento) para normalizar as estimativas.
+
+O decaimento é "forward decay": cada uso entra com peso
+2^((t - t0) / HALF_LIFE) e a leitura divide por 2^((agora - t0) / HALF_LIFE).
+Assim nada precisa ser percorrido para envelhecer; quando o peso fica grande
+demais (inclusive depois de semanas sem uso ou de um restart com snapshot
+velho), tudo é renormalizado de uma vez antes de qualquer leitura ou escrita. A memória por canal não depende do
+volume do chat.
+
+Snapshots vão para a tabela `emote_usage` do banco de emotes, periodicamente
+e no shutdown, e voltam no startup.
+"""
+
+import json
+import logging
+import threading
+import time
+import zlib
+
+from .seventv_channel_sync import CACHE_DB_PATH
+from .storage import get_store
+
+SKETCH_WIDTH = 512
+SKETCH_DEPTH = 4
+TOP_K = 32
+HALF_LIFE_SECONDS = 30 * 60  # "popular agora" = últimos ~30 min de chat
+# Acima disso o peso dos usos novos é grande demais para float (2^1024 estoura
+# depois de ~21 dias de meia-vida de 30 min); renormaliza antes.
+MAX_DECAY_EXPONENT = 64
+SNAPSHOT_INTERVAL_SECONDS = 5 * 60
+# Emotes repetidos numa mesma mensagem ("KEKW KEKW KEKW") contam no máximo isso.
+MAX_COUNT_PER_MESSAGE = 3
+
+
+class ChannelEmoteUsage:
+    """Sketch + top-K com decaimento de um canal. Não é thread-safe; o tracker trava."""
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, top_k=TOP_K, half_life=HALF_LIFE_SECONDS, now=None):
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.half_life = half_life
+        self.landmark = now if now is not None else time.time()
+        self.counters = [0.0] * (width * depth)
+        self.top = {}  # emote -> contagem (na escala do landmark)
+
+    def _weight(self, now):
+        return 2.0 ** ((now - self.landmark) / self.half_life)
+
+    def _slots(self, key):
+        data = key.encode("utf-8")
+        return [row * self.width + zlib.crc32(data, row) % self.width for row in range(self.depth)]
+
+    def _advance(self, now):
+        """Move o landmark para `now` se o peso estiver perto de estourar."""
+        exponent = (now - self.landmark) / self.half_life
+        if exponent <= MAX_DECAY_EXPONENT:
+            return
+        # 2^-exponent vai a 0.0 sem erro; 1 / 2^exponent estouraria.
+        factor = 2.0 ** -exponent
+        self.counters = [count * factor for count in self.counters]
+        self.top = {emote: count * factor for emote, count in self.top.items() if count * factor > 0}
+        self.landmark = now
+
+    def add(self, emote, emotion=None, count=1, now=None):
+        now = now if now is not None else time.time()
+        self._advance(now)
+        weight = self._weight(now) * count
+
+        for key in (emote, f"{emotion}:{emote}") if emotion else (emote,):
+            for slot in self._slots(key):
+                self.counters[slot] += weight
+
+        # SpaceSaving: quem entra no lugar do menor herda a contagem dele (superestima, nunca subestima).
+        if emote in self.top or len(self.top) < self.top_k:
+            self.top[emote] = self.top.get(emote, 0.0) + weight
+        else:
+            weakest = min(self.top, key=self.top.get)
+            self.top[emote] = self.top.pop(weakest) + weight
+
+    def estimate(self, emote, emotion=None, now=None):
+        """Usos recentes (com decaimento) estimados; `emotion` restringe ao contexto."""
+        now = now if now is not None else time.time()
+        self._advance(now)
+        key = f"{emotion}:{emote}" if emotion else emote
+        raw = min(self.counters[slot] for slot in self._slots(key))
+        return raw / self._weight(now)
+
+    def top_emotes(self, limit=10, now=None):
+        now = now if now is not None else time.time()
+        self._advance(now)
+        scale = self._weight(now)
+        ranked = sorted(self.top.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(emote, count / scale) for emote, count in ranked]
+
+    def peak(self, now=None):
+        now = now if now is not None else time.time()
+        self._advance(now)
+        if not self.top:
+            return 0.0
+        return max(self.top.values()) / self._weight(now)
+
+    def memory_bytes(self):
+        # float = 24 bytes + 8 do ponteiro na lista; entrada de dict ~ 100 bytes.
+        return len(self.counters) * 32 + len(self.top) * 100
+
+    def to_snapshot(self):
+        return {
+            "width": self.width,
+            "depth": self.depth,
+            "half_life": self.half_life,
+            "landmark": self.landmark,
+            "counters": self.counters,
+            "top": self.top,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data, top_k=TOP_K, now=None):
+        usage = cls(width=data["width"], depth=data["depth"], top_k=top_k, half_life=data["half_life"], now=data["landmark"])
+        usage.counters = [float(count) for count in data["counters"]]
+        usage.top = {emote: float(count) for emote, count in data["top"].items()}
+        usage._advance(now if now is not None else time.time())
+        return usage
+
+
+class EmoteUsageTracker:
+    """
+    Alimentado pelo `on_message`: conta os emotes conhecidos (vindos do
+    `EmoteIndex` atual) que aparecem no chat, junto com a emoção inferida do
+    texto da mensagem. O `EmoteManager.choose_emote` consulta `popularity`
+    para puxar a escolha para o que o chat está usando agora.
+    """
+
+    def __init__(self, emote_manager, db_path=CACHE_DB_PATH):
+        self.emote_manager = emote_manager
+        self.channels = {}
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._stop = threading.Event()
+        self._thread = None
+        self.store = get_store(db_path)
+        try:
+            self.store.execute("""
+                CREATE TABLE IF NOT EXISTS emote_usage (
+                    channel TEXT PRIMARY KEY,
+                    saved_at REAL NOT NULL,
+                    snapshot TEXT NOT NULL
+                )
+            """)
+        except Exception as e:
+            logging.error("[EmoteUsage] Falha ao inicializar a tabela de uso de emotes: %s", e)
+
+    # --- Coleta ---
+
+    def observe(self, channel, text, now=None):
+        """Registra os emotes conhecidos de uma mensagem do chat. Retorna quantos contaram."""
+        known = self.emote_manager.emote_index.all_emotes
+        counts = {}
+        for token in (text or "").split():
+            if token in known:
+                counts[token] = min(counts.get(token, 0) + 1, MAX_COUNT_PER_MESSAGE)
+        if not counts:
+            return 0
+
+        remaining = " ".join(token for token in text.split() if token not in known)
+        emotion, _ = self.emote_manager.infer_emotion(remaining) if remaining else ("neutral", None)
+        normalized = channel.lower()
+        with self._lock:
+            usage = self.channels.get(normalized)
+            if usage is None:
+                usage = self.channels[normalized] = ChannelEmoteUsage(now=now)
+            for emote, count in counts.items():
+                usage.add(emote, emotion=emotion, count=count, now=now)
+            self._dirty.add(normalized)
+        return sum(counts.values())
+
+    # --- Consulta ---
+
+    def popularity(self, channel, emote, emotion=None, now=None):
+        """
+        Uso recente do emote no canal em relação ao mais popular, entre 0 e 1.
+        Com `emotion`, soma o uso naquele contexto emocional (peso dobrado).
+        """
+        # peak e estimate precisam ver o mesmo estado (um observe pode renormalizar no meio).
+        with self._lock:
+            usage = self.channels.get(channel.lower())
+            if usage is None:
+                return 0.0
+            peak = usage.peak(now)
+            if peak <= 0:
+                return 0.0
+            score = usage.estimate(emote, now=now)
+            if emotion:
+                score += 2 * usage.estimate(emote, emotion=emotion, now=now)
+        return min(score / (3 * peak if emotion else peak), 1.0)
+
+    def top_emotes(self, channel, limit=10):
+        with self._lock:
+            usage = self.channels.get(channel.lower())
+            return usage.top_emotes(limit) if usage else []
+
+    def memory_bytes(self):
+        with self._lock:
+            return sum(usage.memory_bytes() for usage in self.channels.values())
+
+    # --- Persistência ---
+
+    def load_snapshots(self):
+        try:
+            rows = self.store.query("SELECT channel, snapshot FROM emote_usage")
+        except Exception as e:
+            logging.error("[EmoteUsage] Falha ao ler snapshots de uso de emotes: %s", e)
+            return 0
+        with self._lock:
+            for channel, snapshot in rows:
+                try:
+                    self.channels[channel] = ChannelEmoteUsage.from_snapshot(json.loads(snapshot))
+                except (KeyError, TypeError, ValueError) as e:
+                    logging.warning("[EmoteUsage] Snapshot inválido para #%s ignorado: %s", channel, e)
+        logging.info("[EmoteUsage] %s snapshots de uso de emotes carregados.", len(rows))
+        return len(rows)
+
+    def save_snapshots(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = [
+                (channel, time.time(), json.dumps(self.channels[channel].to_snapshot()))
+                for channel in dirty if channel in self.channels
+            ]
+        if not rows:
+            return 0
+        try:
+            self.store.executemany(
+                "INSERT OR REPLACE INTO emote_usage (channel, saved_at, snapshot) VALUES (?, ?, ?)", rows
+            )
+        except Exception as e:
+            logging.error("[EmoteUsage] Falha ao salvar snapshots de uso de emotes: %s", e)
+            with self._lock:
+                self._dirty.update(channel for channel, _, _ in rows)
+            return 0
+        return len(rows)
+
+    def start_snapshot_thread(self, interval=SNAPSHOT_INTERVAL_SECONDS):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._snapshot_loop, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop_snapshot_thread(self):
+        """Para a thread e grava o que ainda estiver pendente (usado no shutdown)."""
+        self._stop.set()
+        self.save_snapshots()
+
+    def _snapshot_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.save_snapshots()
@@ -0,0 +1,289 @@
+"""Motor de inferência de emoção por regras (regex) carregadas de arquivo.
+
+As regras ficam em `emotion_rules.txt` (uma por linha, `emocao: regex`) e são
+compiladas uma vez na carga numa única alternação, com um grupo nomeado por
+regra (`r0`, `r1`, ...). O `finditer` varre o texto uma vez com essa
+alternação (numa versão sem os grupos, que é bem mais barata para o motor de
+regex) e só para nas posições onde alguma regra começa; ali a versão com
+grupos nomeados diz qual regra casou.
+
+Regras que se sobrepõem e começam no mesmo ponto (como "não" e "não creio")
+continuam pontuando juntas: nessas posições as demais regras compatíveis com
+o primeiro caractere são conferidas com `match`. O resultado é o mesmo de um
+`re.search` por regra. O primeiro caractere de cada regra é lido do próprio
+texto da regra, para os formatos usados no arquivo; regra de formato
+desconhecido só fica sem esse filtro.
+"""
+
+import logging
+import os
+import re
+from collections import defaultdict
+
+RULE_SCORE = 2
+
+
+def load_emotion_rules(file_path):
+    """Lê `emocao: regex` por linha. Linhas vazias e `#` são ignoradas."""
+    rules = []
+    if not os.path.exists(file_path):
+        logging.warning(f"[Emote] Arquivo de regras de emoção não encontrado: {file_path}")
+        return rules
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_number, raw in enumerate(f, start=1):
+            line = raw.strip()
+            if not line or line.startswith("#") or ":" not in line:
+                continue
+            emotion, pattern = line.split(":", 1)
+            emotion = emotion.strip().lower()
+            pattern = pattern.strip()
+            if not emotion or not pattern:
+                continue
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                logging.error(f"[Emote] Regra inválida em {file_path}:{line_number} ({emotion}): {e}")
+                continue
+            rules.append((emotion, pattern))
+    return rules
+
+
+def _rule_group(index):
+    return f"r{index}"
+
+
+_SPECIAL = set(".^$*+?{}[]\\|()")
+
+
+def _split_top_level(body):
+    """Divide `body` nos `|` de nível zero (fora de grupos e classes). None se os parênteses não fecham."""
+    parts = []
+    depth = 0
+    in_class = False
+    escaped = False
+    current = []
+    for char in body:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif char == "|" and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    if depth or in_class or escaped:
+        return None
+    parts.append("".join(current))
+    return parts
+
+
+def _closing_paren(pattern, start):
+    """Índice do `)` que fecha o `(` em `start`, ou None."""
+    depth = 0
+    in_class = False
+    escaped = False
+    for position in range(start, len(pattern)):
+        char = pattern[position]
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return position
+    return None
+
+
+def _is_optional(rest):
+    return rest[:1] in ("?", "*") or rest.startswith(("{0", "{,"))
+
+
+def _first_chars(body):
+    """
+    Caracteres com que todo match de `body` começa, lidos direto do texto da
+    regra para os formatos do emotion_rules.txt (`(palavra|[óo]dio|...)`,
+    `kkk+`). None quando o formato não é reconhecido: a regra fica sem filtro.
+    """
+    alternatives = _split_top_level(body)
+    if alternatives is None:
+        return None
+    chars = set()
+    for alternative in alternatives:
+        if not alternative:
+            return None
+        head = alternative[0]
+        if head == "(":
+            if alternative.startswith("(?"):
+                return None
+            end = _closing_paren(alternative, 0)
+            if end is None or _is_optional(alternative[end + 1:]):
+                return None
+            inner = _first_chars(alternative[1:end])
+            if inner is None:
+                return None
+            chars |= inner
+        elif head == "[":
+            end = alternative.find("]", 1)
+            members = alternative[1:end]
+            if end < 0 or not members or members[0] == "^" or "\\" in members or "-" in members[1:-1]:
+                return None
+            if _is_optional(alternative[end + 1:]):
+                return None
+            chars.update(members)
+        elif head not in _SPECIAL:
+            if _is_optional(alternative[1:]):
+                return None
+            chars.add(head)
+        else:
+            return None
+    return chars
+
+
+def _has_top_level_alternation(pattern):
+    """`|` fora de grupos e classes (ex.: `\\bfoo|bar`): aí o `\\b` inicial não vale para a regra toda."""
+    parts = _split_top_level(pattern)
+    return parts is None or len(parts) > 1
+
+
+def _starts_at_boundary(pattern):
+    return pattern.startswith(r"\b") and not _has_top_level_alternation(pattern)
+
+
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def _without_captures(pattern):
+    """
+    Troca os grupos de captura da regra por `(?:...)`. No padrão combinado
+    cada grupo de captura custa a cada ramo tentado; o valor capturado nunca é
+    usado. (Regras com referência a grupo, `\\1`, nem entram no combinado.)
+    """
+    out = []
+    in_class = False
+    escaped = False
+    for position, char in enumerate(pattern):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(" and not pattern.startswith("?", position + 1):
+            out.append("(?:")
+            continue
+        out.append(char)
+    return "".join(out)
+
+
+_GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+
+def _scoped_flags(pattern):
+    """`(?i)regra` vira `(?i:regra)`: flags globais só são aceitas no começo do padrão combinado."""
+    match = _GLOBAL_FLAGS.match(pattern)
+    if not match:
+        return pattern
+    return f"(?{match.group(1)}:{pattern[match.end():]})"
+
+
+def _combined_pattern(at_boundary, anywhere):
+    """`at_boundary` já vêm sem o `\\b` inicial: um só `\\b` vale para todas."""
+    branches = ([r"\b(?:" + "|".join(at_boundary) + ")"] if at_boundary else []) + anywhere
+    return "(?:" + "|".join(branches) + ")"
+
+
+class EmotionRuleEngine:
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._emotions = [emotion for emotion, _ in self.rules]
+        self._compiled = [re.compile(pattern) for _, pattern in self.rules]
+        plain = {True: [], False: []}
+        named = {True: [], False: []}
+        # Para conferir regras sobrepostas: primeiro caractere -> regras que podem começar com ele.
+        self._by_first_char = defaultdict(list)
+        self._any_first_char = []
+        # Referência a grupo (`\1`) muda de sentido dentro do padrão combinado: essas vão com `search`.
+        self._standalone = []
+        for index, (_, pattern) in enumerate(self.rules):
+            if _BACKREFERENCE.search(pattern):
+                self._standalone.append(index)
+                continue
+            pattern = _scoped_flags(pattern)
+            at_boundary = _starts_at_boundary(pattern)
+            body = _without_captures(pattern[2:] if at_boundary else pattern)
+            plain[at_boundary].append(body)
+            named[at_boundary].append(f"(?P<{_rule_group(index)}>{body})")
+            chars = _first_chars(pattern[2:] if at_boundary else pattern)
+            if chars is None:
+                self._any_first_char.append(index)
+            for char in chars or ():
+                self._by_first_char[char].append(index)
+
+        self._scanner = None
+        self._rules_at = None
+        if plain[True] or plain[False]:
+            # O `finditer` roda o padrão sem grupos nomeados (mais barato) e
+            # só para onde alguma regra começa; ali o mesmo padrão com um grupo
+            # nomeado por regra (`r12`) diz qual regra casou.
+            if plain[False]:
+                self._scanner = re.compile(f"(?={_combined_pattern(plain[True], plain[False])})")
+            else:
+                self._scanner = re.compile(r"\b(?=(?:" + "|".join(plain[True]) + "))")
+            self._rules_at = re.compile(_combined_pattern(named[True], named[False]))
+
+    @classmethod
+    def from_file(cls, file_path):
+        return cls(load_emotion_rules(file_path))
+
+    def matching_rules(self, text):
+        """Índices das regras que casam em algum ponto de `text`."""
+        hits = {index for index in self._standalone if self._compiled[index].search(text)}
+        if self._scanner is None:
+            return hits
+
+        for candidate in self._scanner.finditer(text):
+            start = candidate.start()
+            first = self._rules_at.match(text, start)
+            if first is not None:
+                hits.add(int(first.lastgroup[1:]))
+            # A alternação só devolve a primeira regra da posição; regras
+            # sobrepostas que começam no mesmo ponto ("não" e "não creio")
+            # são conferidas uma a uma, só as compatíveis com o caractere.
+            for index in self._by_first_char.get(text[start], ()):
+                if index not in hits and self._compiled[index].match(text, start):
+                    hits.add(index)
+            for index in self._any_first_char:
+                if index not in hits and self._compiled[index].match(text, start):
+                    hits.add(index)
+        return hits
+
+    def score(self, text):
+        """
+        Pontuação por emoção (RULE_SCORE por regra que casa), na ordem do
+        arquivo: quem chama desempata pela ordem de inserção.
+        """
+        score = defaultdict(int)
+        for index in sorted(self.matching_rules(text)):
+            score[self._emotions[index]] += RULE_SCORE
+        return score
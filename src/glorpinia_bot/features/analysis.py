@@ -8,7 +8,7 @@ class AnalysisMode:
     def trigger_analysis(self, channel, author, specific_query=""):
         logging.info(f"[Analysis] Triggered by {author} in {channel}")
 
-        recent_msgs = list(self.bot.recent_messages.get(channel, []))
+        recent_msgs = self.bot.get_recent_messages(channel)
         
         now = time.time()
         chat_log = []
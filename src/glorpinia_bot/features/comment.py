@@ -67,7 +67,7 @@ class Comment:
             
             # Coleta de Contexto
             now = time.time()
-            recent_msgs = self.bot.recent_messages.get(channel, None)
+            recent_msgs = self.bot.get_recent_messages(channel)
             
             if not recent_msgs:
                 return
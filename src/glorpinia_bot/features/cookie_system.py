@@ -1,24 +1,135 @@
-import sqlite3
 import os
 import threading
 import time
 import logging
 import re
 
+from collections import defaultdict
+
+from ..storage import get_store
+
+
+class _RankCache:
+    """
+    Top-K mantido incrementalmente para os leaderboards.
+
+    `entries` guarda nick -> (score, saldo) e `bound` é um limite superior para
+    o score de qualquer conta fora do cache; enquanto houver `limit` entradas
+    acima desse limite, o ranking sai do cache sem consultar o banco.
+    `score` devolve None para contas que não entram nesse ranking.
+    """
+
+    def __init__(self, size, score):
+        self.size = size
+        self.score = score
+        self.entries = None
+        self.bound = float("-inf")
+        self.version = 0
+
+    def invalidate(self):
+        self.version += 1
+        self.entries = None
+
+    def update(self, nick, value):
+        self.version += 1
+        if self.entries is None:
+            return
+        score = self.score(value)
+        if nick in self.entries:
+            if score is None or score < self.bound:
+                del self.entries[nick]
+                if score is not None:
+                    self.bound = max(self.bound, score)
+            else:
+                self.entries[nick] = (score, value)
+        elif score is not None and score > self.bound:
+            self.entries[nick] = (score, value)
+
+        if len(self.entries) > self.size * 2:
+            ranked = sorted(self.entries.items(), key=lambda item: item[1][0], reverse=True)
+            for evicted_nick, (evicted_score, _) in ranked[self.size:]:
+                del self.entries[evicted_nick]
+                self.bound = max(self.bound, evicted_score)
+
+    def remove(self, nick):
+        self.version += 1
+        if self.entries is not None:
+            self.entries.pop(nick, None)
+
+    def top(self, limit):
+        if self.entries is None:
+            return None
+        ranked = sorted(self.entries.items(), key=lambda item: (-item[1][0], item[0]))
+        if len(ranked) < limit and self.bound != float("-inf"):
+            return None
+        return [(nick, value) for nick, (_, value) in ranked[:limit]]
+
+    def fill(self, rows, version):
+        """Preenche a partir de uma consulta; descarta se houve escrita no meio."""
+        if version != self.version:
+            return
+        self.entries = {nick: (self.score(value), value) for nick, value in rows if self.score(value) is not None}
+        if len(rows) >= self.size and self.entries:
+            self.bound = min(score for score, _ in self.entries.values())
+        else:
+            self.bound = float("-inf")
+
+
 class CookieSystem:
     COOKIE_COMMAND_PATTERN = re.compile(
         r"(?:\[{1,2}\s*)?COOKIE\s*:\s*(GIVE|TAKE)\s*:\s*@?([A-Za-z0-9_]+)\s*:\s*(\d+)(?:\s*\]{1,2})?",
         flags=re.IGNORECASE,
     )
 
-    def __init__(self, bot):
+    # Buffer de acúmulo do +1 por mensagem: descarrega a cada N ms ou M entradas.
+    ACCRUAL_FLUSH_INTERVAL_MS = 500
+    ACCRUAL_FLUSH_MAX_ENTRIES = 100
+
+    # Conta de emissão do ledger: todo cookie criado sai dela (fica negativa) e
+    # todo cookie destruído volta para ela, então a soma dos saldos é sempre 0.
+    MINT_ACCOUNT = "__mint__"
+    LEADERBOARD_CACHE_SIZE = 10
+
+    # Bônus diário preguiçoso: cada conta guarda a última "época" (dia UTC)
+    # recebida e o bônus atrasado é calculado na leitura e liquidado na escrita,
+    # sem UPDATE na tabela inteira.
+    DAILY_BONUS = 5
+    BONUS_PERIOD_SECONDS = 86400
+    # Chave de ranking independente da época: saldo efetivo = chave + DAILY_BONUS * época.
+    RANK_KEY_SQL = f"cookie_count - {DAILY_BONUS} * last_claimed_epoch"
+
+    def __init__(self, bot, db_path="glorpinia_cookies.db"):
         """
         Inicializa o sistema de cookies (moeda).
         'bot' é a instância principal do TwitchIRC.
         """
         print("[Feature] CookieSystem Initialized.")
         self.bot = bot
-        self.db_path = "glorpinia_cookies.db"
+        self.db_path = db_path
+        self.store = get_store(self.db_path)
+
+        # Acúmulos pendentes (nick -> delta), espelhados num journal append-only.
+        # Cada linha do journal tem um número de sequência; o último aplicado fica
+        # gravado em `cookie_meta` na mesma transação do flush, então o replay
+        # após um crash nunca conta um acúmulo duas vezes.
+        self.journal_path = f"{self.db_path}.journal"
+        self._accrual_buffer = defaultdict(int)
+        self._accrual_entries = 0
+        self._accrual_lock = threading.Lock()
+        self._flush_lock = threading.RLock()
+        self._journal_seq = 0
+        self._journal_file = None
+
+        # Caches de ranking, atualizados pela thread de escrita a cada transação.
+        # Guardam a chave de ranking; a elegibilidade das dívidas depende da época,
+        # então os caches são descartados quando o dia vira.
+        self._cache_lock = threading.Lock()
+        self._cache_epoch = self._current_epoch()
+        self._top_cache = _RankCache(self.LEADERBOARD_CACHE_SIZE, lambda key: key)
+        self._debt_cache = _RankCache(
+            self.LEADERBOARD_CACHE_SIZE,
+            lambda key: -key if key + self.DAILY_BONUS * self._cache_epoch < 0 else None,
+        )
         
         self.FORBIDDEN_NICKS = {
             "system", "usuario", "user", "usuário", "você", "eu", "everyone", "here", "chat",
@@ -27,40 +138,199 @@ class CookieSystem:
         }
 
         self._initialize_db()
+        self._replay_journal()
         self._cleanup_forbidden_users()
         self.timer_running = True
-        self.last_bonus_time = 0
         
         if self.bot:
-            self.thread = threading.Thread(target=self._daily_bonus_thread, daemon=True)
-            self.thread.start()
+            self.flush_thread = threading.Thread(target=self._accrual_flush_thread, daemon=True)
+            self.flush_thread.start()
 
     def _initialize_db(self):
-        """Cria a tabela de cookies se ela não existir."""
+        """Cria as tabelas de saldo e do ledger, e a conta de emissão em bancos antigos."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                c.execute("""
-                    CREATE TABLE IF NOT EXISTS user_cookies (
-                        user_nick TEXT PRIMARY KEY,
-                        cookie_count INTEGER NOT NULL DEFAULT 0
-                    )
-                """)
-                conn.commit()
+            self.store.transaction(self._initialize_schema)
         except Exception as e:
             logging.error(f"[CookieSystem] Falha ao inicializar o banco de dados: {e}")
 
+    def _initialize_schema(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_cookies (
+                user_nick TEXT PRIMARY KEY,
+                cookie_count INTEGER NOT NULL DEFAULT 0,
+                last_claimed_epoch INTEGER
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(user_cookies)")}
+        if "last_claimed_epoch" not in columns:
+            # Bancos antigos: o bônus até hoje já foi pago pela thread diária.
+            conn.execute("ALTER TABLE user_cookies ADD COLUMN last_claimed_epoch INTEGER")
+            conn.execute(
+                "UPDATE user_cookies SET last_claimed_epoch = ? WHERE user_nick != ?",
+                (self._current_epoch(), self.MINT_ACCOUNT),
+            )
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cookie_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cookie_ledger (
+                id INTEGER PRIMARY KEY,
+                ts REAL NOT NULL,
+                from_nick TEXT NOT NULL,
+                to_nick TEXT NOT NULL,
+                amount INTEGER NOT NULL,
+                reason TEXT
+            )
+        """)
+        conn.execute("DROP INDEX IF EXISTS idx_user_cookies_count")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_user_cookies_rank ON user_cookies ({self.RANK_KEY_SQL})")
+
+        has_mint = conn.execute(
+            "SELECT 1 FROM user_cookies WHERE user_nick = ?", (self.MINT_ACCOUNT,)
+        ).fetchone()
+        if not has_mint:
+            # Gênese: o que já existe no banco passa a ter sido emitido pela conta de emissão.
+            total = conn.execute("SELECT COALESCE(SUM(cookie_count), 0) FROM user_cookies").fetchone()[0]
+            conn.execute(
+                "INSERT INTO user_cookies (user_nick, cookie_count) VALUES (?, ?)", (self.MINT_ACCOUNT, -total)
+            )
+            conn.execute(
+                "INSERT INTO cookie_ledger (ts, from_nick, to_nick, amount, reason) VALUES (?, ?, '*', ?, 'genesis')",
+                (time.time(), self.MINT_ACCOUNT, total),
+            )
+            if total:
+                logging.info(f"[CookieSystem] Ledger inicializado: {total} cookies existentes registrados na emissão.")
+
+    def _current_epoch(self):
+        return int(time.time() // self.BONUS_PERIOD_SECONDS)
+
+    def _settle_bonus(self, conn, nicks, epoch):
+        """Liquida o bônus diário atrasado das contas, debitando a conta de emissão."""
+        nicks = [nick for nick in set(nicks) if nick != self.MINT_ACCOUNT]
+        if not nicks:
+            return
+        placeholders = ", ".join("?" for _ in nicks)
+        rows = conn.execute(
+            f"""
+            SELECT user_nick, ? - last_claimed_epoch FROM user_cookies
+            WHERE user_nick IN ({placeholders}) AND last_claimed_epoch < ?
+            """,
+            [epoch] + nicks + [epoch],
+        ).fetchall()
+        if not rows:
+            return
+        now = time.time()
+        conn.executemany(
+            "UPDATE user_cookies SET cookie_count = cookie_count + ?, last_claimed_epoch = ? WHERE user_nick = ?",
+            [(days * self.DAILY_BONUS, epoch, nick) for nick, days in rows],
+        )
+        total = sum(days for _, days in rows) * self.DAILY_BONUS
+        conn.execute(
+            "UPDATE user_cookies SET cookie_count = cookie_count - ? WHERE user_nick = ?", (total, self.MINT_ACCOUNT)
+        )
+        conn.executemany(
+            "INSERT INTO cookie_ledger (ts, from_nick, to_nick, amount, reason) VALUES (?, ?, ?, ?, 'daily_bonus')",
+            [(now, self.MINT_ACCOUNT, nick, days * self.DAILY_BONUS) for nick, days in rows],
+        )
+
+    def _post(self, conn, from_nick, to_nick, amount, reason, require_funds=False):
+        """
+        Lançamento de partida dobrada dentro da transação corrente: debita,
+        credita e registra no ledger. Com `require_funds`, o débito só acontece
+        se o saldo cobrir o valor (checado no próprio UPDATE, sem corrida).
+        O bônus diário pendente das duas contas é liquidado antes.
+        """
+        epoch = self._current_epoch()
+        self._settle_bonus(conn, (from_nick, to_nick), epoch)
+        if require_funds:
+            cursor = conn.execute(
+                "UPDATE user_cookies SET cookie_count = cookie_count - ? WHERE user_nick = ? AND cookie_count >= ?",
+                (amount, from_nick, amount),
+            )
+            if cursor.rowcount == 0:
+                return False
+        else:
+            conn.execute(self._UPSERT_SQL, (from_nick, -amount, self._new_account_epoch(from_nick, epoch)))
+        conn.execute(self._UPSERT_SQL, (to_nick, amount, self._new_account_epoch(to_nick, epoch)))
+        conn.execute(
+            "INSERT INTO cookie_ledger (ts, from_nick, to_nick, amount, reason) VALUES (?, ?, ?, ?, ?)",
+            (time.time(), from_nick, to_nick, amount, reason),
+        )
+        self._refresh_rank_caches(conn, (from_nick, to_nick))
+        return True
+
+    _UPSERT_SQL = """
+        INSERT INTO user_cookies (user_nick, cookie_count, last_claimed_epoch) VALUES (?, ?, ?)
+        ON CONFLICT(user_nick) DO UPDATE SET cookie_count = cookie_count + excluded.cookie_count
+    """
+
+    def _new_account_epoch(self, nick, epoch):
+        # Conta nova começa na época atual (sem bônus retroativo); a emissão nunca recebe bônus.
+        return None if nick == self.MINT_ACCOUNT else epoch
+
+    def _is_ranked(self, nick):
+        bot_nick = self.bot.auth.bot_nick.lower() if self.bot else ""
+        return nick not in self.FORBIDDEN_NICKS and nick not in (self.MINT_ACCOUNT, bot_nick)
+
+    def _refresh_rank_caches(self, conn, nicks):
+        """Atualiza os caches de ranking com os saldos que a transação acabou de gravar."""
+        nicks = [nick for nick in set(nicks) if self._is_ranked(nick)]
+        if not nicks:
+            return
+        placeholders = ", ".join("?" for _ in nicks)
+        rows = conn.execute(
+            f"SELECT user_nick, {self.RANK_KEY_SQL} FROM user_cookies WHERE user_nick IN ({placeholders})", nicks
+        ).fetchall()
+        with self._cache_lock:
+            self._sync_cache_epoch()
+            for nick, key in rows:
+                self._top_cache.update(nick, key)
+                self._debt_cache.update(nick, key)
+
+    def _sync_cache_epoch(self):
+        """Chamado sob `_cache_lock`: descarta os caches quando a época muda."""
+        epoch = self._current_epoch()
+        if epoch != self._cache_epoch:
+            self._cache_epoch = epoch
+            self._top_cache.invalidate()
+            self._debt_cache.invalidate()
+        return epoch
+
+    def _invalidate_rank_caches(self):
+        with self._cache_lock:
+            self._top_cache.invalidate()
+            self._debt_cache.invalidate()
+
+    def _run_transaction(self, fn):
+        """Roda uma transação de saldo; se falhar, os caches podem estar adiantados e são descartados."""
+        try:
+            return self.store.transaction(fn)
+        except Exception:
+            self._invalidate_rank_caches()
+            raise
+
     def _cleanup_forbidden_users(self):
-        """Remove usuários proibidos que já estejam no banco de dados."""
+        """Remove usuários proibidos, devolvendo o saldo deles à conta de emissão."""
+        def cleanup(conn):
+            placeholders = ', '.join('?' for _ in self.FORBIDDEN_NICKS)
+            self._settle_bonus(conn, self.FORBIDDEN_NICKS, self._current_epoch())
+            rows = conn.execute(
+                f"SELECT user_nick, cookie_count FROM user_cookies WHERE user_nick IN ({placeholders})",
+                list(self.FORBIDDEN_NICKS),
+            ).fetchall()
+            for nick, balance in rows:
+                if balance:
+                    self._post(conn, nick, self.MINT_ACCOUNT, balance, "cleanup")
+            conn.execute(
+                f"DELETE FROM user_cookies WHERE user_nick IN ({placeholders})", list(self.FORBIDDEN_NICKS)
+            )
+            return len(rows)
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                # Cria uma string de placeholders (?, ?, ?)
-                placeholders = ', '.join('?' for _ in self.FORBIDDEN_NICKS)
-                query = f"DELETE FROM user_cookies WHERE user_nick IN ({placeholders})"
-                c.execute(query, list(self.FORBIDDEN_NICKS))
-                deleted_count = c.rowcount
-                conn.commit()
+            deleted_count = self._run_transaction(cleanup)
             
             if deleted_count > 0:
                 logging.info(f"[CookieSystem] Limpeza: Removidos {deleted_count} bots/usuários proibidos do banco de dados.")
@@ -68,164 +338,287 @@ class CookieSystem:
             logging.error(f"[CookieSystem] Falha na limpeza de usuários proibidos: {e}")
 
     def stop_thread(self):
-        """Sinaliza para o thread parar (usado no shutdown)."""
+        """Sinaliza para o thread parar (usado no shutdown) e grava os acúmulos pendentes."""
         self.timer_running = False
+        self.flush_accruals()
+        with self._accrual_lock:
+            if self._journal_file:
+                self._journal_file.close()
+                self._journal_file = None
+
+    # --- Buffer de acúmulo (+1 por mensagem) ---
+
+    def _read_journal_entries(self, path):
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 3:
+                    continue  # linha truncada por um crash no meio da escrita
+                try:
+                    entries.append((int(parts[0]), parts[1], int(parts[2])))
+                except ValueError:
+                    continue
+        return entries
+
+    def _replay_journal(self):
+        """Reaplica acúmulos que ficaram só no journal (crash antes do flush)."""
+        try:
+            row = self.store.query_one("SELECT value FROM cookie_meta WHERE key = 'journal_seq'")
+            applied_seq = row[0] if row else 0
+            flushing_path = f"{self.journal_path}.flushing"
+            entries = self._read_journal_entries(flushing_path) + self._read_journal_entries(self.journal_path)
+            self._journal_seq = max([applied_seq] + [seq for seq, _, _ in entries])
+
+            deltas = defaultdict(int)
+            for seq, nick, delta in entries:
+                if seq > applied_seq:
+                    deltas[nick] += delta
+            if deltas:
+                self._apply_accruals(deltas, self._journal_seq)
+                logging.info(f"[CookieSystem] Journal reaplicado: {sum(deltas.values())} cookies para {len(deltas)} usuários.")
+
+            for path in (flushing_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        except Exception as e:
+            logging.error(f"[CookieSystem] Falha ao reaplicar journal de cookies: {e}")
+
+    def _apply_accruals(self, deltas, last_seq):
+        def apply(conn):
+            now = time.time()
+            epoch = self._current_epoch()
+            self._settle_bonus(conn, deltas.keys(), epoch)
+            conn.executemany(
+                self._UPSERT_SQL,
+                [(nick, delta, epoch) for nick, delta in deltas.items()]
+                + [(self.MINT_ACCOUNT, -sum(deltas.values()), None)],
+            )
+            conn.executemany(
+                "INSERT INTO cookie_ledger (ts, from_nick, to_nick, amount, reason) VALUES (?, ?, ?, ?, 'interaction')",
+                [(now, self.MINT_ACCOUNT, nick, delta) for nick, delta in deltas.items()],
+            )
+            self._refresh_rank_caches(conn, deltas.keys())
+            conn.execute(
+                """
+                INSERT INTO cookie_meta (key, value) VALUES ('journal_seq', ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+                """,
+                (last_seq,),
+            )
+
+        self._run_transaction(apply)
+
+    def _accrue(self, nick, delta):
+        with self._accrual_lock:
+            if self._journal_file is None:
+                self._journal_file = open(self.journal_path, "a", encoding="utf-8", buffering=1)
+            self._journal_seq += 1
+            self._journal_file.write(f"{self._journal_seq}\t{nick}\t{delta}\n")
+            self._accrual_buffer[nick] += delta
+            self._accrual_entries += 1
+            should_flush = self._accrual_entries >= self.ACCRUAL_FLUSH_MAX_ENTRIES
+
+        if should_flush:
+            self.flush_accruals()
+
+    def _buffered_delta(self, nick):
+        with self._accrual_lock:
+            return self._accrual_buffer.get(nick, 0)
+
+    def flush_accruals(self):
+        """Grava o buffer num único executemany e descarta o journal correspondente."""
+        with self._flush_lock:
+            with self._accrual_lock:
+                if not self._accrual_buffer:
+                    return 0
+                deltas = dict(self._accrual_buffer)
+                last_seq = self._journal_seq
+                self._accrual_buffer.clear()
+                self._accrual_entries = 0
+                # Rotaciona o journal: novos acúmulos vão para um arquivo novo
+                # enquanto este lote é gravado.
+                if self._journal_file:
+                    self._journal_file.close()
+                    self._journal_file = None
+                flushing_path = f"{self.journal_path}.flushing"
+                if os.path.exists(self.journal_path):
+                    os.replace(self.journal_path, flushing_path)
+
+            try:
+                self._apply_accruals(deltas, last_seq)
+            except Exception as e:
+                logging.error(f"[CookieSystem] Falha ao gravar acúmulos de cookies (journal mantido): {e}")
+                with self._accrual_lock:
+                    for nick, delta in deltas.items():
+                        self._accrual_buffer[nick] += delta
+                    self._restore_flushing_journal(flushing_path)
+                return 0
+
+            if os.path.exists(flushing_path):
+                os.remove(flushing_path)
+            return len(deltas)
+
+    def _restore_flushing_journal(self, flushing_path):
+        """Flush falhou: junta o lote de volta ao journal ativo (chamado com `_accrual_lock`)."""
+        if not os.path.exists(flushing_path):
+            return
+        if self._journal_file:
+            self._journal_file.close()
+            self._journal_file = None
+        with open(flushing_path, "r", encoding="utf-8") as f:
+            pending = f.read()
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                pending += f.read()
+        with open(self.journal_path, "w", encoding="utf-8") as f:
+            f.write(pending)
+        os.remove(flushing_path)
+
+    def _accrual_flush_thread(self):
+        """Descarrega o buffer de acúmulo periodicamente."""
+        while self.timer_running:
+            time.sleep(self.ACCRUAL_FLUSH_INTERVAL_MS / 1000)
+            self.flush_accruals()
     
     def _is_nick_valid(self, nick: str) -> bool:
         """Retorna False se o nick estiver na lista negra ou for inválido."""
         if not nick: return False
         clean = nick.lower().strip().replace("@", "")
-        if clean in self.FORBIDDEN_NICKS:
+        if clean in self.FORBIDDEN_NICKS or clean == self.MINT_ACCOUNT:
             # logging.warning(f"[CookieSystem] Transação ignorada para: '{clean}'")
             return False
         return True
 
-    def _daily_bonus_thread(self):
-        """Thread que concede 5 cookies a todos no DB a cada 24h."""
-        self.last_bonus_time = time.time()
-        
-        while self.timer_running:
-            time.sleep(3600) 
-            
-            now = time.time()
-            if (now - self.last_bonus_time) > 86400: 
-                logging.info("[CookieSystem] Aplicando bônus diário de 5 cookies...")
-                try:
-                    with sqlite3.connect(self.db_path) as conn:
-                        c = conn.cursor()
-                        c.execute("UPDATE user_cookies SET cookie_count = cookie_count + 5")
-                        conn.commit()
-                    self.last_bonus_time = now
-                    logging.info("[CookieSystem] Bônus diário aplicado com sucesso.")
-                except Exception as e:
-                    logging.error(f"[CookieSystem] Falha ao aplicar bônus diário: {e}")
-
-    def _check_or_create_user(self, nick: str):
-        """Garante que um usuário exista no DB. (Interno)"""
-        if not self._is_nick_valid(nick): return
-        
-        nick = nick.lower()
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                c.execute("INSERT OR IGNORE INTO user_cookies (user_nick, cookie_count) VALUES (?, 0)", (nick,))
-                conn.commit()
-        except Exception as e:
-            logging.error(f"[CookieSystem] Falha ao checar/criar usuário {nick}: {e}")
-
     def get_cookies(self, nick: str) -> int:
         """Busca a contagem de cookies de um usuário."""
         nick = nick.lower()
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                c.execute("SELECT cookie_count FROM user_cookies WHERE user_nick = ?", (nick,))
-                result = c.fetchone()
-                return result[0] if result else 0
+            # O flush segura `_flush_lock` do swap do buffer até o commit; lendo
+            # banco + buffer sob o mesmo lock o saldo nunca conta um delta duas vezes.
+            with self._flush_lock:
+                result = self.store.query_one(
+                    f"SELECT cookie_count + {self.DAILY_BONUS} * (? - COALESCE(last_claimed_epoch, ?)) FROM user_cookies WHERE user_nick = ?",
+                    (self._current_epoch(), self._current_epoch(), nick),
+                )
+                return (result[0] if result else 0) + self._buffered_delta(nick)
         except Exception as e:
             logging.error(f"[CookieSystem] Falha ao buscar cookies para {nick}: {e}")
             return 0
 
+    def _ranking_exclusions(self):
+        bot_nick = self.bot.auth.bot_nick.lower() if self.bot else ""
+        excluded = [bot_nick, self.MINT_ACCOUNT] + list(self.FORBIDDEN_NICKS)
+        return excluded, ','.join(['?'] * len(excluded))
+
     def get_leaderboard(self, limit=5):
         """
-        Retorna os top N usuários com mais cookies, EXCLUINDO o próprio bot e proibidos.
+        Retorna os top N usuários com mais cookies (saldo efetivo, com o bônus
+        diário pendente), EXCLUINDO o próprio bot, a conta de emissão e proibidos.
+        Sai do cache de top-K quando possível; senão usa o índice da chave de
+        ranking (lê só as primeiras linhas).
         """
+        self.flush_accruals()
         try:
-            bot_nick = self.bot.auth.bot_nick.lower()
-            forbidden_placeholders = ','.join(['?'] * len(self.FORBIDDEN_NICKS))
-            query_args = [bot_nick] + list(self.FORBIDDEN_NICKS) + [limit]
-            
-            query = f"""
-                SELECT user_nick, cookie_count 
-                FROM user_cookies 
-                WHERE user_nick != ? 
-                AND user_nick NOT IN ({forbidden_placeholders})
-                ORDER BY cookie_count DESC 
-                LIMIT ?
-            """
-            
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                c.execute(query, query_args)
-                return c.fetchall()
+            with self._cache_lock:
+                epoch = self._sync_cache_epoch()
+                cached = self._top_cache.top(limit)
+                version = self._top_cache.version
+            if cached is None:
+                excluded, placeholders = self._ranking_exclusions()
+                query = f"""
+                    SELECT user_nick, {self.RANK_KEY_SQL}
+                    FROM user_cookies 
+                    WHERE user_nick NOT IN ({placeholders})
+                    ORDER BY {self.RANK_KEY_SQL} DESC 
+                    LIMIT ?
+                """
+                rows = self.store.query(query, excluded + [max(limit, self.LEADERBOARD_CACHE_SIZE)])
+                with self._cache_lock:
+                    self._top_cache.fill(rows, version)
+                cached = rows[:limit]
+            return [(nick, key + self.DAILY_BONUS * epoch) for nick, key in cached]
         except Exception as e:
             logging.error(f"[CookieSystem] Falha ao buscar leaderboard: {e}")
             return []
         
     def get_debt_leaderboard(self, limit=5):
         """
-        Retorna os maiores devedores (cookies negativos).
+        Retorna os maiores devedores (saldo efetivo negativo).
         """
+        self.flush_accruals()
         try:
-            bot_nick = self.bot.auth.bot_nick.lower()
-            forbidden_placeholders = ','.join(['?'] * len(self.FORBIDDEN_NICKS))
-            query_args = [bot_nick] + list(self.FORBIDDEN_NICKS) + [limit]
-            
-            query = f"""
-                SELECT user_nick, cookie_count 
-                FROM user_cookies 
-                WHERE user_nick != ? 
-                AND user_nick NOT IN ({forbidden_placeholders})
-                AND cookie_count < 0
-                ORDER BY cookie_count ASC 
-                LIMIT ?
-            """
-            
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                c.execute(query, query_args)
-                return c.fetchall()
+            with self._cache_lock:
+                epoch = self._sync_cache_epoch()
+                cached = self._debt_cache.top(limit)
+                version = self._debt_cache.version
+            if cached is None:
+                excluded, placeholders = self._ranking_exclusions()
+                query = f"""
+                    SELECT user_nick, {self.RANK_KEY_SQL}
+                    FROM user_cookies 
+                    WHERE user_nick NOT IN ({placeholders})
+                    AND {self.RANK_KEY_SQL} < ?
+                    ORDER BY {self.RANK_KEY_SQL} ASC 
+                    LIMIT ?
+                """
+                rows = self.store.query(
+                    query, excluded + [-self.DAILY_BONUS * epoch, max(limit, self.LEADERBOARD_CACHE_SIZE)]
+                )
+                with self._cache_lock:
+                    self._debt_cache.fill(rows, version)
+                cached = rows[:limit]
+            return [(nick, key + self.DAILY_BONUS * epoch) for nick, key in cached]
         except Exception as e:
             logging.error(f"[CookieSystem] Falha ao buscar leaderboard de dívidas: {e}")
             return []
 
     def add_cookies(self, nick: str, amount_to_add: int):
-        """Adiciona cookies a um usuário."""
+        """Adiciona cookies a um usuário (emitidos pela conta de emissão)."""
         if not self._is_nick_valid(nick): return 
         
         nick = nick.lower()
-        self._check_or_create_user(nick)
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                c.execute("UPDATE user_cookies SET cookie_count = cookie_count + ? WHERE user_nick = ?", (amount_to_add, nick))
-                conn.commit()
+            self._run_transaction(lambda conn: self._post(conn, self.MINT_ACCOUNT, nick, amount_to_add, "add"))
             logging.info(f"[CookieSystem] +{amount_to_add} cookies para {nick}.")
         except Exception as e:
             logging.error(f"[CookieSystem] Falha ao adicionar cookies para {nick}: {e}")
 
-    def remove_cookies(self, nick: str, amount_to_remove: int):
+    def remove_cookies(self, nick: str, amount_to_remove: int, require_funds: bool = False) -> bool:
         """
         Remove cookies de um usuário (podendo deixá-lo negativo/em dívida) 
-        e TRANSFERE para a conta do bot.
+        e TRANSFERE para a conta do bot. Com `require_funds`, só remove se o
+        saldo cobrir o valor (checagem atômica).
         """
-        if not self._is_nick_valid(nick): return 
+        if not self._is_nick_valid(nick): return False
         
         nick = nick.lower()
         bot_nick = self.bot.auth.bot_nick.lower()
         
-        if nick == bot_nick: return
+        if nick == bot_nick: return False
+
+        if require_funds:
+            self.flush_accruals()
 
-        self._check_or_create_user(nick)
-        self._check_or_create_user(bot_nick) 
-        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                c.execute("UPDATE user_cookies SET cookie_count = cookie_count - ? WHERE user_nick = ?", (amount_to_remove, nick))
-                c.execute("UPDATE user_cookies SET cookie_count = cookie_count + ? WHERE user_nick = ?", (amount_to_remove, bot_nick))
-                conn.commit()
+            moved = self._run_transaction(
+                lambda conn: self._post(conn, nick, bot_nick, amount_to_remove, "remove", require_funds)
+            )
+            if moved:
                 logging.info(f"[CookieSystem] Transferidos {amount_to_remove} cookies de {nick} para {bot_nick}. Saldo pode estar negativo.")
-                    
-        except Exception as e:
-            logging.error(f"[CookieSystem] Falha ao remover/transferir cookies de {nick}: {e}")
-                    
+            return moved
         except Exception as e:
             logging.error(f"[CookieSystem] Falha ao remover/transferir cookies de {nick}: {e}")
+            return False
 
-    def transfer_cookies(self, from_nick: str, to_nick: str, amount: int) -> bool:
-        """Transfere cookies de um usuário para outro."""
+    def transfer_cookies(self, from_nick: str, to_nick: str, amount: int, require_funds: bool = False) -> bool:
+        """
+        Transfere cookies de um usuário para outro numa única transação.
+        Com `require_funds`, falha (sem mover nada) se a origem não tiver saldo.
+        """
         if amount <= 0:
             return False
 
@@ -238,40 +631,35 @@ class CookieSystem:
         if from_nick == to_nick:
             return False
 
-        self._check_or_create_user(from_nick)
-        self._check_or_create_user(to_nick)
+        if require_funds:
+            self.flush_accruals()
 
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                c.execute(
-                    "UPDATE user_cookies SET cookie_count = cookie_count - ? WHERE user_nick = ?",
-                    (amount, from_nick),
-                )
-                c.execute(
-                    "UPDATE user_cookies SET cookie_count = cookie_count + ? WHERE user_nick = ?",
-                    (amount, to_nick),
-                )
-                conn.commit()
-            logging.info(f"[CookieSystem] Transferidos {amount} cookies de {from_nick} para {to_nick}.")
-            return True
+            moved = self._run_transaction(
+                lambda conn: self._post(conn, from_nick, to_nick, amount, "transfer", require_funds)
+            )
+            if moved:
+                logging.info(f"[CookieSystem] Transferidos {amount} cookies de {from_nick} para {to_nick}.")
+            return moved
         except Exception as e:
             logging.error(f"[CookieSystem] Falha ao transferir cookies de {from_nick} para {to_nick}: {e}")
             return False
 
+    def get_total_supply(self) -> int:
+        """
+        Soma dos saldos gravados, incluindo a conta de emissão. Deve ser sempre 0
+        (bônus diário ainda não liquidado não entra em nenhum dos lados).
+        """
+        self.flush_accruals()
+        return self.store.query_one("SELECT COALESCE(SUM(cookie_count), 0) FROM user_cookies")[0]
+
     def handle_interaction(self, nick: str):
-        """Concede +1 cookie por interação."""
+        """Concede +1 cookie por interação (acumulado no buffer, gravado em lote)."""
         if not self._is_nick_valid(nick): return 
         
         nick = nick.lower()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                c.execute("""
-                    INSERT INTO user_cookies (user_nick, cookie_count) VALUES (?, 1)
-                    ON CONFLICT(user_nick) DO UPDATE SET cookie_count = cookie_count + 1
-                """, (nick,))
-                conn.commit()
+            self._accrue(nick, 1)
         except Exception as e:
             logging.error(f"[CookieSystem] Falha ao dar cookie de interação para {nick}: {e}")
     
@@ -30,7 +30,7 @@ class RPGRollFeature:
         # Contexto
         context_str = ""
         if not action_query:
-            recent_msgs = list(self.bot.recent_messages.get(channel, []))
+            recent_msgs = self.bot.get_recent_messages(channel)
             now = time.time()
             if recent_msgs:
                 relevant_msgs = [m for m in recent_msgs if now - m['timestamp'] <= 300][-5:]
@@ -103,10 +103,11 @@ class Slots:
         if user_balance < bet_amount or user_balance <= 0:
             return f"@{user}, você não tem cookies suficientes! Saldo: {user_balance} 🍪. poor"
 
+        # Deduz a aposta (checagem de saldo atômica: duas apostas simultâneas não passam juntas)
+        if not self.bot.cookie_system.remove_cookies(user, bet_amount, require_funds=True):
+            return f"@{user}, você não tem cookies suficientes! poor"
+
         self.cooldowns[user] = now
-        
-        # Deduz a aposta
-        self.bot.cookie_system.remove_cookies(user, bet_amount)
 
         # Gira
         result = random.choices(self.symbol_keys, weights=self.symbol_weights, k=3)
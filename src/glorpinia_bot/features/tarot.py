@@ -22,10 +22,9 @@ class TarotReader:
         
         cost = 20
         if self.bot.cookie_system:
-            if self.bot.cookie_system.get_cookies(requester) < cost:
+            if not self.bot.cookie_system.remove_cookies(requester, cost, require_funds=True):
                 self.bot.send_message(channel, f"@{requester}, os espíritos exigem pagamento. Custa {cost} cookies! Stare")
                 return
-            self.bot.cookie_system.remove_cookies(requester, cost)
 
         # Sorteio da Carta
         card_name = random.choice(self.major_arcana)
@@ -7,9 +7,11 @@ import time
 from google import genai
 from dotenv import load_dotenv
 
+from .channel_locks import ChannelLocks
 from .features.search import SearchTool
-from .narrative.context_builder import build_context_prompt
+from .narrative.context_builder import build_context_prompt, ranked_section, recency_section
 from .narrative.memory_extractor import extract_user_memory, is_persistable_memory
+from .narrative.token_budget import TokenEstimator
 
 load_dotenv()
 
@@ -63,6 +65,8 @@ class GeminiClient:
         self.cookie_system = None 
         self.glitch_chance = 0.10
         self.alternative_personalities = self._load_alternative_personalities()
+        # Calibrado com a contagem real de tokens devolvida pela API a cada resposta.
+        self.token_estimator = TokenEstimator()
 
         # Lista de ÚLTIMO RECURSO (caso a IA não consiga nem gerar a desculpa)
         self.static_safety_responses = [
@@ -93,7 +97,10 @@ class GeminiClient:
         )
 
         self.search_tool = SearchTool()
+        # (canal, autor) -> timestamps; lido/escrito sob o lock do canal, já que
+        # respostas do mesmo canal podem ser geradas em threads diferentes.
         self._cookie_guard_state = {}
+        self._channel_locks = ChannelLocks()
 
     @staticmethod
     def _finish_reason_name(reason):
@@ -241,7 +248,7 @@ class GeminiClient:
         clean_query = query.replace(f"@{author}", "").strip()
         
         # --- Contextos (Chat, Memória, Web) ---
-        chat_context_str = ""
+        chat_section = None
         if recent_history:
             now = time.time()
             msgs = [
@@ -252,18 +259,19 @@ class GeminiClient:
                 msgs = recent_history[-self.RECENT_HISTORY_FALLBACK_COUNT:]
             msgs = sorted(msgs, key=lambda m: m.get("timestamp", 0))
             formatted_msgs = [f"- {m['author']}: {m['content']}" for m in msgs]
-            chat_context_str = "**MENSAGENS RECENTES DO CHAT (Contexto Imediato):**\n" + "\n".join(formatted_msgs)
+            # Mais antigas valem menos: são as primeiras a sair quando o prompt estoura o orçamento.
+            chat_section = recency_section("**MENSAGENS RECENTES DO CHAT (Contexto Imediato):**", formatted_msgs)
             
-        memory_context = ""
+        memory_section = None
         if memory_mgr:
             try:
                 memory_mgr.load_user_memory(channel, author)
                 retrieved = memory_mgr.search_memory(channel, author, clean_query)
-                if retrieved: memory_context = f"**HISTÓRICO RECENTE:**\n{retrieved}"
+                if retrieved: memory_section = ranked_section("**HISTÓRICO RECENTE:**", retrieved.splitlines())
             except Exception as e:
                 logging.warning("[Gemini] Falha ao carregar memória RAG channel=%s author=%s error=%s", channel, author, e)
 
-        web_context = ""
+        web_section = None
         performed_search = False
         try:
             should_search = self._should_search(clean_query)
@@ -271,14 +279,14 @@ class GeminiClient:
                 optimized = self._generate_search_query(clean_query)
                 res = self.search_tool.perform_search(optimized)
                 if res:
-                    web_context = f"**CONTEXTO WEB:**\n{res}"
+                    web_section = ranked_section("**CONTEXTO WEB:**", res.splitlines(), low=0.2, high=0.6)
                     performed_search = True
                     logging.info(
                         "[Gemini] Web context anexado channel=%s author=%s query=%s chars=%s",
                         channel,
                         author,
                         optimized,
-                        len(web_context),
+                        len(res),
                     )
                 else:
                     logging.info("[Gemini] Busca web sem resultados úteis channel=%s author=%s query=%s", channel, author, optimized)
@@ -287,15 +295,15 @@ class GeminiClient:
         except Exception as e:
             logging.warning("[Gemini] Falha na busca web channel=%s author=%s error=%s", channel, author, e)
 
-        rag_context = "\n\n".join([ctx for ctx in [chat_context_str, memory_context, web_context] if ctx.strip()])
+        rag_context = [section for section in (chat_section, memory_section, web_section) if section]
         logging.debug(
-            "[Gemini] Contextos montados channel=%s author=%s chat=%s memory=%s web=%s total_chars=%s",
+            "[Gemini] Contextos montados channel=%s author=%s chat=%s memory=%s web=%s total_lines=%s",
             channel,
             author,
-            bool(chat_context_str),
-            bool(memory_context),
-            bool(web_context),
-            len(rag_context),
+            bool(chat_section),
+            bool(memory_section),
+            bool(web_section),
+            sum(len(section.lines) for section in rag_context),
         )
 
         # Monta Prompt Principal
@@ -322,7 +330,7 @@ class GeminiClient:
             # 2. RETRY (SEM BUSCA)
             if generated == "__SAFETY_BLOCK__" and performed_search:
                 logging.warning("[Gemini] Bloqueio com Web. Tentando sem busca...")
-                fallback_rag_context = "\n\n".join([ctx for ctx in [chat_context_str, memory_context] if ctx.strip()])
+                fallback_rag_context = [section for section in (chat_section, memory_section) if section]
                 fallback_prompt = self._build_final_prompt(
                     rag_context=fallback_rag_context,
                     user_query=query,
@@ -371,15 +379,14 @@ class GeminiClient:
             if generated not in self.static_safety_responses and memory_mgr:
                 memory = extract_user_memory(channel, author, query, generated)
                 if is_persistable_memory(memory):
-                    memory_summary = memory["summary"]
-                    ttl_days = memory.get("ttl_days")
-                    if ttl_days:
-                        memory_summary = f"{memory_summary} (validade sugerida: {ttl_days} dias)"
                     memory_mgr.save_user_memory(
                         channel,
                         author,
-                        f"[{memory['memory_type']}] {memory_summary}",
+                        f"[{memory['memory_type']}] {memory['summary']}",
                         "",
+                        memory_type=memory["memory_type"],
+                        confidence=float(memory.get("confidence", 0.0)),
+                        ttl_days=memory.get("ttl_days"),
                     )
                     logging.debug(
                         "[Gemini] Memória extraída channel=%s author=%s type=%s confidence=%.2f",
@@ -426,6 +433,20 @@ class GeminiClient:
         if not generated_text:
             return generated_text
 
+        with self._channel_locks.hold(channel):
+            return self._apply_cookie_command_guard_locked(
+                generated_text, user_query, channel, author, bypass_cooldown
+            )
+
+    def _apply_cookie_command_guard_locked(
+        self,
+        generated_text: str,
+        user_query: str,
+        channel: str,
+        author: str,
+        bypass_cooldown: bool,
+    ) -> str:
+
         matches = self.cookie_system.COOKIE_COMMAND_PATTERN.findall(generated_text)
         if not matches:
             return generated_text
@@ -596,12 +617,31 @@ class GeminiClient:
             mention_context=mention_context,
             economy_context=economy_context,
             live_context=live_context,
+            estimate=self.token_estimator.estimate,
+        )
+
+    def _report_prompt_tokens(self, channel, model, prompt, response):
+        """Loga tokens estimados vs reais do prompt e recalibra o estimador."""
+        usage = getattr(response, "usage_metadata", None)
+        actual = getattr(usage, "prompt_token_count", None) if usage else None
+        # A API conta a system instruction junto com o prompt.
+        sent_text = f"{model.system_instruction or ''}\n{prompt}"
+        estimated = self.token_estimator.estimate(sent_text)
+        if actual:
+            self.token_estimator.observe(sent_text, actual)
+        logging.info(
+            "[Gemini] prompt_tokens channel=%s estimado=%s real=%s calibracao=%.2f",
+            channel,
+            estimated,
+            actual if actual else "-",
+            self.token_estimator.ratio,
         )
 
     def _generate_safe(self, channel, prompt):
         try:
             current_model = self._get_model_for_channel(channel)
             response = current_model.generate_content(prompt)
+            self._report_prompt_tokens(channel, current_model, prompt, response)
             
             if not response.candidates: return None
             
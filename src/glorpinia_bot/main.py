@@ -21,7 +21,11 @@ from google.cloud import speech
 from .twitch_auth import TwitchAuth
 from .gemini_client import GeminiClient
 from .memory_manager import MemoryManager
+from .memory_prefetch import MemoryPrefetcher
+from .storage import close_all_stores
+from .channel_locks import ChannelLocks
 from .emote_manager import EmoteManager
+from .emote_usage import EmoteUsageTracker
 from .narrative.social_dynamics import SocialDynamicsEngine
 
 from .features.comment import Comment
@@ -79,8 +83,19 @@ class TwitchIRC:
             personality_profile=self.auth.personality_profile
         )
         self.memory_mgr = MemoryManager()
+        self.memory_mgr.start_compaction_thread()
+        self.memory_prefetcher = MemoryPrefetcher(self.memory_mgr)
         self.emote_manager = EmoteManager()
-        self.social_dynamics = SocialDynamicsEngine()
+        # O que o chat de cada canal usa de emote puxa o choose_emote.
+        self.emote_usage = EmoteUsageTracker(self.emote_manager)
+        self.emote_usage.load_snapshots()
+        self.emote_usage.start_snapshot_thread()
+        self.emote_manager.usage_tracker = self.emote_usage
+        idle_hibernate = os.getenv("GLORPINIA_SOCIAL_IDLE_SECONDS")
+        self.social_dynamics = SocialDynamicsEngine(
+            idle_hibernate_seconds=float(idle_hibernate) if idle_hibernate else None
+        )
+        self.social_dynamics.start_persistence_thread()
         
         self.live_status = {} # Dicionário para guardar { 'canal': True/False }
         self.live_stream_context = {}  # Cache com contexto da live por canal (título/categoria/etc.)
@@ -115,6 +130,9 @@ class TwitchIRC:
         # Cache e Utilitários
         self.processed_message_ids = deque(maxlen=500)
         self.recent_messages = {channel: deque(maxlen=100) for channel in self.auth.channels}
+        # Lock por canal para o histórico recente: o websocket escreve enquanto
+        # comment/listen/analysis/rpg leem de outras threads (use get_recent_messages).
+        self.channel_locks = ChannelLocks()
         self.last_bot_message_by_channel = {}
         
         # Cooldown timer para o trigger "oziell"
@@ -132,10 +150,12 @@ class TwitchIRC:
         # Validação inicial do Token
         self.auth.validate_and_refresh_token()
 
-        # Sincroniza emotes 7TV (roda em thread, não bloqueia o startup)
-        self.seventv_channel_sync.sync_global_async()
-        for ch in self.auth.channels:
-            self.seventv_channel_sync.sync_channel_async(ch)
+        # Emotes 7TV: o cache local entra já (síncrono); o fetch roda em
+        # background (IDs em lote + pool limitado) e só para sets velhos.
+        self.seventv_channel_sync.load_cached_sets(self.auth.channels)
+        self.seventv_channel_sync.sync_channels_async(self.auth.channels)
+        # Mudanças nos sets chegam ao vivo pela EventAPI do 7TV.
+        self.seventv_channel_sync.start_live_updates()
 
         signal.signal(signal.SIGINT, self.handle_exit)
         signal.signal(signal.SIGTERM, self.handle_exit)
@@ -347,6 +367,15 @@ class TwitchIRC:
             if hasattr(self.cookie_system, 'stop_thread'):
                 self.cookie_system.stop_thread()
 
+        if hasattr(self, 'memory_mgr') and self.memory_mgr:
+            self.memory_mgr.stop_compaction_thread()
+
+        if hasattr(self, 'emote_usage') and self.emote_usage:
+            self.emote_usage.stop_snapshot_thread()
+
+        if hasattr(self, 'social_dynamics') and self.social_dynamics:
+            self.social_dynamics.stop_persistence_thread()
+
         if hasattr(self, 'training_logger') and self.training_logger:
             # Garante que o último log de treino seja salvo
             pass 
@@ -357,7 +386,13 @@ class TwitchIRC:
             
         if hasattr(self, 'listen_feature') and self.listen_feature:
             self.listen_feature.stop_thread()
+
+        if hasattr(self, 'seventv_channel_sync') and self.seventv_channel_sync:
+            self.seventv_channel_sync.stop_live_updates()
             
+        # Drena as filas de escrita do SQLite antes de sair.
+        close_all_stores()
+
         print("[INFO] Fechando conexão com a Twitch...")
         self.running = False
         if self.ws:
@@ -379,14 +414,21 @@ class TwitchIRC:
             print(f"[ERROR] WebSocket nao conectado. Nao foi possivel enviar: {message}")
 
     def _register_recent_message(self, channel, author, content):
-        if channel not in self.recent_messages:
-            self.recent_messages[channel] = deque(maxlen=100)
-
-        self.recent_messages[channel].append({
-            "author": author,
-            "content": content,
-            "timestamp": time.time()
-        })
+        with self.channel_locks.hold(channel):
+            if channel not in self.recent_messages:
+                self.recent_messages[channel] = deque(maxlen=100)
+
+            self.recent_messages[channel].append({
+                "author": author,
+                "content": content,
+                "timestamp": time.time()
+            })
+
+    def get_recent_messages(self, channel, limit=None):
+        """Cópia (lista) do histórico recente do canal, segura para ler de qualquer thread."""
+        with self.channel_locks.hold(channel):
+            recent = list(self.recent_messages.get(channel, ()))
+        return recent[-limit:] if limit else recent
     
     def _send_message_part(self, channel, part, delay):
         """[HELPER] Espera (em um thread) e envia uma parte da mensagem."""
@@ -567,6 +609,7 @@ class TwitchIRC:
         rivals = (drama_state.get("rivals") or "").strip()
         users_seen = social_debug.get("users_seen", [])
         random_params = social_debug.get("random_roll_parameters", {})
+        memory = self.social_dynamics.memory_stats()
 
         def _fmt(name, value):
             return f"{name}: {value if value else '-'}"
@@ -578,13 +621,16 @@ class TwitchIRC:
             f"{_fmt('Enemy', drama_state.get('enemy_of_the_day'))} | "
             f"{_fmt('Suspect', drama_state.get('suspect'))} | "
             f"Rivais: {rivals if rivals else '-'} | "
-            f"Users: {len(users_seen)}"
+            f"Users: {len(users_seen)}/{social_debug.get('users_seen_limit', '-')} | "
+            f"Mem social: {memory.get('total_bytes', 0) / 1024:.0f} KB "
+            f"({memory.get('channels_loaded', 0)} canais, {memory.get('channels_hibernated', 0)} hibernando)"
         )
 
         emote_summary = (
             f"Emote último(canal/global): {emote_debug.get('last_channel_emote') or '-'} / "
             f"{emote_debug.get('last_global_emote') or '-'} | "
-            f"Emote escolhido(msg): {emote_debug.get('last_selected_channel') or '-'}"
+            f"Emote escolhido(msg): {emote_debug.get('last_selected_channel') or '-'} | "
+            f"Chat usa: {' '.join(emote for emote, _ in self.emote_usage.top_emotes(channel, limit=5)) or '-'}"
         )
 
         params_summary = (
@@ -706,7 +752,8 @@ class TwitchIRC:
         return similarity >= self.TOPIC_SIMILARITY_THRESHOLD
 
     def _maybe_register_recurring_memory_loop(self, channel: str, author: str, content: str):
-        if channel not in self.recent_messages:
+        recent = self.get_recent_messages(channel, limit=self.TOPIC_SCAN_WINDOW)
+        if not recent:
             return
 
         topic_candidate = self._extract_topic_candidate(content)
@@ -714,7 +761,6 @@ class TwitchIRC:
         if not topic_candidate or not topic_keywords:
             return
 
-        recent = list(self.recent_messages[channel])[-self.TOPIC_SCAN_WINDOW :]
         occurrences = 0
         authors = set()
         examples = []
@@ -791,13 +837,24 @@ class TwitchIRC:
                 content,
                 bot_nick=self.auth.bot_nick,
             )
+            self.emote_usage.observe(channel, content)
+
+            # Aquece a memória de longo prazo do autor antes de uma possível menção.
+            # Se a mensagem já menciona o bot, adianta também o embedding da consulta
+            # (mesmo texto que o GeminiClient.get_response vai buscar).
+            mentions_bot = self.auth.bot_nick.lower() in content_lower
+            self.memory_prefetcher.prefetch(
+                channel,
+                author,
+                query=content.replace(f"@{author}", "").strip() if mentions_bot else None,
+            )
 
             # Salvar no Histórico Recente (Memória de Curto Prazo)
             self._register_recent_message(channel, author, content)
             logging.debug(
                 "[Main] recent_message_history channel=%s size=%s last_author=%s",
                 channel,
-                len(self.recent_messages[channel]),
+                len(self.recent_messages.get(channel, ())),
                 author,
             )
             self._maybe_register_recurring_memory_loop(channel, author, content)
@@ -1070,7 +1127,7 @@ class TwitchIRC:
                     winner = random.choice(players)
                     loser = players[0] if winner == players[1] else players[1]
 
-                    transfer_ok = self.cookie_system.transfer_cookies(loser, winner, bet_amount)
+                    transfer_ok = self.cookie_system.transfer_cookies(loser, winner, bet_amount, require_funds=True)
                     if not transfer_ok:
                         self.send_message(channel, "glorp Falha ao processar o duelo. Tente novamente.")
                         return
@@ -1180,7 +1237,7 @@ class TwitchIRC:
                             self.send_message(channel, f"@{author}, saldo insuficiente. Você tem {author_balance}🍪. poor")
                             return
 
-                        transfer_ok = self.cookie_system.transfer_cookies(author.lower(), target, amount)
+                        transfer_ok = self.cookie_system.transfer_cookies(author.lower(), target, amount, require_funds=True)
                         if not transfer_ok:
                             self.send_message(channel, "glorp Falha ao processar transferência.")
                             return
@@ -1219,7 +1276,7 @@ class TwitchIRC:
                             self.send_message(channel, f"@{author}, @{from_target} não tem saldo suficiente ({from_balance}🍪). poor")
                             return
 
-                        transfer_ok = self.cookie_system.transfer_cookies(from_target, to_target, amount)
+                        transfer_ok = self.cookie_system.transfer_cookies(from_target, to_target, amount, require_funds=True)
                         if not transfer_ok:
                             self.send_message(channel, "glorp Falha ao processar transferência.")
                             return
@@ -1263,7 +1320,7 @@ class TwitchIRC:
 
                 try:
                     # Convertendo Deque para List para a IA poder ler
-                    recent_history_list = list(self.recent_messages.get(channel, []))
+                    recent_history_list = self.get_recent_messages(channel)
                     
                     economy_context = None
                     if self.cookie_system:
@@ -0,0 +1,69 @@
+"""Assinaturas MinHash para detectar memórias quase duplicadas sem embeddings.
+
+Usado pelo caminho SQLite do `MemoryManager`: a assinatura de cada memória fica
+gravada em `interactions.minhash` e uma nova memória é comparada com as
+recentes do mesmo usuário antes de ser inserida.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import struct
+
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r"\w+")
+_TYPE_PREFIX_RE = re.compile(r"^\s*\[[a-z_]+\]\s*")
+
+# Coeficientes fixos: a assinatura precisa ser estável entre execuções.
+_rng = random.Random(0x6C6F7270)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+_SIGNATURE_FORMAT = f"<{MINHASH_PERMUTATIONS}I"
+
+
+def _memory_content(text: str) -> str:
+    """Descarta `[tipo]` e o prefixo "nick indicou ...:" para comparar só o conteúdo."""
+    text = _TYPE_PREFIX_RE.sub("", text or "")
+    content = text.split(": ", 1)[-1]
+    return " ".join(_WORD_RE.findall(content.lower()))
+
+
+def _shingles(text: str) -> set[bytes]:
+    content = _memory_content(text)
+    if len(content) <= SHINGLE_SIZE:
+        return {content.encode("utf-8")} if content else set()
+    return {content[i : i + SHINGLE_SIZE].encode("utf-8") for i in range(len(content) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text: str) -> bytes | None:
+    """Assinatura MinHash compacta (64 x uint32). None se o texto não tiver conteúdo."""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+
+    base_hashes = [
+        int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "little") for shingle in shingles
+    ]
+    signature = [
+        min(((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH for value in base_hashes)
+        for a, b in _PERMUTATIONS
+    ]
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def estimate_similarity(signature_a: bytes | None, signature_b: bytes | None) -> float:
+    """Estimativa da similaridade de Jaccard entre dois conjuntos de shingles."""
+    if not signature_a or not signature_b or len(signature_a) != len(signature_b):
+        return 0.0
+    values_a = struct.unpack(_SIGNATURE_FORMAT, signature_a)
+    values_b = struct.unpack(_SIGNATURE_FORMAT, signature_b)
+    matches = sum(1 for a, b in zip(values_a, values_b) if a == b)
+    return matches / MINHASH_PERMUTATIONS
@@ -2,7 +2,20 @@ import logging
 import os
 import re
 import sqlite3
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from . import vector_snapshot
+from .storage import get_store
+from .memory_dedup import estimate_similarity, minhash_signature
+from .memory_retrieval import (
+    MEMORY_CONTEXT_CHAR_BUDGET,
+    MemoryCandidate,
+    infer_memory_type,
+    parse_timestamp,
+    rank_memories,
+)
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s:%(levelname)s:%(name)s:%(message)s")
 
@@ -13,6 +26,11 @@ except ImportError:
     GoogleGenerativeAIEmbeddings = None
     logging.warning("langchain-google-genai nao encontrado. O RAG sera desabilitado. Instale 'langchain-google-genai'.")
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 try:
     from langchain_community.vectorstores import FAISS
 except ImportError:
@@ -26,12 +44,45 @@ class MemoryManager:
     e SQLite (para metadata e fallback).
     """
 
+    # Recuperação híbrida: quantos candidatos cada recuperador entrega ao
+    # pipeline de reranqueamento e quanto texto de memória cabe no prompt.
+    FTS_CANDIDATE_LIMIT = 50
+    VECTOR_CANDIDATE_LIMIT = 20
+    MEMORY_CONTEXT_CHAR_BUDGET = MEMORY_CONTEXT_CHAR_BUDGET
+
+    # Compactação em background: intervalo entre rodadas e fração mínima de
+    # páginas livres no SQLite para valer a pena um VACUUM.
+    COMPACTION_INTERVAL_SECONDS = float(os.environ.get("GLORPINIA_MEMORY_COMPACTION_HOURS", "6")) * 3600
+    VACUUM_MIN_FREE_RATIO = 0.2
+
+    # Deduplicação na inserção: limiares de similaridade e quantas memórias
+    # recentes do usuário entram na comparação.
+    DEDUP_COSINE_THRESHOLD = 0.95
+    DEDUP_MINHASH_THRESHOLD = 0.7
+    DEDUP_RECENT_LIMIT = 200
+    DEDUP_VECTOR_CANDIDATES = 4
+
+    # Orçamento LRU: quantos vectorstores ficam carregados e quantos embeddings
+    # de consulta ficam em cache (o prefetch aquece os dois).
+    MAX_LOADED_VECTORSTORES = int(os.environ.get("GLORPINIA_MEMORY_LRU_SIZE", "64"))
+    EMBEDDING_CACHE_SIZE = 256
+    EMBEDDING_WAIT_SECONDS = 10.0
+
     def __init__(self, db_path="glorpinia_memory.db"):
         self.db_path = db_path
+        self.store = get_store(db_path)
         self.embeddings = None
-        self._vectorstores = {}
+        self._vectorstores = OrderedDict()
+        self._embedding_cache = OrderedDict()
+        self._embedding_pending = {}
+        self._embedding_lock = threading.Lock()
         self._active_memory_key = None
         self._use_faiss = False
+        self._fts_enabled = False
+        self._lock = threading.RLock()
+        self._compaction_stop = threading.Event()
+        self._compaction_thread = None
+        self.dedup_stats = {"checked": 0, "merged": 0}
 
         # Cria a estrutura do DB na inicialização
         self._initialize_db()
@@ -54,7 +105,9 @@ class MemoryManager:
 
     def _initialize_db(self):
         """Cria as tabelas necessarias no SQLite se elas nao existirem."""
-        conn = sqlite3.connect(self.db_path)
+        self._fts_enabled = self.store.transaction(self._initialize_schema)
+
+    def _initialize_schema(self, conn):
         c = conn.cursor()
 
         c.execute(
@@ -72,6 +125,47 @@ class MemoryManager:
         c.execute(
             """
             CREATE TABLE IF NOT EXISTS interactions (
+                id INTEGER PRIMARY KEY,
+                channel TEXT,
+                user TEXT,
+                query TEXT,
+                response TEXT,
+                ts TEXT,
+                memory_type TEXT,
+                confidence REAL,
+                expires_at TEXT,
+                hits INTEGER NOT NULL DEFAULT 1,
+                minhash BLOB
+            )
+        """
+        )
+        self._migrate_interactions_primary_key(c)
+        self._migrate_interactions_memory_fields(c)
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_interactions_channel_user_ts ON interactions (channel, user, ts)"
+        )
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_interactions_expires_at ON interactions (expires_at) WHERE expires_at IS NOT NULL"
+        )
+        return self._initialize_fts(c)
+
+    def _migrate_interactions_primary_key(self, c):
+        """
+        Bancos antigos criaram `interactions` sem chave explícita. O índice FTS
+        aponta para o rowid, e o rowid implícito pode ser renumerado por um
+        VACUUM -- então a tabela é recriada uma única vez com `id INTEGER PRIMARY KEY`.
+        """
+        columns = [row[1] for row in c.execute("PRAGMA table_info(interactions)").fetchall()]
+        if "id" in columns:
+            return
+
+        logging.info("[GLORP-MEMORY] Migrando tabela interactions para chave primária estável...")
+        c.execute("DROP TABLE IF EXISTS interactions_fts")
+        c.execute("ALTER TABLE interactions RENAME TO interactions_legacy")
+        c.execute(
+            """
+            CREATE TABLE interactions (
+                id INTEGER PRIMARY KEY,
                 channel TEXT,
                 user TEXT,
                 query TEXT,
@@ -80,51 +174,200 @@ class MemoryManager:
             )
         """
         )
-        conn.commit()
-        conn.close()
+        c.execute(
+            """
+            INSERT INTO interactions (channel, user, query, response, ts)
+            SELECT channel, user, query, response, ts FROM interactions_legacy ORDER BY rowid
+        """
+        )
+        c.execute("DROP TABLE interactions_legacy")
+
+    def _migrate_interactions_memory_fields(self, c):
+        """Adiciona as colunas estruturadas (tipo, confiança, expiração, dedup) em bancos antigos."""
+        columns = {row[1] for row in c.execute("PRAGMA table_info(interactions)").fetchall()}
+        for column, column_type in (
+            ("memory_type", "TEXT"),
+            ("confidence", "REAL"),
+            ("expires_at", "TEXT"),
+            ("hits", "INTEGER NOT NULL DEFAULT 1"),
+            ("minhash", "BLOB"),
+        ):
+            if column not in columns:
+                c.execute(f"ALTER TABLE interactions ADD COLUMN {column} {column_type}")
+                logging.info(f"[GLORP-MEMORY] Coluna interactions.{column} adicionada.")
+
+    def _initialize_fts(self, c):
+        """
+        Cria o índice FTS5 (external content) sobre `interactions`, mantido por
+        triggers. Se o índice acabou de ser criado num banco já populado, faz o
+        rebuild a partir das linhas existentes. Retorna False se o SQLite não
+        tiver FTS5 compilado (aí a busca volta para o scan em Python).
+        """
+        existed = c.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='interactions_fts'"
+        ).fetchone()
+
+        try:
+            c.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts USING fts5(
+                    query,
+                    response,
+                    content='interactions',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """
+            )
+        except sqlite3.OperationalError as e:
+            logging.warning(f"[GLORP-MEMORY] FTS5 indisponível no SQLite ({e}). Fallback usará scan completo.")
+            return False
+
+        c.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS interactions_fts_ai AFTER INSERT ON interactions BEGIN
+                INSERT INTO interactions_fts (rowid, query, response)
+                VALUES (new.id, new.query, new.response);
+            END
+        """
+        )
+        c.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS interactions_fts_ad AFTER DELETE ON interactions BEGIN
+                INSERT INTO interactions_fts (interactions_fts, rowid, query, response)
+                VALUES ('delete', old.id, old.query, old.response);
+            END
+        """
+        )
+        c.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS interactions_fts_au AFTER UPDATE OF query, response ON interactions BEGIN
+                INSERT INTO interactions_fts (interactions_fts, rowid, query, response)
+                VALUES ('delete', old.id, old.query, old.response);
+                INSERT INTO interactions_fts (rowid, query, response)
+                VALUES (new.id, new.query, new.response);
+            END
+        """
+        )
+
+        if not existed:
+            c.execute("INSERT INTO interactions_fts (interactions_fts) VALUES ('rebuild')")
+            logging.info("[GLORP-MEMORY] Índice FTS5 de interações criado a partir do histórico existente.")
+
+        return True
 
     def _memory_key(self, channel, user):
         return (channel, user)
 
     def _memory_path(self, channel, user):
-        return f"memory_{channel}_{user}.faiss"
+        return f"memory_{channel}_{user}{vector_snapshot.SNAPSHOT_SUFFIX}"
 
     def _fetch_vectorstore_path(self, channel, user):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT vectorstore_path FROM memories WHERE channel=? AND user=?", (channel, user))
-        row = c.fetchone()
-        conn.close()
+        row = self.store.query_one("SELECT vectorstore_path FROM memories WHERE channel=? AND user=?", (channel, user))
         if not row:
             return None
         return row[0]
 
     def load_user_memory(self, channel, user):
         """Carrega o vectorstore (FAISS) para um user/channel especifico."""
-        key = self._memory_key(channel, user)
-        self._active_memory_key = key
+        self._active_memory_key = self._memory_key(channel, user)
+        return self._get_vectorstore(channel, user)
+
+    def warm_user_memory(self, channel, user):
+        """Carrega o vectorstore no cache LRU sem mexer no vectorstore "ativo" (usado pelo prefetch)."""
+        return self._get_vectorstore(channel, user)
+
+    def is_memory_loaded(self, channel, user):
+        return self._memory_key(channel, user) in self._vectorstores
 
+    @property
+    def vector_memory_enabled(self):
+        return self._use_faiss
+
+    def _remember_vectorstore(self, key, vectorstore):
+        """Registra no LRU, descartando os vectorstores menos usados acima do orçamento."""
+        self._vectorstores[key] = vectorstore
+        self._vectorstores.move_to_end(key)
+        while len(self._vectorstores) > self.MAX_LOADED_VECTORSTORES:
+            evicted_key, _ = self._vectorstores.popitem(last=False)
+            logging.debug(f"[GLORP-MEMORY] Vectorstore {evicted_key} descartado do cache LRU.")
+
+    def _get_vectorstore(self, channel, user):
         if not self._use_faiss:
             return None
 
-        if key in self._vectorstores:
-            return self._vectorstores[key]
+        key = self._memory_key(channel, user)
+        with self._lock:
+            if key in self._vectorstores:
+                self._vectorstores.move_to_end(key)
+                return self._vectorstores[key]
+
+            vectorstore_path = self._fetch_vectorstore_path(channel, user)
+            # `is_snapshot` também acha a sobra `.old-*` de uma troca interrompida.
+            if vectorstore_path and (vector_snapshot.is_snapshot(vectorstore_path) or os.path.exists(vectorstore_path)):
+                try:
+                    if vector_snapshot.is_snapshot(vectorstore_path):
+                        vectorstore = vector_snapshot.load_faiss(vectorstore_path, self.embeddings)
+                    else:
+                        vectorstore = self._migrate_legacy_vectorstore(channel, user, vectorstore_path)
+                    self._remember_vectorstore(key, vectorstore)
+                    logging.debug(f"[GLORP-MEMORY] FAISS loaded for {user} in {channel}")
+                except Exception as e:
+                    logging.error(f"[GLORP-MEMORY] Erro ao carregar FAISS para {user} em {channel}: {e}")
+            else:
+                logging.debug(f"[GLORP-MEMORY] No FAISS found for {user} in {channel}. Starting fresh.")
+
+            return self._vectorstores.get(key)
+
+    def embed_query(self, text):
+        """
+        Embedding de consulta com cache LRU. Se outra thread (ex.: o prefetch)
+        já está calculando o mesmo texto, espera o resultado em vez de repetir a chamada.
+        """
+        with self._embedding_lock:
+            cached = self._embedding_cache.get(text)
+            if cached is not None:
+                self._embedding_cache.move_to_end(text)
+                return cached
+            pending = self._embedding_pending.get(text)
+            owner = pending is None
+            if owner:
+                pending = self._embedding_pending[text] = threading.Event()
+
+        if not owner:
+            pending.wait(self.EMBEDDING_WAIT_SECONDS)
+            with self._embedding_lock:
+                cached = self._embedding_cache.get(text)
+            return cached if cached is not None else self.embeddings.embed_query(text)
 
-        vectorstore_path = self._fetch_vectorstore_path(channel, user)
-        if vectorstore_path and os.path.exists(vectorstore_path):
-            try:
-                self._vectorstores[key] = FAISS.load_local(
-                    vectorstore_path, self.embeddings, allow_dangerous_deserialization=True
-                )
-                logging.debug(f"[GLORP-MEMORY] FAISS loaded for {user} in {channel}")
-            except Exception as e:
-                logging.error(f"[GLORP-MEMORY] Erro ao carregar FAISS para {user} em {channel}: {e}")
-                self._vectorstores.pop(key, None)
-        else:
-            self._vectorstores.pop(key, None)
-            logging.debug(f"[GLORP-MEMORY] No FAISS found for {user} in {channel}. Starting fresh.")
+        try:
+            vector = self.embeddings.embed_query(text)
+            with self._embedding_lock:
+                self._embedding_cache[text] = vector
+                while len(self._embedding_cache) > self.EMBEDDING_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
+            return vector
+        finally:
+            with self._embedding_lock:
+                self._embedding_pending.pop(text, None)
+            pending.set()
+
+    def _migrate_legacy_vectorstore(self, channel, user, legacy_path):
+        """
+        Lê uma única vez o formato antigo (`save_local`, com pickle) e grava o
+        snapshot novo no lugar. O diretório antigo fica no disco como backup.
+        """
+        vectorstore = FAISS.load_local(legacy_path, self.embeddings, allow_dangerous_deserialization=True)
+        path = self._memory_path(channel, user)
+        vector_snapshot.save_faiss(vectorstore, path)
+
+        self.store.execute(
+            "UPDATE memories SET vectorstore_path = ?, last_updated = ? WHERE channel = ? AND user = ?",
+            (path, datetime.now(), channel, user),
+        )
 
-        return self._vectorstores.get(key)
+        logging.info(f"[GLORP-MEMORY] Memória de {user} em {channel} migrada de {legacy_path} para {path}.")
+        return vectorstore
 
     def _format_memory_document(self, channel, user, query, response):
         """Formata uma memória para indexação ou exibição no fallback SQLite."""
@@ -134,45 +377,171 @@ class MemoryManager:
             return f"Usuário {user} em {channel}: {query} -> {response}"
         return f"Memória sobre {user} em {channel}: {query}"
 
-    def save_user_memory(self, channel, user, query, response):
-        """Salva nova memória long-term (FAISS + DB), preferencialmente já resumida."""
+    def _find_minhash_duplicate(self, c, channel, user, memory_type, signature, now):
+        """Procura, entre as memórias recentes do usuário, uma quase duplicata por MinHash."""
+        if signature is None:
+            return None
 
-        if not self._use_faiss:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute(
-                "INSERT INTO interactions (channel, user, query, response, ts) VALUES (?, ?, ?, ?, ?)",
-                (channel, user, query, response, datetime.now()),
+        c.execute(
+            """
+            SELECT id, minhash FROM interactions
+            WHERE channel = ? AND user = ? AND memory_type IS ? AND minhash IS NOT NULL
+              AND (expires_at IS NULL OR expires_at > ?)
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (channel, user, memory_type, now.isoformat(), self.DEDUP_RECENT_LIMIT),
+        )
+        best_id, best_similarity = None, self.DEDUP_MINHASH_THRESHOLD
+        for row_id, row_signature in c.fetchall():
+            similarity = estimate_similarity(signature, row_signature)
+            if similarity >= best_similarity:
+                best_id, best_similarity = row_id, similarity
+        return best_id
+
+    def _find_vector_duplicate(self, vectorstore, embedding):
+        """Procura no FAISS do usuário um documento com cosseno acima do limiar."""
+        if vectorstore is None or np is None or vectorstore.index.ntotal == 0:
+            return None
+
+        query_vector = np.asarray(embedding, dtype="float32")
+        query_norm = float(np.linalg.norm(query_vector)) or 1.0
+        k = min(self.DEDUP_VECTOR_CANDIDATES, vectorstore.index.ntotal)
+        _, positions = vectorstore.index.search(query_vector.reshape(1, -1), k)
+
+        best_id, best_similarity = None, self.DEDUP_COSINE_THRESHOLD
+        for position in positions[0]:
+            if position < 0:
+                continue
+            stored = vectorstore.index.reconstruct(int(position))
+            similarity = float(np.dot(query_vector, stored)) / (query_norm * (float(np.linalg.norm(stored)) or 1.0))
+            if similarity >= best_similarity:
+                best_id, best_similarity = vectorstore.index_to_docstore_id[int(position)], similarity
+        return best_id
+
+    def _merge_interaction(self, c, row_id, now, confidence, expires_at):
+        """Atualiza a memória existente em vez de inserir outra cópia."""
+        c.execute(
+            """
+            UPDATE interactions
+            SET ts = ?,
+                hits = COALESCE(hits, 1) + 1,
+                confidence = MAX(COALESCE(confidence, 0), COALESCE(?, 0)),
+                expires_at = CASE WHEN expires_at IS NULL OR ? IS NULL THEN NULL ELSE MAX(expires_at, ?) END
+            WHERE id = ?
+            """,
+            (now, confidence, expires_at, expires_at, row_id),
+        )
+
+    def _record_dedup(self, channel, user, merged):
+        # save_user_memory roda em várias threads de geração ao mesmo tempo.
+        with self._lock:
+            self.dedup_stats["checked"] += 1
+            if merged:
+                self.dedup_stats["merged"] += 1
+            checked, merged_total = self.dedup_stats["checked"], self.dedup_stats["merged"]
+        if merged:
+            logging.info(
+                f"[GLORP-MEMORY] Memória quase duplicada mesclada para {user} em {channel} "
+                f"({merged_total}/{checked} deduplicadas)."
             )
-            conn.commit()
-            conn.close()
+
+    def save_user_memory(self, channel, user, query, response, memory_type=None, confidence=None, ttl_days=None):
+        """
+        Salva nova memória long-term (FAISS + DB), preferencialmente já resumida.
+        `ttl_days` vira um `expires_at` real; memórias expiradas somem da busca
+        e são apagadas pela compactação. Quase duplicatas (cosseno no FAISS,
+        MinHash no SQLite) são mescladas na memória existente.
+        """
+        now = datetime.now()
+        memory_type = memory_type or infer_memory_type(query)
+        expires_at = (now + timedelta(days=float(ttl_days))).isoformat() if ttl_days else None
+        signature = minhash_signature(query)
+
+        if not self._use_faiss:
+
+            def save(conn):
+                c = conn.cursor()
+                duplicate_id = self._find_minhash_duplicate(c, channel, user, memory_type, signature, now)
+                if duplicate_id is not None:
+                    self._merge_interaction(c, duplicate_id, now, confidence, expires_at)
+                else:
+                    self._insert_interaction(
+                        c, channel, user, query, response, now, memory_type, confidence, expires_at, signature
+                    )
+                return duplicate_id
+
+            duplicate_id = self.store.transaction(save)
+            self._record_dedup(channel, user, duplicate_id is not None)
             logging.debug(f"[GLORP-MEMORY] Interaction saved to SQLite fallback for {user} in {channel}")
             return
 
         key = self._memory_key(channel, user)
-        self._active_memory_key = key
-        vectorstore = self.load_user_memory(channel, user)
         doc = self._format_memory_document(channel, user, query, response)
+        # Embedding calculado uma única vez: serve para a deduplicação e para a inserção.
+        embedding = self.embeddings.embed_documents([doc])[0]
 
-        if vectorstore is None:
-            vectorstore = FAISS.from_texts([doc], self.embeddings)
-            self._vectorstores[key] = vectorstore
-        else:
-            vectorstore.add_texts([doc])
-
-        path = self._memory_path(channel, user)
-        vectorstore.save_local(path)
+        with self._lock:
+            self._active_memory_key = key
+            vectorstore = self.load_user_memory(channel, user)
+            duplicate_id = self._find_vector_duplicate(vectorstore, embedding)
+
+            if duplicate_id is not None:
+                existing = vectorstore.docstore.search(duplicate_id)
+                metadata = existing.metadata
+                metadata["ts"] = now.isoformat()
+                metadata["hits"] = int(metadata.get("hits") or 1) + 1
+                if metadata.get("expires_at") and expires_at:
+                    metadata["expires_at"] = max(metadata["expires_at"], expires_at)
+                else:
+                    metadata["expires_at"] = None
+                if metadata.get("interaction_id") is not None:
+                    self.store.transaction(
+                        lambda conn: self._merge_interaction(
+                            conn.cursor(), metadata["interaction_id"], now, confidence, expires_at
+                        )
+                    )
+            else:
+                # O log em `interactions` alimenta o BM25 mesmo quando o FAISS está ativo.
+                interaction_id = self.store.transaction(
+                    lambda conn: self._insert_interaction(
+                        conn.cursor(), channel, user, query, response, now, memory_type, confidence, expires_at, signature
+                    )
+                )
+                metadata = {
+                    "ts": now.isoformat(),
+                    "memory_type": memory_type,
+                    "confidence": confidence,
+                    "expires_at": expires_at,
+                    "interaction_id": interaction_id,
+                    "hits": 1,
+                }
+                if vectorstore is None:
+                    vectorstore = FAISS.from_embeddings([(doc, embedding)], self.embeddings, metadatas=[metadata])
+                    self._remember_vectorstore(key, vectorstore)
+                else:
+                    vectorstore.add_embeddings([(doc, embedding)], metadatas=[metadata])
+
+            path = self._memory_path(channel, user)
+            vector_snapshot.save_faiss(vectorstore, path)
+            self._record_dedup(channel, user, duplicate_id is not None)
 
         logging.info(f"[GLORP-MEMORY] Interaction saved and FAISS updated for {user} in {channel}")
 
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute(
+        self.store.execute(
             "INSERT OR REPLACE INTO memories (channel, user, vectorstore_path, last_updated) VALUES (?, ?, ?, ?)",
             (channel, user, path, datetime.now()),
         )
-        conn.commit()
-        conn.close()
+
+    def _insert_interaction(self, c, channel, user, query, response, now, memory_type, confidence, expires_at, signature):
+        c.execute(
+            """
+            INSERT INTO interactions (channel, user, query, response, ts, memory_type, confidence, expires_at, minhash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (channel, user, query, response, now, memory_type, confidence, expires_at, signature),
+        )
+        return c.lastrowid
 
     def _tokenize_for_search(self, text):
         """Normaliza texto em palavras simples para o fallback SQLite."""
@@ -180,24 +549,59 @@ class MemoryManager:
             return set()
         return set(re.findall(r"\w+", str(text).lower()))
 
-    def _search_memory_sqlite(self, channel, user, query, k):
-        """Busca memórias relevantes no log SQLite quando FAISS não está disponível."""
-        query_words = self._tokenize_for_search(query)
-        if not query_words or k <= 0:
-            return ""
+    def _build_fts_query(self, query_words):
+        """Monta uma expressão MATCH segura (cada termo entre aspas, unidos por OR)."""
+        return " OR ".join(f'"{word}"' for word in sorted(query_words))
 
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute(
+    def _row_candidate(self, channel, user, row_query, row_response, ts):
+        return MemoryCandidate(
+            text=self._format_memory_document(channel, user, row_query, row_response),
+            ts=parse_timestamp(ts),
+        )
+
+    def _lexical_candidates(self, channel, user, query_words):
+        """
+        Candidatos lexicais do log `interactions`, já ordenados por BM25 (FTS5).
+        O decaimento por recência/tipo fica para o pipeline de `memory_retrieval`.
+        """
+        if not self._fts_enabled:
+            return self._lexical_candidates_scan(channel, user, query_words)
+
+        try:
+            rows = self.store.query(
+                """
+                SELECT i.query, i.response, i.ts
+                FROM interactions_fts
+                JOIN interactions i ON i.id = interactions_fts.rowid
+                WHERE interactions_fts MATCH ? AND i.channel = ? AND i.user = ?
+                  AND (i.expires_at IS NULL OR i.expires_at > ?)
+                ORDER BY bm25(interactions_fts), i.ts DESC
+                LIMIT ?
+                """,
+                (
+                    self._build_fts_query(query_words),
+                    channel,
+                    user,
+                    datetime.now().isoformat(),
+                    self.FTS_CANDIDATE_LIMIT,
+                ),
+            )
+        except sqlite3.OperationalError as e:
+            logging.error(f"[GLORP-MEMORY] Erro na busca FTS5: {e}")
+            rows = []
+
+        return [self._row_candidate(channel, user, *row) for row in rows]
+
+    def _lexical_candidates_scan(self, channel, user, query_words):
+        """Scan completo em Python; usado só quando o SQLite não tem FTS5."""
+        rows = self.store.query(
             """
             SELECT query, response, ts
             FROM interactions
-            WHERE channel=? AND user=?
+            WHERE channel=? AND user=? AND (expires_at IS NULL OR expires_at > ?)
             """,
-            (channel, user),
+            (channel, user, datetime.now().isoformat()),
         )
-        rows = c.fetchall()
-        conn.close()
 
         ranked_rows = []
         for row_query, row_response, ts in rows:
@@ -206,46 +610,172 @@ class MemoryManager:
             )
             score = len(query_words & memory_words)
             if score > 0:
-                ranked_rows.append((score, ts or "", row_query or "", row_response or ""))
-
-        if not ranked_rows:
-            return ""
+                ranked_rows.append((score, ts or "", row_query, row_response, ts))
 
         ranked_rows.sort(key=lambda item: (item[0], item[1]), reverse=True)
-        top_rows = ranked_rows[:k]
+        return [
+            self._row_candidate(channel, user, row_query, row_response, ts)
+            for _, _, row_query, row_response, ts in ranked_rows[: self.FTS_CANDIDATE_LIMIT]
+        ]
+
+    def _vector_candidates(self, channel, user, query):
+        """Candidatos do FAISS, na ordem de similaridade, com ts/tipo vindos do metadata."""
+        vectorstore = self._get_vectorstore(channel, user)
+        if vectorstore is None:
+            return []
 
-        return "\n".join(
-            [
-                f"- {self._format_memory_document(channel, user, row_query, row_response)}"
-                for _, _, row_query, row_response in top_rows
-            ]
-        )
+        try:
+            embedding = self.embed_query(query)
+            # O mesmo FAISS recebe add_embeddings/delete sob este lock (save e
+            # compactação); buscar em paralelo leria o índice no meio da mudança.
+            with self._lock:
+                results = vectorstore.similarity_search_with_score_by_vector(
+                    embedding, k=self.VECTOR_CANDIDATE_LIMIT
+                )
+        except Exception as e:
+            logging.error(f"[GLORP-MEMORY] Erro na busca vetorial: {e}")
+            return []
+
+        now = datetime.now().isoformat()
+        candidates = []
+        for doc, _distance in results:
+            metadata = getattr(doc, "metadata", None) or {}
+            expires_at = metadata.get("expires_at")
+            if expires_at and expires_at <= now:
+                continue
+            candidates.append(
+                MemoryCandidate(
+                    text=doc.page_content,
+                    ts=parse_timestamp(metadata.get("ts")),
+                    memory_type=metadata.get("memory_type"),
+                )
+            )
+        return candidates
 
     def search_memory(self, channel, user, query, k=3):
         """
-        Busca memórias relevantes no banco vetorial (RAG).
+        Busca memórias relevantes combinando BM25 (SQLite/FTS5) e similaridade
+        vetorial (FAISS), com decaimento por tipo, MMR e orçamento de caracteres.
         Retorna uma string formatada com as memórias encontradas.
         """
-        if not self._use_faiss:
-            return self._search_memory_sqlite(channel, user, query, k)
-
-        key = self._memory_key(channel, user)
-        vectorstore = self._vectorstores.get(key)
-        if vectorstore is None:
-            vectorstore = self.load_user_memory(channel, user)
+        if k <= 0:
+            return ""
 
-        if vectorstore is None:
+        query_words = self._tokenize_for_search(query)
+        lexical = self._lexical_candidates(channel, user, query_words) if query_words else []
+        vector = self._vector_candidates(channel, user, query) if self._use_faiss else []
+        if not lexical and not vector:
             return ""
 
-        try:
-            docs = vectorstore.similarity_search(query, k=k)
-            if not docs:
-                return ""
+        selected = rank_memories(lexical, vector, k, char_budget=self.MEMORY_CONTEXT_CHAR_BUDGET)
+        logging.debug(
+            f"[GLORP-MEMORY] Recuperação híbrida para {user} em {channel}: "
+            f"{len(lexical)} lexicais + {len(vector)} vetoriais -> {len(selected)}"
+        )
+        return "\n".join(f"- {candidate.text}" for candidate in selected)
 
-            return "\n".join([f"- {doc.page_content}" for doc in docs])
-        except Exception as e:
-            logging.error(f"[GLORP-MEMORY] Erro na busca vetorial: {e}")
-            return ""
+    def _database_size(self):
+        return sum(
+            os.path.getsize(path)
+            for path in (self.db_path, f"{self.db_path}-wal")
+            if os.path.exists(path)
+        )
+
+    def _delete_expired_vectors(self, channel, user, now):
+        """Remove do FAISS os documentos cujo `expires_at` já passou. Retorna quantos saíram."""
+        with self._lock:
+            vectorstore = self._get_vectorstore(channel, user)
+            if vectorstore is None:
+                return 0
+
+            expired_ids = [
+                doc_id
+                for doc_id, doc in getattr(vectorstore.docstore, "_dict", {}).items()
+                if (doc.metadata or {}).get("expires_at") and doc.metadata["expires_at"] <= now
+            ]
+            if not expired_ids:
+                return 0
+
+            # `delete` reconstrói o índice sem os vetores removidos (sem buracos).
+            vectorstore.delete(expired_ids)
+            vector_snapshot.save_faiss(vectorstore, self._memory_path(channel, user))
+            return len(expired_ids)
+
+    def compact(self):
+        """
+        Apaga memórias expiradas (SQLite + FAISS), otimiza o índice FTS5 e roda
+        VACUUM quando há espaço livre suficiente. Retorna as estatísticas da rodada.
+        """
+        now = datetime.now().isoformat()
+        size_before = self._database_size()
+
+        def delete_expired(conn):
+            c = conn.cursor()
+            c.execute(
+                "SELECT DISTINCT channel, user FROM interactions WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now,),
+            )
+            affected = c.fetchall()
+            c.execute("DELETE FROM interactions WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            deleted = c.rowcount
+            if self._fts_enabled:
+                c.execute("INSERT INTO interactions_fts (interactions_fts) VALUES ('optimize')")
+            return affected, deleted
+
+        affected_users, deleted_rows = self.store.transaction(delete_expired)
+
+        deleted_vectors = 0
+        if self._use_faiss:
+            for channel, user in affected_users:
+                try:
+                    deleted_vectors += self._delete_expired_vectors(channel, user, now)
+                except Exception as e:
+                    logging.error(f"[GLORP-MEMORY] Falha ao compactar FAISS de {user} em {channel}: {e}")
+
+        def vacuum_if_fragmented(conn):
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0] or 1
+            freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if freelist_count / page_count < self.VACUUM_MIN_FREE_RATIO:
+                return False
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return True
+
+        vacuumed = self.store.maintenance(vacuum_if_fragmented)
+
+        stats = {
+            "deleted_rows": deleted_rows,
+            "deleted_vectors": deleted_vectors,
+            "vacuumed": vacuumed,
+            "reclaimed_bytes": max(0, size_before - self._database_size()),
+        }
+        logging.info(
+            "[GLORP-MEMORY] Compactação: %d memórias e %d vetores expirados removidos, %d bytes recuperados (vacuum=%s).",
+            stats["deleted_rows"],
+            stats["deleted_vectors"],
+            stats["reclaimed_bytes"],
+            vacuumed,
+        )
+        return stats
+
+    def _compaction_loop(self):
+        while not self._compaction_stop.wait(self.COMPACTION_INTERVAL_SECONDS):
+            try:
+                self.compact()
+            except Exception as e:
+                logging.error(f"[GLORP-MEMORY] Falha na compactação em background: {e}")
+
+    def start_compaction_thread(self):
+        """Inicia a compactação periódica numa thread daemon (fora do caminho do chat)."""
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return
+        self._compaction_stop.clear()
+        self._compaction_thread = threading.Thread(target=self._compaction_loop, daemon=True)
+        self._compaction_thread.start()
+
+    def stop_compaction_thread(self):
+        """Sinaliza para a thread de compactação parar (usado no shutdown)."""
+        self._compaction_stop.set()
 
     @property
     def vectorstore(self):
@@ -0,0 +1,60 @@
+import logging
+import threading
+
+
+class MemoryPrefetcher:
+    """
+    Aquece a memória de longo prazo de quem acabou de falar no chat.
+
+    O `TwitchIRC.on_message` chama `prefetch` para cada mensagem observada; o
+    carregamento do vectorstore (e, quando a mensagem menciona o bot, o
+    embedding da consulta) roda numa thread em background. Assim, quando o
+    `GeminiClient.get_response` chega, a memória já está no cache LRU do
+    `MemoryManager` e a primeira menção custa quase o mesmo que uma menção quente.
+    """
+
+    def __init__(self, memory_mgr, max_concurrency=2):
+        self.memory_mgr = memory_mgr
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.stats = {"scheduled": 0, "skipped_busy": 0, "already_warm": 0}
+
+    def prefetch(self, channel, user, query=None):
+        """
+        Agenda o aquecimento da memória de `user` em `channel`. Nunca bloqueia:
+        se todas as vagas estiverem ocupadas, o pedido é descartado.
+        Retorna True se uma thread de prefetch foi iniciada.
+        """
+        if not self.memory_mgr or not self.memory_mgr.vector_memory_enabled:
+            return False
+
+        key = (channel, user)
+        with self._lock:
+            if key in self._pending:
+                return False
+            if query is None and self.memory_mgr.is_memory_loaded(channel, user):
+                self.stats["already_warm"] += 1
+                return False
+            if not self._slots.acquire(blocking=False):
+                self.stats["skipped_busy"] += 1
+                return False
+            self._pending.add(key)
+            self.stats["scheduled"] += 1
+
+        thread = threading.Thread(target=self._run, args=(channel, user, query), daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, channel, user, query):
+        try:
+            self.memory_mgr.warm_user_memory(channel, user)
+            if query:
+                self.memory_mgr.embed_query(query)
+        except Exception as e:
+            logging.warning(f"[GLORP-MEMORY] Prefetch falhou para {user} em {channel}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard((channel, user))
+            self._slots.release()
+            logging.debug(f"[GLORP-MEMORY] Prefetch concluído para {user} em {channel}")
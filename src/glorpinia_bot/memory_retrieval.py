@@ -0,0 +1,183 @@
+"""Pipeline de recuperação de memórias de longo prazo.
+
+Junta candidatos lexicais (FTS5/BM25) e vetoriais (FAISS) em uma única lista,
+aplica decaimento temporal por `memory_type`, remove quase-duplicatas com MMR
+e corta o resultado num orçamento de caracteres antes de ir para o prompt.
+Menos memórias, porém melhores, significam menos tokens de entrada por chamada.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+
+# Meia-vida (em dias) usada no decaimento por tipo de memória. Sinais
+# emocionais envelhecem rápido; fatos e relações continuam úteis por meses.
+MEMORY_TYPE_HALF_LIFE_DAYS = {
+    "emotion_signal": 7.0,
+    "running_joke": 45.0,
+    "preference": 180.0,
+    "fact": 365.0,
+    "relationship": 365.0,
+}
+DEFAULT_HALF_LIFE_DAYS = 60.0
+UNKNOWN_AGE_DECAY = 0.5
+
+RRF_K = 60
+MMR_LAMBDA = 0.7
+MEMORY_CONTEXT_CHAR_BUDGET = 700
+
+_MEMORY_TYPE_RE = re.compile(r"\[([a-z_]+)\]")
+_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class MemoryCandidate:
+    """Memória candidata vinda de um ou mais recuperadores."""
+
+    text: str
+    ts: Optional[datetime] = None
+    memory_type: Optional[str] = None
+    lexical_rank: Optional[int] = None
+    vector_rank: Optional[int] = None
+    score: float = 0.0
+
+    def content_tokens(self) -> set[str]:
+        # Ignora o prefixo "Memória sobre X em Y:" para não inflar a similaridade.
+        content = self.text.split(": ", 1)[-1]
+        return set(_WORD_RE.findall(content.lower()))
+
+
+def parse_timestamp(value: object) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def infer_memory_type(text: str) -> Optional[str]:
+    """Lê o tipo a partir do prefixo `[tipo]` gravado pelo extrator de memória."""
+    match = _MEMORY_TYPE_RE.search(text or "")
+    return match.group(1) if match else None
+
+
+def fuse_candidates(
+    lexical: Iterable[MemoryCandidate],
+    vector: Iterable[MemoryCandidate],
+    rrf_k: int = RRF_K,
+) -> list[MemoryCandidate]:
+    """Une as duas listas por texto e pontua com Reciprocal Rank Fusion."""
+    merged: dict[str, MemoryCandidate] = {}
+
+    for rank, candidate in enumerate(lexical):
+        merged[candidate.text] = MemoryCandidate(
+            text=candidate.text,
+            ts=candidate.ts,
+            memory_type=candidate.memory_type,
+            lexical_rank=rank,
+        )
+
+    for rank, candidate in enumerate(vector):
+        existing = merged.get(candidate.text)
+        if existing is None:
+            merged[candidate.text] = MemoryCandidate(
+                text=candidate.text,
+                ts=candidate.ts,
+                memory_type=candidate.memory_type,
+                vector_rank=rank,
+            )
+            continue
+        existing.vector_rank = rank
+        existing.ts = existing.ts or candidate.ts
+        existing.memory_type = existing.memory_type or candidate.memory_type
+
+    for candidate in merged.values():
+        score = 0.0
+        if candidate.lexical_rank is not None:
+            score += 1.0 / (rrf_k + candidate.lexical_rank + 1)
+        if candidate.vector_rank is not None:
+            score += 1.0 / (rrf_k + candidate.vector_rank + 1)
+        candidate.score = score
+        if candidate.memory_type is None:
+            candidate.memory_type = infer_memory_type(candidate.text)
+
+    return list(merged.values())
+
+
+def time_decay(candidate: MemoryCandidate, now: datetime) -> float:
+    if candidate.ts is None:
+        return UNKNOWN_AGE_DECAY
+    half_life = MEMORY_TYPE_HALF_LIFE_DAYS.get(candidate.memory_type, DEFAULT_HALF_LIFE_DAYS)
+    age_days = max(0.0, (now - candidate.ts).total_seconds() / 86400)
+    return 0.5 ** (age_days / half_life)
+
+
+def apply_time_decay(candidates: list[MemoryCandidate], now: Optional[datetime] = None) -> list[MemoryCandidate]:
+    now = now or datetime.now()
+    for candidate in candidates:
+        candidate.score *= time_decay(candidate, now)
+    return sorted(candidates, key=lambda c: c.score, reverse=True)
+
+
+def _jaccard(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def mmr_select(candidates: list[MemoryCandidate], k: int, lambda_: float = MMR_LAMBDA) -> list[MemoryCandidate]:
+    """Maximal Marginal Relevance: relevância menos redundância com o que já foi escolhido."""
+    if k <= 0 or not candidates:
+        return []
+
+    top_score = max(c.score for c in candidates) or 1.0
+    remaining = [(c, c.score / top_score, c.content_tokens()) for c in candidates]
+    selected: list[tuple[MemoryCandidate, set[str]]] = []
+
+    while remaining and len(selected) < k:
+        best_index = 0
+        best_value = float("-inf")
+        for index, (_, relevance, tokens) in enumerate(remaining):
+            redundancy = max((_jaccard(tokens, chosen) for _, chosen in selected), default=0.0)
+            value = lambda_ * relevance - (1.0 - lambda_) * redundancy
+            if value > best_value:
+                best_index = index
+                best_value = value
+        candidate, _, tokens = remaining.pop(best_index)
+        selected.append((candidate, tokens))
+
+    return [candidate for candidate, _ in selected]
+
+
+def trim_to_budget(candidates: list[MemoryCandidate], char_budget: int = MEMORY_CONTEXT_CHAR_BUDGET) -> list[MemoryCandidate]:
+    """Mantém a ordem e descarta o que não couber no orçamento (linha "- texto")."""
+    kept = []
+    used = 0
+    for candidate in candidates:
+        cost = len(candidate.text) + 3
+        if used + cost > char_budget:
+            continue
+        kept.append(candidate)
+        used += cost
+    return kept
+
+
+def rank_memories(
+    lexical: Iterable[MemoryCandidate],
+    vector: Iterable[MemoryCandidate],
+    k: int,
+    char_budget: int = MEMORY_CONTEXT_CHAR_BUDGET,
+    now: Optional[datetime] = None,
+) -> list[MemoryCandidate]:
+    """Executa o pipeline completo: fusão -> decaimento -> MMR -> orçamento."""
+    fused = fuse_candidates(lexical, vector)
+    decayed = apply_time_decay(fused, now=now)
+    diverse = mmr_select(decayed, k)
+    return trim_to_budget(diverse, char_budget)
@@ -1,51 +1,191 @@
-from typing import Dict, Optional
+"""Montagem do prompt final com orçamento de tokens por chamada.
 
+Cada bloco do prompt vira um conjunto de linhas com um valor entre 0 e 1.
+Persona, foco da menção e a mensagem do usuário são fixos. O resto entra por
+valor, do maior para o menor, enquanto couber no que sobra de `token_budget`
+depois do conteúdo fixo (nunca menos que `MIN_CONTEXT_BUDGET_SHARE` dele, para
+uma persona grande ou uma calibração alta não zerar o contexto): mensagens
+antigas do chat e memórias fracas têm valor baixo e saem antes dos blocos
+curtos de estado (mood, drama), que só caem quando não sobra espaço nenhum.
+"""
 
-AUXILIARY_CONTEXT_CHAR_BUDGET = 2_400
-TRUNCATION_NOTICE = "\n[...contexto auxiliar truncado por limite de tamanho...]"
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
+from .token_budget import estimate_tokens
 
-def _truncate_to_budget(block: str, budget: int) -> Optional[str]:
-    """Return block trimmed to budget, preserving room for a truncation notice."""
-    if budget <= 0:
-        return None
+# Persona (~3k tokens) + contexto + mensagem.
+CONTEXT_TOKEN_BUDGET = 4_500
+# Uma linha grande que não cabe é cortada se ainda sobrar pelo menos isso.
+MIN_PARTIAL_LINE_TOKENS = 32
+# Fração mínima do orçamento reservada ao contexto não fixo, mesmo que persona
+# e mensagem sozinhas já passem do orçamento.
+MIN_CONTEXT_BUDGET_SHARE = 0.15
+TRUNCATION_NOTICE = " [...]"
 
-    stripped_block = block.strip()
-    if len(stripped_block) <= budget:
-        return stripped_block
+PINNED = float("inf")
+# Valor de cada bloco inteiro (blocos de uma linha só).
+MOOD_VALUE = 0.8
+DRAMA_VALUE = 0.6
+MEMORY_LOOP_VALUE = 0.55
+SOCIAL_MEMORY_VALUE = 0.5
+ECONOMY_VALUE = 0.3
+LIVE_VALUE = 0.25
+RAG_TEXT_VALUE = 0.7
 
-    if budget <= len(TRUNCATION_NOTICE):
-        return None
 
-    available = budget - len(TRUNCATION_NOTICE)
-    truncated = stripped_block[:available].rstrip()
-    if not truncated:
-        return None
+@dataclass
+class ContextSection:
+    """Trecho do contexto auxiliar (RAG) com um valor por linha."""
+
+    title: str
+    lines: List[str]
+    values: List[float]
+
+
+def recency_section(title: str, lines: Sequence[str], low: float = 0.05, high: float = 0.65) -> ContextSection:
+    """Linhas em ordem cronológica: a mais antiga vale `low`, a mais nova `high`."""
+    return ContextSection(title, list(lines), _ramp(len(lines), low, high))
+
+
+def ranked_section(title: str, lines: Sequence[str], low: float = 0.1, high: float = 0.7) -> ContextSection:
+    """Linhas da melhor para a pior (ex.: busca de memória): a primeira vale `high`."""
+    return ContextSection(title, list(lines), _ramp(len(lines), low, high)[::-1])
+
+
+def _ramp(count: int, low: float, high: float) -> List[float]:
+    if count <= 1:
+        return [high] * count
+    step = (high - low) / (count - 1)
+    return [low + step * i for i in range(count)]
+
+
+@dataclass
+class _Block:
+    header: str
+    sections: List[Tuple[str, List[Tuple[str, float]]]]
+    footer: str = ""
+    section_separator: str = "\n"
 
-    return f"{truncated}{TRUNCATION_NOTICE}"
 
+def _single(text: str, value: float) -> _Block:
+    return _Block(header="", sections=[("", [(text, value)])])
 
-def _append_auxiliary_blocks(
-    blocks: list[str],
-    auxiliary_blocks: list[str],
-    char_budget: int = AUXILIARY_CONTEXT_CHAR_BUDGET,
-) -> None:
-    """Append auxiliary blocks by priority, truncating only lower-priority context."""
-    remaining_budget = char_budget
 
-    for block in auxiliary_blocks:
-        if not block or not block.strip():
+def _truncate_line(text: str, budget: int, estimate: Callable[[str], int]) -> Optional[str]:
+    cost = estimate(text)
+    while cost > budget and len(text) > 1:
+        text = text[: max(1, int(len(text) * budget / cost) - len(TRUNCATION_NOTICE))].rstrip()
+        cost = estimate(text + TRUNCATION_NOTICE)
+        if cost <= budget:
+            return text + TRUNCATION_NOTICE
+    return None
+
+
+def _context_budget(token_budget: int, pinned_cost: int) -> int:
+    return max(token_budget - pinned_cost, int(token_budget * MIN_CONTEXT_BUDGET_SHARE))
+
+
+def pack_context_blocks(
+    blocks: Sequence[_Block],
+    token_budget: int,
+    estimate: Callable[[str], int] = estimate_tokens,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Escolhe as linhas que entram no prompt e devolve (prompt, estatísticas).
+    O custo de cabeçalho de bloco/seção só é cobrado quando a primeira linha
+    dele entra; linhas que não cabem são puladas (uma menor depois ainda pode
+    entrar), e uma linha grande pode ser cortada se sobrar espaço razoável.
+    Linhas fixas sempre entram; as outras dividem o orçamento que sobra delas.
+    """
+    units = []
+    for block_index, block in enumerate(blocks):
+        for section_index, (_, lines) in enumerate(block.sections):
+            for line_index, (text, value) in enumerate(lines):
+                units.append((value, block_index, section_index, line_index, text))
+    # Estável: empate mantém a ordem original do prompt.
+    units.sort(key=lambda unit: -unit[0])
+
+    pinned_cost = 0
+    context_budget = None
+    remaining = 0
+    opened_blocks = set()
+    opened_sections = set()
+    kept: Dict[Tuple[int, int, int], str] = {}
+    dropped_lines = 0
+    for value, block_index, section_index, line_index, text in units:
+        block = blocks[block_index]
+        overhead = 0
+        if block_index not in opened_blocks:
+            overhead += estimate(block.header) + estimate(block.footer)
+        if (block_index, section_index) not in opened_sections:
+            overhead += estimate(block.sections[section_index][0])
+        cost = estimate(text) + overhead
+        if value == PINNED:
+            pinned_cost += cost
+        else:
+            if context_budget is None:
+                # Fixos vêm primeiro na ordenação: aqui o custo deles já é conhecido.
+                context_budget = remaining = _context_budget(token_budget, pinned_cost)
+            if cost > remaining:
+                if remaining - overhead >= MIN_PARTIAL_LINE_TOKENS:
+                    text = _truncate_line(text, remaining - overhead, estimate)
+                else:
+                    text = None
+                if text is None:
+                    dropped_lines += 1
+                    continue
+                cost = estimate(text) + overhead
+            remaining -= cost
+        opened_blocks.add(block_index)
+        opened_sections.add((block_index, section_index))
+        kept[(block_index, section_index, line_index)] = text
+
+    if pinned_cost > token_budget:
+        logging.warning(
+            "[ContextBuilder] Conteúdo fixo (persona/mensagem) sozinho estoura o orçamento pinned=%s budget=%s",
+            pinned_cost,
+            token_budget,
+        )
+
+    rendered = []
+    for block_index, block in enumerate(blocks):
+        if block_index not in opened_blocks:
             continue
+        sections = []
+        for section_index, (title, lines) in enumerate(block.sections):
+            body = [kept[key] for key in ((block_index, section_index, i) for i in range(len(lines))) if key in kept]
+            if body:
+                sections.append("\n".join(([title] if title else []) + body))
+        parts = ([block.header] if block.header else []) + [block.section_separator.join(sections)]
+        if block.footer:
+            parts.append(block.footer)
+        rendered.append("\n".join(parts))
 
-        budgeted_block = _truncate_to_budget(block, remaining_budget)
-        if not budgeted_block:
-            break
+    stats = {
+        "budget": token_budget,
+        "pinned": pinned_cost,
+        "used": pinned_cost + (context_budget or 0) - remaining,
+        "dropped_lines": dropped_lines,
+        "dropped_blocks": len(blocks) - len(opened_blocks),
+    }
+    return "\n\n".join(rendered), stats
 
-        blocks.append(budgeted_block)
-        remaining_budget -= len(budgeted_block)
 
-        if len(budgeted_block) < len(block.strip()):
-            break
+def _rag_block(rag_context: Union[str, Sequence[ContextSection], None]) -> Optional[_Block]:
+    if isinstance(rag_context, str):
+        if not rag_context.strip():
+            return None
+        return _Block(header="[SISTEMA: CONTEXTO AUXILIAR]", sections=[("", [(rag_context.strip(), RAG_TEXT_VALUE)])])
+    sections = []
+    for section in rag_context or []:
+        lines = [(line.strip(), value) for line, value in zip(section.lines, section.values) if line and line.strip()]
+        if lines:
+            sections.append((section.title, lines))
+    if not sections:
+        return None
+    return _Block(header="[SISTEMA: CONTEXTO AUXILIAR]", sections=sections, section_separator="\n\n")
 
 
 def build_context_prompt(
@@ -54,17 +194,22 @@ def build_context_prompt(
     drama_state: Optional[Dict[str, object]],
     memory_loop: Optional[Dict[str, str]],
     social_memory: Optional[str],
-    rag_context: Optional[str],
+    rag_context: Union[str, Sequence[ContextSection], None],
     chat_message: str,
     mention_context: Optional[Dict[str, object]] = None,
     economy_context: Optional[Dict[str, object]] = None,
     live_context: Optional[Dict[str, object]] = None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    estimate: Callable[[str], int] = estimate_tokens,
 ) -> str:
-    required_blocks = []
-    auxiliary_blocks = []
+    """
+    `rag_context` pode ser texto pronto (entra inteiro ou sai inteiro) ou uma
+    lista de `ContextSection`, que permite cortar linha a linha.
+    """
+    blocks = []
 
     if persona_profile and persona_profile.strip():
-        required_blocks.append(f"[SISTEMA: persona profile]\n{persona_profile.strip()}")
+        blocks.append(_single(f"[SISTEMA: persona profile]\n{persona_profile.strip()}", PINNED))
 
     if mention_context is not None:
         trigger_author = (mention_context.get("trigger_author") or "").strip()
@@ -81,16 +226,17 @@ def build_context_prompt(
             "Use histórico apenas como apoio; não troque o alvo da resposta por causa do histórico.\n"
             "Só cite outras pessoas quando fizer sentido direto com a mensagem foco."
         )
-        required_blocks.append(focus_block)
+        blocks.append(_single(focus_block, PINNED))
 
     if chat_message is not None:
-        required_blocks.append(f'Mensagem do usuário: "{chat_message.strip()}"')
+        blocks.append(_single(f'Mensagem do usuário: "{chat_message.strip()}"', PINNED))
 
-    if rag_context and rag_context.strip():
-        required_blocks.append(f"[SISTEMA: CONTEXTO AUXILIAR]\n{rag_context.strip()}")
+    rag_block = _rag_block(rag_context)
+    if rag_block:
+        blocks.append(rag_block)
 
     if mood and mood.strip():
-        auxiliary_blocks.append(f"[SISTEMA: mood atual = {mood.strip()}]")
+        blocks.append(_single(f"[SISTEMA: mood atual = {mood.strip()}]", MOOD_VALUE))
 
     if drama_state:
         favorite = drama_state.get("favorite_of_the_day")
@@ -105,17 +251,18 @@ def build_context_prompt(
         )
         if rivalry:
             drama_block += f"\nrivalidades: {rivalry}"
-        auxiliary_blocks.append(drama_block)
+        blocks.append(_single(drama_block, DRAMA_VALUE))
 
     if memory_loop and memory_loop.get("topic"):
-        auxiliary_blocks.append(f"[SISTEMA: memória recorrente]\n{memory_loop['topic']}")
+        blocks.append(_single(f"[SISTEMA: memória recorrente]\n{memory_loop['topic']}", MEMORY_LOOP_VALUE))
 
     if social_memory and social_memory.strip():
-        auxiliary_blocks.append(
+        social_block = (
             "[SISTEMA: memória social curta]\n"
             f"{social_memory.strip()}\n"
             "Use como ajuste de tom; não cite como ficha ou histórico explícito."
         )
+        blocks.append(_single(social_block, SOCIAL_MEMORY_VALUE))
 
     if economy_context is not None:
         balances = economy_context.get("balances") or []
@@ -126,7 +273,7 @@ def build_context_prompt(
             f"Saldos atuais: {balance_line}\n"
             f"{instruction or 'Use saldo apenas quando for relevante para a mensagem.'}"
         )
-        auxiliary_blocks.append(economy_block)
+        blocks.append(_single(economy_block, ECONOMY_VALUE))
 
     if live_context is not None:
         fields = live_context.get("fields") if isinstance(live_context.get("fields"), dict) else live_context
@@ -147,9 +294,15 @@ def build_context_prompt(
                     or "Use apenas como pano de fundo se combinar naturalmente com a conversa; não force assunto de live."
                 )
             )
-            auxiliary_blocks.append(live_block)
+            blocks.append(_single(live_block, LIVE_VALUE))
 
-    blocks = list(required_blocks)
-    _append_auxiliary_blocks(blocks, auxiliary_blocks)
-
-    return "\n\n".join(block for block in blocks if block and block.strip())
+    prompt, stats = pack_context_blocks(blocks, token_budget, estimate)
+    if stats["dropped_lines"]:
+        logging.debug(
+            "[ContextBuilder] Orçamento de tokens aplicado used=%s budget=%s linhas_cortadas=%s blocos_removidos=%s",
+            stats["used"],
+            stats["budget"],
+            stats["dropped_lines"],
+            stats["dropped_blocks"],
+        )
+    return prompt
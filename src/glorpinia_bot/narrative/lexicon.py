@@ -0,0 +1,80 @@
+"""Casamento de léxicos sociais (elogio, grosseria, zoeira...) numa passada só.
+
+Os termos vêm de `social_lexicon.txt` (`categoria: termo`). O texto é quebrado
+em palavras uma vez; a partir de cada palavra, um dicionário indexado pela
+primeira palavra do termo diz quais frases podem começar ali, e termos `/regex/`
+são testados contra a palavra inteira. O resultado é o conjunto de todas as
+categorias presentes, com fronteira de palavra (sem os falsos positivos de
+`token in text`) e com sobreposição ("te amo" conta como elogio e como
+segunda pessoa).
+"""
+
+import logging
+import os
+import re
+from collections import defaultdict
+from typing import FrozenSet, Iterable, List, Tuple
+
+WORD_RE = re.compile(r"\w+")
+
+
+def load_lexicon(file_path) -> List[Tuple[str, str]]:
+    """Lê `categoria: termo` por linha. Linhas vazias e `#` são ignoradas."""
+    entries = []
+    if not os.path.exists(file_path):
+        logging.warning("[SocialLexicon] arquivo de léxico não encontrado path=%s", file_path)
+        return entries
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line or line.startswith("#") or ":" not in line:
+                continue
+            category, term = line.split(":", 1)
+            category = category.strip().lower()
+            term = term.strip().lower()
+            if category and term:
+                entries.append((category, term))
+    return entries
+
+
+class LexiconMatcher:
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        # primeira palavra -> [(palavras restantes, categoria)]
+        self._phrases = defaultdict(list)
+        word_patterns = defaultdict(list)
+        for category, term in entries:
+            if len(term) > 2 and term.startswith("/") and term.endswith("/"):
+                word_patterns[category].append(term[1:-1])
+                continue
+            words = WORD_RE.findall(term)
+            if words:
+                self._phrases[words[0]].append((tuple(words[1:]), category))
+
+        # Um único regex de palavra com um grupo por categoria.
+        self._word_pattern = None
+        self._word_categories = []
+        if word_patterns:
+            groups = []
+            for index, (category, patterns) in enumerate(word_patterns.items()):
+                groups.append(f"(?P<c{index}>{'|'.join(f'(?:{p})' for p in patterns)})")
+                self._word_categories.append(category)
+            self._word_pattern = re.compile("|".join(groups))
+
+    @classmethod
+    def from_file(cls, file_path):
+        return cls(load_lexicon(file_path))
+
+    def categories(self, text: str) -> FrozenSet[str]:
+        """Todas as categorias com algum termo presente em `text` (minúsculas)."""
+        words = WORD_RE.findall(text or "")
+        hits = set()
+        for position, word in enumerate(words):
+            for rest, category in self._phrases.get(word, ()):
+                if category not in hits and tuple(words[position + 1:position + 1 + len(rest)]) == rest:
+                    hits.add(category)
+            if self._word_pattern is not None:
+                match = self._word_pattern.fullmatch(word)
+                if match:
+                    hits.add(self._word_categories[int(match.lastgroup[1:])])
+        return frozenset(hits)
@@ -1,12 +1,24 @@
+import heapq
+import math
 import random
 import re
 import logging
 import json
+import sys
+import time
+from collections import OrderedDict
 from pathlib import Path
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from ..channel_locks import ChannelLocks, channel_locked
+from .lexicon import LexiconMatcher
+from .social_persistence import LOOPS, PROFILES, SocialStatePersistence, atomic_write_json, journal_path_for, read_journal
+
+USERS_SEEN_MAX = 500
+USERS_SEEN_WINDOW_SECONDS = 6 * 60 * 60
+
 
 @dataclass
 class MemoryLoop:
@@ -27,10 +39,64 @@ class UserSocialProfile:
     last_emotion: str = "neutral"
     last_updated_message: int = 0
 
+class RecentUsers:
+    """
+    Quem falou no canal na janela recente (`window_seconds`), com no máximo
+    `max_users` nomes: ao passar do limite sai quem está há mais tempo sem
+    falar. Substitui o set que crescia até o reset de 24h do drama.
+    """
+
+    def __init__(self, max_users: int = USERS_SEEN_MAX, window_seconds: float = USERS_SEEN_WINDOW_SECONDS):
+        self.max_users = max_users
+        self.window_seconds = window_seconds
+        self._last_seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def add(self, user: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._last_seen[user] = now
+        self._last_seen.move_to_end(user)
+        self._expire(now)
+
+    def _expire(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._last_seen:
+            oldest_user, oldest_ts = next(iter(self._last_seen.items()))
+            if oldest_ts >= cutoff and len(self._last_seen) <= self.max_users:
+                break
+            del self._last_seen[oldest_user]
+
+    def __iter__(self):
+        cutoff = time.time() - self.window_seconds
+        return iter([user for user, seen_at in self._last_seen.items() if seen_at >= cutoff])
+
+    def __len__(self):
+        return len(self._last_seen)
+
+    def __contains__(self, user):
+        return user in self._last_seen
+
+    def __bool__(self):
+        return bool(self._last_seen)
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self._last_seen) + sum(sys.getsizeof(user) + 24 for user in self._last_seen)
+
+    def to_list(self) -> List[list]:
+        return [[user, seen_at] for user, seen_at in self._last_seen.items()]
+
+    @classmethod
+    def from_list(cls, items) -> "RecentUsers":
+        recent = cls()
+        for user, seen_at in items:
+            recent._last_seen[str(user)] = float(seen_at)
+        recent._expire(time.time())
+        return recent
+
+
 @dataclass
 class ChannelSocialState:
     message_count: int = 0
-    users_seen: set = field(default_factory=set)
+    users_seen: RecentUsers = field(default_factory=RecentUsers)
     active_loop_for_message: Optional[MemoryLoop] = None
     memory_loops: List[MemoryLoop] = field(default_factory=list)
     user_profiles: Dict[str, UserSocialProfile] = field(default_factory=dict)
@@ -46,6 +112,11 @@ class ChannelSocialState:
         default_factory=lambda: {"mood": "neutral", "remaining_messages": 0, "cooldown_messages": 0}
     )
     drama_reset_at: datetime = field(default_factory=datetime.utcnow)
+    # Min-heap de (mensagem em que expira, tipo, chave, carimbo). O carimbo é o
+    # last_updated_message/last_used da época do agendamento: se o perfil ou
+    # loop foi tocado depois, a entrada está velha e é só descartada.
+    expiry_heap: List[tuple] = field(default_factory=list)
+    last_active_at: float = field(default_factory=time.monotonic)
 
 
 class SocialDynamicsEngine:
@@ -62,16 +133,150 @@ class SocialDynamicsEngine:
     SOCIAL_PROFILE_MIN_SIGNAL = 0.08
     DRAMA_RESET_INTERVAL = timedelta(hours=24)
     DEFAULT_STORAGE_PATH = Path("glorpinia_memory_loops.json")
-
-    def __init__(self, storage_path: Optional[Path] = None):
+    DEFAULT_LEXICON_PATH = Path("social_lexicon.txt")
+    # Canal sem atividade por esse tempo é gravado em disco e sai da memória.
+    IDLE_HIBERNATE_SECONDS = 30 * 60
+    LOOP_DECAY_EVERY_MESSAGES = 20
+    LOOP_DECAY_FACTOR = 0.97
+    # Entradas velhas no heap acima disso (x perfis + loops) disparam uma reconstrução.
+    EXPIRY_HEAP_SLACK = 2
+
+    def __init__(
+        self,
+        storage_path: Optional[Path] = None,
+        lexicon_path: Optional[Path] = None,
+        idle_hibernate_seconds: Optional[float] = None,
+    ):
         self.storage_path = Path(storage_path) if storage_path else self.DEFAULT_STORAGE_PATH
+        self.idle_hibernate_seconds = (
+            self.IDLE_HIBERNATE_SECONDS if idle_hibernate_seconds is None else idle_hibernate_seconds
+        )
         self.channel_states: Dict[str, ChannelSocialState] = {}
+        self._hibernated = set()
+        # Todo acesso ao estado de um canal passa pelo lock dele (ver channel_locks.py):
+        # websocket, threads de geração e a thread de persistência.
+        self._channel_locks = ChannelLocks()
+        self.lexicon = LexiconMatcher.from_file(Path(lexicon_path) if lexicon_path else self.DEFAULT_LEXICON_PATH)
+        # Disco só em background: o chat marca sujo/anota no journal e a thread grava.
+        self.persistence = SocialStatePersistence(
+            serialize=self._serialize_for_persistence,
+            path_for=self._persistence_path,
+            on_tick=self.hibernate_idle_channels,
+        )
+
+    def start_persistence_thread(self):
+        self.persistence.start_flush_thread()
+
+    def stop_persistence_thread(self):
+        """Para a thread de persistência e grava o que estiver pendente (usado no shutdown)."""
+        self.persistence.stop_flush_thread()
 
     def _normalize_channel(self, channel: Optional[str]) -> str:
         if not channel:
             return "global"
         return str(channel).strip().lower().replace("#", "") or "global"
 
+    # --- Hibernação de canais ociosos ---
+
+    def _hibernation_path_for_channel(self, channel: str) -> Path:
+        channel_key = self._normalize_channel(channel)
+        stem = self.storage_path.stem
+        suffix = self.storage_path.suffix or ".json"
+        return self.storage_path.with_name(f"{stem}_state_{channel_key}{suffix}")
+
+    def hibernate_idle_channels(self, idle_seconds: Optional[float] = None) -> List[str]:
+        """
+        Grava e tira da memória os canais sem atividade há `idle_seconds`.
+        Loops e perfis já vão pelo journal/snapshot; aqui é salvo o resto
+        (contagem de mensagens, users_seen, drama, mood). O próximo acesso ao
+        canal recarrega tudo. Retorna os canais hibernados.
+        """
+        idle_seconds = self.idle_hibernate_seconds if idle_seconds is None else idle_seconds
+        cutoff = time.monotonic() - idle_seconds
+        hibernated = []
+        for channel_key in [key for key, state in list(self.channel_states.items()) if state.last_active_at <= cutoff]:
+            # Flush antes de pegar o lock do canal: o flush pega o lock do canal por dentro.
+            self.persistence.flush(channels=[channel_key])
+            with self._channel_locks.hold(channel_key):
+                state = self.channel_states.get(channel_key)
+                if state is None or state.last_active_at > cutoff or self.persistence.has_pending(channel_key):
+                    continue
+                try:
+                    atomic_write_json(self._hibernation_path_for_channel(channel_key), self._serialize_channel_runtime(state))
+                except Exception as exc:
+                    logging.error("[SocialDynamics] failed hibernating channel=%s error=%s", channel_key, exc)
+                    continue
+                del self.channel_states[channel_key]
+                self._hibernated.add(channel_key)
+                hibernated.append(channel_key)
+        if hibernated:
+            logging.info("[SocialDynamics] canais ociosos hibernados: %s", ", ".join(hibernated))
+        return hibernated
+
+    def _serialize_channel_runtime(self, state: ChannelSocialState) -> Dict[str, object]:
+        return {
+            "message_count": state.message_count,
+            "users_seen": state.users_seen.to_list(),
+            "drama_state": dict(state.drama_state),
+            "bot_state": dict(state.bot_state),
+            "drama_reset_at": state.drama_reset_at.isoformat(),
+        }
+
+    def _load_hibernated_state(self, channel_key: str, state: ChannelSocialState):
+        path = self._hibernation_path_for_channel(channel_key)
+        self._hibernated.discard(channel_key)
+        if not path.exists():
+            return
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            state.message_count = int(raw.get("message_count", 0))
+            state.users_seen = RecentUsers.from_list(raw.get("users_seen", []))
+            state.drama_state.update(raw.get("drama_state") or {})
+            state.bot_state.update(raw.get("bot_state") or {})
+            if raw.get("drama_reset_at"):
+                state.drama_reset_at = datetime.fromisoformat(raw["drama_reset_at"])
+            # O arquivo só vale até o canal voltar; depois a memória é a fonte da verdade.
+            path.unlink()
+            logging.debug("[SocialDynamics] channel state restored from hibernation channel=%s count=%s", channel_key, state.message_count)
+        except Exception as exc:
+            logging.error("[SocialDynamics] failed restoring hibernated channel=%s error=%s", channel_key, exc)
+
+    def _estimate_state_bytes(self, state: ChannelSocialState) -> int:
+        profile_bytes = sum(
+            sys.getsizeof(user) + sys.getsizeof(profile) + sys.getsizeof(profile.__dict__)
+            for user, profile in state.user_profiles.items()
+        )
+        loop_bytes = sum(
+            sys.getsizeof(loop) + sys.getsizeof(loop.topic) + sum(sys.getsizeof(example) for example in loop.examples)
+            for loop in state.memory_loops
+        )
+        return (
+            sys.getsizeof(state.user_profiles)
+            + profile_bytes
+            + loop_bytes
+            + state.users_seen.memory_bytes()
+            + sys.getsizeof(state.expiry_heap)
+            + len(state.expiry_heap) * 72
+        )
+
+    def memory_stats(self) -> Dict[str, object]:
+        """
+        Contabilidade aproximada da memória do estado social (para o *debug).
+        Trava um canal de cada vez; não chamar segurando o lock de outro canal.
+        """
+        per_channel = {}
+        for key in list(self.channel_states):
+            with self._channel_locks.hold(key):
+                state = self.channel_states.get(key)
+                if state is not None:
+                    per_channel[key] = self._estimate_state_bytes(state)
+        return {
+            "channels_loaded": len(per_channel),
+            "channels_hibernated": len(self._hibernated),
+            "total_bytes": sum(per_channel.values()),
+            "per_channel_bytes": per_channel,
+        }
+
     def _default_memory_loops(self) -> List[MemoryLoop]:
         return [
             MemoryLoop(
@@ -85,17 +290,25 @@ class SocialDynamicsEngine:
 
     def _get_channel_state(self, channel: Optional[str]) -> ChannelSocialState:
         channel_key = self._normalize_channel(channel)
-        if channel_key in self.channel_states:
-            return self.channel_states[channel_key]
+        state = self.channel_states.get(channel_key)
+        if state is None:
+            with self._channel_locks.hold(channel_key):
+                state = self.channel_states.get(channel_key) or self._load_channel_state(channel_key)
+        state.last_active_at = time.monotonic()
+        return state
 
+    def _load_channel_state(self, channel_key: str) -> ChannelSocialState:
         state = ChannelSocialState(memory_loops=self._default_memory_loops())
         self._load_memory_loops(channel_key, state)
         self._load_user_profiles(channel_key, state)
+        self._load_hibernated_state(channel_key, state)
         self._prune_loops(state, channel=channel_key, save=False)
         self._prune_user_profiles(state, channel=channel_key, save=False)
+        self._rebuild_expiry_heap(state)
         self.channel_states[channel_key] = state
         return state
 
+    @channel_locked
     def observe_message(self, channel: str, author: str, content: str, bot_nick: Optional[str] = None):
         state = self._get_channel_state(channel)
         self._maybe_reset_drama_for_interval(state, channel)
@@ -104,17 +317,23 @@ class SocialDynamicsEngine:
         logging.debug("[SocialDynamics] observe_message channel=%s count=%s author=%s content=%s", channel, state.message_count, author, content[:120])
         state.users_seen.add(author.lower())
 
-        if state.message_count % 20 == 0:
+        loops_decayed = state.message_count % self.LOOP_DECAY_EVERY_MESSAGES == 0
+        if loops_decayed:
             for loop in state.memory_loops:
-                loop.weight *= 0.97
+                loop.weight *= self.LOOP_DECAY_FACTOR
 
-        self._update_user_profile(state, channel=channel, author=author, content=content)
-        self._prune_loops(state, channel=channel)
-        self._prune_user_profiles(state, channel=channel)
+        # Uma passada pelos léxicos serve para perfil, estilo e mood.
+        lexicon_hits = self.lexicon.categories((content or "").lower())
+        self._update_user_profile(state, channel=channel, author=author, content=content, lexicon_hits=lexicon_hits)
+        # Só o perfil do autor foi tocado; o resto expira pelo heap quando vence.
+        if loops_decayed:
+            self._prune_loops(state, channel=channel)
+        self._expire_due(state, channel=channel)
         self._roll_memory_loop(state)
         self._roll_drama_events(state, author)
-        self._update_mood(state, author=author, content=content, bot_nick=bot_nick)
+        self._update_mood(state, author=author, content=content, bot_nick=bot_nick, lexicon_hits=lexicon_hits)
 
+    @channel_locked
     def reset_drama_state(self, channel: str, reason: str = "manual"):
         state = self._get_channel_state(channel)
         state.drama_state = {
@@ -123,11 +342,12 @@ class SocialDynamicsEngine:
             "suspect": None,
             "rivals": None,
         }
-        state.users_seen = set()
+        state.users_seen = RecentUsers()
         state.bot_state = {"mood": "neutral", "remaining_messages": 0, "cooldown_messages": 0}
         state.drama_reset_at = datetime.utcnow()
         logging.info("[SocialDynamics] drama_state reset channel=%s reason=%s", channel, reason)
 
+    @channel_locked
     def register_bot_message(self, channel: str):
         state = self._get_channel_state(channel)
         remaining = int(state.bot_state.get("remaining_messages", 0) or 0)
@@ -154,6 +374,7 @@ class SocialDynamicsEngine:
         if (now - state.drama_reset_at) >= self.DRAMA_RESET_INTERVAL:
             self.reset_drama_state(channel, reason="24h_interval")
 
+    @channel_locked
     def get_injection_payload(self, channel: str, author: Optional[str] = None) -> Dict[str, object]:
         state = self._get_channel_state(channel)
         memory_loop = None
@@ -162,6 +383,7 @@ class SocialDynamicsEngine:
             memory_loop = {"topic": loop.topic, "type": loop.type, "examples": loop.examples}
             loop.weight *= 0.9
             loop.last_used = state.message_count
+            self._schedule_loop_expiry(state, loop)
             self._persist_loops(channel, state)
             self._prune_loops(state, channel=channel)
 
@@ -203,21 +425,24 @@ class SocialDynamicsEngine:
                 return
 
     def _roll_drama_events(self, state: ChannelSocialState, author: str):
-        candidates = list(state.users_seen)
-        if not candidates:
+        if not state.users_seen:
             return
 
-        if random.random() < self.FAVORITE_PROBABILITY:
-            state.drama_state["favorite_of_the_day"] = random.choice(candidates)
-
-        if random.random() < self.ENEMY_PROBABILITY:
-            state.drama_state["enemy_of_the_day"] = random.choice(candidates)
-
-        if random.random() < self.SUSPECT_PROBABILITY:
-            state.drama_state["suspect"] = random.choice(candidates)
+        # A lista de candidatos só é montada se algum sorteio pedir.
+        candidates = None
+        for role, probability in (
+            ("favorite_of_the_day", self.FAVORITE_PROBABILITY),
+            ("enemy_of_the_day", self.ENEMY_PROBABILITY),
+            ("suspect", self.SUSPECT_PROBABILITY),
+        ):
+            if random.random() < probability:
+                candidates = candidates if candidates is not None else list(state.users_seen)
+                if candidates:
+                    state.drama_state[role] = random.choice(candidates)
 
         self._refresh_rivals_from_drama_state(state)
 
+    @channel_locked
     def set_drama_role_target(self, channel: str, role: str, user: str):
         state = self._get_channel_state(channel)
         normalized_user = (user or "").strip().lower()
@@ -241,7 +466,14 @@ class SocialDynamicsEngine:
             return
         state.drama_state["rivals"] = None
 
-    def _update_mood(self, state: ChannelSocialState, author: str, content: str, bot_nick: Optional[str] = None):
+    def _update_mood(
+        self,
+        state: ChannelSocialState,
+        author: str,
+        content: str,
+        bot_nick: Optional[str] = None,
+        lexicon_hits: Optional[frozenset] = None,
+    ):
         text = (content or "").lower().strip()
         lowered_author = (author or "").lower()
         bot_aliases = {"glorpinia", "glorp", (bot_nick or "").lower().strip()}
@@ -259,6 +491,7 @@ class SocialDynamicsEngine:
             text=text,
             author=lowered_author,
             bot_aliases=bot_aliases,
+            lexicon_hits=lexicon_hits,
         )
 
         if mood_event:
@@ -273,35 +506,27 @@ class SocialDynamicsEngine:
         state.bot_state["remaining_messages"] = 0
         logging.debug("[SocialDynamics] mood_state=%s", state.bot_state)
 
-    def _infer_contextual_mood_event(self, text: str, author: str, bot_aliases: set):
+    def _infer_contextual_mood_event(self, text: str, author: str, bot_aliases: set, lexicon_hits: Optional[frozenset] = None):
         if not text:
             return None
 
-        rude_tokens = {
-            "burra", "burro", "idiota", "lixo", "inutil", "otaria", "otário", "ridicula", "ridículo", "bot ruim", "calada", "cala boca"
-        }
-        praise_tokens = {
-            "boa", "mandou bem", "linda", "fofa", "genia", "gênia", "braba", "te amo", "arrasou"
-        }
-        question_tokens = {"por que", "porque", "como", "explica", "teoria", "qual", "quando"}
-
+        hits = self.lexicon.categories(text) if lexicon_hits is None else lexicon_hits
         mentions_bot = any(alias and (f"@{alias}" in text or alias in text) for alias in bot_aliases)
-        second_person = any(token in text for token in ["vc", "você", "tu", "teu", "tua", "sua", "seu", "te "])
-        direct_to_bot = mentions_bot or second_person
+        direct_to_bot = mentions_bot or "second_person" in hits
 
-        if direct_to_bot and any(token in text for token in rude_tokens):
+        if direct_to_bot and "rude" in hits:
             return "angry"
 
-        if direct_to_bot and any(token in text for token in praise_tokens):
+        if direct_to_bot and "praise" in hits:
             return "happy"
 
-        if mentions_bot and "?" in text and any(token in text for token in question_tokens):
+        if mentions_bot and "?" in text and "question" in hits:
             return "curious"
 
-        if re.search(r"\b(caos|anarquia|glitch)\b", text):
+        if "chaos" in hits:
             return "chaotic"
 
-        if re.search(r"\btsundere\b", text):
+        if "tsundere" in hits:
             return "tsundere"
 
         return None
@@ -315,6 +540,7 @@ class SocialDynamicsEngine:
         channel: str,
         author: str,
         content: str,
+        lexicon_hits: Optional[frozenset] = None,
     ):
         user_key = self._normalize_author(author)
         if not user_key:
@@ -324,15 +550,14 @@ class SocialDynamicsEngine:
         self._decay_user_profile(profile, state.message_count)
 
         text = (content or "").lower()
-        positive_markers = ["boa", "mandou bem", "linda", "fofa", "gênia", "genia", "braba", "te amo", "arrasou"]
-        negative_markers = ["burra", "burro", "idiota", "lixo", "inutil", "inútil", "calada", "cala boca", "bot ruim"]
-        if any(marker in text for marker in positive_markers):
+        hits = self.lexicon.categories(text) if lexicon_hits is None else lexicon_hits
+        if "praise" in hits:
             profile.positive_interactions += 0.45
             emotion = "joy"
-        elif any(marker in text for marker in negative_markers):
+        elif "rude" in hits:
             profile.negative_interactions += 0.35
             emotion = "anger"
-        elif re.search(r"\b(caos|anarquia|glitch)\b", text):
+        elif "chaos" in hits:
             profile.positive_interactions += 0.15
             emotion = "chaos"
         elif "?" in text:
@@ -341,11 +566,12 @@ class SocialDynamicsEngine:
             emotion = "neutral"
 
         profile.last_emotion = self._safe_emotion_label(emotion)
-        profile.teasing_style = self._infer_teasing_style(content=content)
+        profile.teasing_style = self._infer_teasing_style(content=content, lexicon_hits=hits)
         profile.trusted_joke_level = self._calculate_trusted_joke_level(profile)
         profile.last_updated_message = state.message_count
         state.user_profiles[user_key] = profile
-        self._persist_user_profiles(channel, state)
+        self._schedule_profile_expiry(state, user_key, profile)
+        self.persistence.journal_profile(self._normalize_channel(channel), user_key, self._serialize_profile(profile))
         logging.debug(
             "[SocialDynamics] user_profile_updated channel=%s user=%s positive=%.3f negative=%.3f style=%s trusted=%.3f emotion=%s",
             channel,
@@ -366,23 +592,19 @@ class SocialDynamicsEngine:
         profile.negative_interactions *= decay
         profile.trusted_joke_level *= decay
 
-    def _infer_teasing_style(self, content: str) -> str:
+    def _infer_teasing_style(self, content: str, lexicon_hits: Optional[frozenset] = None) -> str:
         """Classify style from safe signals only; never persist literal message text."""
         text = (content or "").lower()
-        has_laughter = bool(re.search(r"\b(k{2,}|kkk+|rsrs+|haha+)\b", text))
-        has_teasing_marker = any(
-            marker in text
-            for marker in ["zoeira", "zoando", "brincadeira", "ironia", "sarcasmo", "provoca", "provocar"]
-        )
-        if has_teasing_marker or has_laughter:
+        hits = self.lexicon.categories(text) if lexicon_hits is None else lexicon_hits
+        if "teasing" in hits or "laughter" in hits:
             return "provocative"
-        if any(marker in text for marker in ["boa", "mandou bem", "linda", "fofa", "gênia", "genia", "braba", "te amo", "arrasou"]):
+        if "praise" in hits:
             return "supportive"
         if "?" in text:
             return "curiosity"
-        if re.search(r"\b(caos|anarquia|glitch)\b", text):
+        if "chaos" in hits:
             return "chaos"
-        if re.search(r"\btsundere\b", text):
+        if "tsundere" in hits:
             return "tsundere"
         return "neutral"
 
@@ -402,6 +624,95 @@ class SocialDynamicsEngine:
             max(0.0, float(profile.trusted_joke_level or 0.0) * decay),
         )
 
+    def _profile_signal(self, profile: UserSocialProfile, current_message_count: int) -> float:
+        return max(self._decayed_profile_values(profile, current_message_count))
+
+    def _is_profile_expired(self, profile: UserSocialProfile, current_message_count: int) -> bool:
+        age = current_message_count - profile.last_updated_message
+        return age > self.SOCIAL_PROFILE_TTL_MESSAGES or self._profile_signal(profile, current_message_count) < self.SOCIAL_PROFILE_MIN_SIGNAL
+
+    def _profile_expiry_message(self, profile: UserSocialProfile) -> int:
+        """
+        Primeira contagem de mensagens em que o perfil passa a expirar (TTL ou
+        sinal decaído abaixo do mínimo), calculada uma vez no update em vez de
+        reavaliar o perfil a cada mensagem do canal.
+        """
+        start = int(profile.last_updated_message or 0)
+        expires_at = start + self.SOCIAL_PROFILE_TTL_MESSAGES + 1
+        strongest = self._profile_signal(profile, start)
+        if strongest < self.SOCIAL_PROFILE_MIN_SIGNAL:
+            return start
+        # Estimativa pelo log; os laços corrigem o arredondamento de float
+        # para bater exatamente com o critério de `_is_profile_expired`.
+        age = math.floor(
+            math.log(self.SOCIAL_PROFILE_MIN_SIGNAL / strongest) / math.log(self.SOCIAL_PROFILE_DECAY_PER_MESSAGE)
+        ) + 1
+        age = max(1, min(age, expires_at - start))
+        while age > 1 and self._profile_signal(profile, start + age - 1) < self.SOCIAL_PROFILE_MIN_SIGNAL:
+            age -= 1
+        while start + age < expires_at and self._profile_signal(profile, start + age) >= self.SOCIAL_PROFILE_MIN_SIGNAL:
+            age += 1
+        return min(start + age, expires_at)
+
+    def _schedule_profile_expiry(self, state: ChannelSocialState, user_key: str, profile: UserSocialProfile):
+        heapq.heappush(
+            state.expiry_heap,
+            (self._profile_expiry_message(profile), "profile", user_key, profile.last_updated_message),
+        )
+        self._maybe_compact_expiry_heap(state)
+
+    def _schedule_loop_expiry(self, state: ChannelSocialState, loop: MemoryLoop):
+        heapq.heappush(
+            state.expiry_heap,
+            (loop.last_used + self.LOOP_TTL_MESSAGES + 1, "loop", loop.topic, loop.last_used),
+        )
+        self._maybe_compact_expiry_heap(state)
+
+    def _rebuild_expiry_heap(self, state: ChannelSocialState):
+        state.expiry_heap = [
+            (self._profile_expiry_message(profile), "profile", user, profile.last_updated_message)
+            for user, profile in state.user_profiles.items()
+        ] + [
+            (loop.last_used + self.LOOP_TTL_MESSAGES + 1, "loop", loop.topic, loop.last_used)
+            for loop in state.memory_loops
+        ]
+        heapq.heapify(state.expiry_heap)
+
+    def _maybe_compact_expiry_heap(self, state: ChannelSocialState):
+        live = len(state.user_profiles) + len(state.memory_loops)
+        if len(state.expiry_heap) > self.EXPIRY_HEAP_SLACK * live + 64:
+            self._rebuild_expiry_heap(state)
+
+    def _expire_due(self, state: ChannelSocialState, channel: str):
+        """Remove só perfis/loops cujo ponto de expiração já chegou."""
+        loops_due = False
+        heap = state.expiry_heap
+        while heap and heap[0][0] <= state.message_count:
+            _, kind, key, stamp = heapq.heappop(heap)
+            if kind == "loop":
+                loops_due = loops_due or any(
+                    loop.topic == key and loop.last_used == stamp for loop in state.memory_loops
+                )
+                continue
+
+            profile = state.user_profiles.get(key)
+            if profile is None or profile.last_updated_message != stamp:
+                continue
+            if not self._is_profile_expired(profile, state.message_count):
+                heapq.heappush(heap, (state.message_count + 1, kind, key, stamp))
+                continue
+            logging.debug(
+                "[SocialDynamics] user_profile expired user=%s age=%s signal=%.3f",
+                key,
+                state.message_count - profile.last_updated_message,
+                self._profile_signal(profile, state.message_count),
+            )
+            del state.user_profiles[key]
+            self.persistence.journal_profile(self._normalize_channel(channel), key, None)
+
+        if loops_due:
+            self._prune_loops(state, channel=channel)
+
     def _safe_emotion_label(self, emotion: str) -> str:
         allowed = {"neutral", "joy", "anger", "sadness", "curiosity", "chaos", "tsundere"}
         normalized = (emotion or "neutral").strip().lower()
@@ -441,6 +752,7 @@ class SocialDynamicsEngine:
         style = style_fragments.get(profile.teasing_style, style_fragments["neutral"])
         return f"@{user_key} {style}, {tone} Última emoção percebida: {profile.last_emotion}."
 
+    @channel_locked
     def add_memory_loop(self, channel: str, topic: str, users: Optional[List[str]] = None, weight: float = 0.5, loop_type: str = "running_joke", examples: Optional[List[str]] = None):
         state = self._get_channel_state(channel)
         normalized_topic = (topic or "").strip()
@@ -459,6 +771,7 @@ class SocialDynamicsEngine:
                 loop.users = merged_users
                 loop.weight = max(loop.weight, weight)
                 loop.last_used = state.message_count
+                self._schedule_loop_expiry(state, loop)
                 merged_examples = list(loop.examples)
                 for example in clean_examples:
                     if example not in merged_examples:
@@ -475,9 +788,9 @@ class SocialDynamicsEngine:
                 self._prune_loops(state, channel=channel)
                 return
 
-        state.memory_loops.append(
-            MemoryLoop(topic=normalized_topic, users=users or [], weight=weight, last_used=state.message_count, type=loop_type, examples=clean_examples[-5:])
-        )
+        new_loop = MemoryLoop(topic=normalized_topic, users=users or [], weight=weight, last_used=state.message_count, type=loop_type, examples=clean_examples[-5:])
+        state.memory_loops.append(new_loop)
+        self._schedule_loop_expiry(state, new_loop)
         logging.debug(
             "[SocialDynamics] memory_loop created topic=%s users=%s weight=%.3f type=%s examples=%s",
             normalized_topic,
@@ -490,6 +803,7 @@ class SocialDynamicsEngine:
         state.memory_loops = state.memory_loops[-self.MAX_LOOPS :]
         self._prune_loops(state, channel=channel)
 
+    @channel_locked
     def get_debug_snapshot(self, channel: str) -> Dict[str, object]:
         state = self._get_channel_state(channel)
         active_loop = None
@@ -504,6 +818,7 @@ class SocialDynamicsEngine:
         return {
             "message_count": state.message_count,
             "users_seen": sorted(state.users_seen),
+            "users_seen_limit": state.users_seen.max_users,
             "mood": state.bot_state.get("mood", "neutral"),
             "mood_duration": state.bot_state.get("remaining_messages", 0),
             "mood_cooldown": state.bot_state.get("cooldown_messages", 0),
@@ -611,48 +926,64 @@ class SocialDynamicsEngine:
         except Exception as exc:
             logging.error("[SocialDynamics] failed loading memory loops path=%s error=%s", channel_path, exc)
 
+    def _profile_from_dict(self, item: dict) -> UserSocialProfile:
+        return UserSocialProfile(
+            positive_interactions=float(item.get("positive_interactions", 0.0)),
+            negative_interactions=float(item.get("negative_interactions", 0.0)),
+            teasing_style=(item.get("teasing_style") or "neutral"),
+            trusted_joke_level=float(item.get("trusted_joke_level", 0.0)),
+            last_emotion=self._safe_emotion_label(item.get("last_emotion") or "neutral"),
+            last_updated_message=int(item.get("last_updated_message", 0)),
+        )
+
+    def _serialize_profile(self, profile: UserSocialProfile) -> Dict[str, object]:
+        return {
+            "positive_interactions": round(profile.positive_interactions, 4),
+            "negative_interactions": round(profile.negative_interactions, 4),
+            "teasing_style": profile.teasing_style,
+            "trusted_joke_level": round(profile.trusted_joke_level, 4),
+            "last_emotion": profile.last_emotion,
+            "last_updated_message": profile.last_updated_message,
+        }
+
     def _load_user_profiles(self, channel: str, state: ChannelSocialState):
         channel_path = self._profile_storage_path_for_channel(channel)
-        if not channel_path.exists():
+        journal_path = journal_path_for(channel_path)
+        if not channel_path.exists() and not journal_path.exists():
             return
         try:
-            raw = json.loads(channel_path.read_text(encoding="utf-8"))
+            raw = json.loads(channel_path.read_text(encoding="utf-8")) if channel_path.exists() else {}
             loaded_profiles = {}
             for user, item in raw.items():
                 user_key = self._normalize_author(user)
                 if not user_key or not isinstance(item, dict):
                     continue
-                loaded_profiles[user_key] = UserSocialProfile(
-                    positive_interactions=float(item.get("positive_interactions", 0.0)),
-                    negative_interactions=float(item.get("negative_interactions", 0.0)),
-                    teasing_style=(item.get("teasing_style") or "neutral"),
-                    trusted_joke_level=float(item.get("trusted_joke_level", 0.0)),
-                    last_emotion=self._safe_emotion_label(item.get("last_emotion") or "neutral"),
-                    last_updated_message=int(item.get("last_updated_message", 0)),
-                )
+                loaded_profiles[user_key] = self._profile_from_dict(item)
+
+            # Mudanças posteriores ao snapshot, na ordem em que aconteceram.
+            journal = read_journal(journal_path)
+            for user, item in journal:
+                user_key = self._normalize_author(user)
+                if not user_key:
+                    continue
+                if isinstance(item, dict):
+                    loaded_profiles[user_key] = self._profile_from_dict(item)
+                else:
+                    loaded_profiles.pop(user_key, None)
+            self.persistence.note_journal_loaded(self._normalize_channel(channel), len(journal))
+
             state.user_profiles = loaded_profiles
-            logging.debug("[SocialDynamics] user_profiles loaded path=%s count=%s", channel_path, len(state.user_profiles))
+            logging.debug(
+                "[SocialDynamics] user_profiles loaded path=%s count=%s journal_entries=%s",
+                channel_path,
+                len(state.user_profiles),
+                len(journal),
+            )
         except Exception as exc:
             logging.error("[SocialDynamics] failed loading user profiles path=%s error=%s", channel_path, exc)
 
     def _persist_user_profiles(self, channel: str, state: ChannelSocialState):
-        serialized = {
-            user: {
-                "positive_interactions": round(profile.positive_interactions, 4),
-                "negative_interactions": round(profile.negative_interactions, 4),
-                "teasing_style": profile.teasing_style,
-                "trusted_joke_level": round(profile.trusted_joke_level, 4),
-                "last_emotion": profile.last_emotion,
-                "last_updated_message": profile.last_updated_message,
-            }
-            for user, profile in sorted(state.user_profiles.items())
-        }
-        try:
-            channel_path = self._profile_storage_path_for_channel(channel)
-            channel_path.parent.mkdir(parents=True, exist_ok=True)
-            channel_path.write_text(json.dumps(serialized, ensure_ascii=False, indent=2), encoding="utf-8")
-        except Exception as exc:
-            logging.error("[SocialDynamics] failed persisting user profiles channel=%s error=%s", channel, exc)
+        self.persistence.mark_dirty(self._normalize_channel(channel), PROFILES)
 
     def _prune_user_profiles(self, state: ChannelSocialState, channel: str, save: bool = True):
         before = len(state.user_profiles)
@@ -674,20 +1005,32 @@ class SocialDynamicsEngine:
             self._persist_user_profiles(channel, state)
 
     def _persist_loops(self, channel: str, state: ChannelSocialState):
-        serialized = [
-            {
-                "topic": loop.topic,
-                "users": loop.users,
-                "weight": loop.weight,
-                "last_used": loop.last_used,
-                "type": loop.type,
-                "examples": loop.examples,
-            }
-            for loop in state.memory_loops
-        ]
-        try:
-            channel_path = self._storage_path_for_channel(channel)
-            channel_path.parent.mkdir(parents=True, exist_ok=True)
-            channel_path.write_text(json.dumps(serialized, ensure_ascii=False, indent=2), encoding="utf-8")
-        except Exception as exc:
-            logging.error("[SocialDynamics] failed persisting memory loops channel=%s error=%s", channel, exc)
+        self.persistence.mark_dirty(self._normalize_channel(channel), LOOPS)
+
+    def _persistence_path(self, channel_key: str, kind: str) -> Path:
+        if kind == PROFILES:
+            return self._profile_storage_path_for_channel(channel_key)
+        return self._storage_path_for_channel(channel_key)
+
+    def _serialize_for_persistence(self, channel_key: str, kind: str):
+        """
+        Chamado pela thread de persistência, com o lock do canal.
+        None = canal ainda carregando, tenta de novo no próximo flush.
+        """
+        with self._channel_locks.hold(channel_key):
+            state = self.channel_states.get(channel_key)
+            if state is None:
+                return None
+            if kind == PROFILES:
+                return {user: self._serialize_profile(profile) for user, profile in sorted(state.user_profiles.items())}
+            return [
+                {
+                    "topic": loop.topic,
+                    "users": list(loop.users),
+                    "weight": loop.weight,
+                    "last_used": loop.last_used,
+                    "type": loop.type,
+                    "examples": list(loop.examples),
+                }
+                for loop in state.memory_loops
+            ]
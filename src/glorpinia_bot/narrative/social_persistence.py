@@ -0,0 +1,203 @@
+"""Persistência em background do estado social (loops de memória e perfis).
+
+O `SocialDynamicsEngine` não escreve mais em disco no caminho do chat: ele só
+marca o canal como sujo (`mark_dirty`) ou registra a mudança de um perfil no
+journal em memória (`journal_profile`). Uma thread daemon chama `flush` a cada
+`flush_interval` segundos:
+
+- snapshots (loops, perfis) são gravados num arquivo temporário e trocados
+  com `os.replace`, então um crash no meio nunca deixa JSON pela metade;
+- mudanças de perfil vão como linhas JSON num `.journal` append-only ao lado
+  do snapshot de perfis. Quando o journal passa de `journal_compact_lines`
+  linhas, o snapshot é regravado inteiro e o journal zerado.
+
+Na carga, o engine lê o snapshot e reaplica o journal (`read_journal`); uma
+última linha truncada por crash é simplesmente ignorada.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+FLUSH_INTERVAL_SECONDS = 5.0
+JOURNAL_COMPACT_LINES = 2_000
+
+LOOPS = "loops"
+PROFILES = "profiles"
+
+
+def journal_path_for(snapshot_path: Path) -> Path:
+    return snapshot_path.with_name(snapshot_path.name + ".journal")
+
+
+def atomic_write_json(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_journal(path: Path) -> List[Tuple[str, Optional[dict]]]:
+    """Entradas (usuário, perfil serializado ou None para remoção), na ordem em que foram gravadas."""
+    if not path.exists():
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                entries.append((record["u"], record.get("p")))
+            except (ValueError, KeyError, TypeError):
+                logging.warning("[SocialPersistence] linha inválida ignorada no journal path=%s", path)
+    return entries
+
+
+class SocialStatePersistence:
+    """
+    `serialize(channel, kind)` é fornecido pelo engine e devolve o conteúdo do
+    snapshot; `path_for(channel, kind)` devolve o arquivo. Ambos só são
+    chamados de dentro do `flush`, fora do caminho do chat. `on_tick`, se
+    houver, roda na mesma thread a cada ciclo (ex.: hibernar canais ociosos).
+    """
+
+    def __init__(
+        self,
+        serialize: Callable[[str, str], object],
+        path_for: Callable[[str, str], Path],
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        journal_compact_lines: int = JOURNAL_COMPACT_LINES,
+        on_tick: Optional[Callable[[], None]] = None,
+    ):
+        self._serialize = serialize
+        self._on_tick = on_tick
+        self._path_for = path_for
+        self.flush_interval = flush_interval
+        self.journal_compact_lines = journal_compact_lines
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty: Dict[str, set] = {}
+        self._journal: Dict[str, List[Tuple[str, Optional[dict]]]] = {}
+        self._journal_lines_on_disk: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"flushes": 0, "snapshots": 0, "journal_lines": 0}
+
+    # --- Caminho do chat: só memória ---
+
+    def mark_dirty(self, channel: str, kind: str):
+        with self._lock:
+            self._dirty.setdefault(channel, set()).add(kind)
+
+    def journal_profile(self, channel: str, user: str, serialized: Optional[dict]):
+        with self._lock:
+            self._journal.setdefault(channel, []).append((user, serialized))
+
+    def note_journal_loaded(self, channel: str, lines: int):
+        """Informa quantas linhas o journal já tinha na carga (para saber quando compactar)."""
+        with self._lock:
+            self._journal_lines_on_disk[channel] = lines
+
+    def has_pending(self, channel: Optional[str] = None) -> bool:
+        with self._lock:
+            if channel is None:
+                return bool(self._dirty or self._journal)
+            return channel in self._dirty or channel in self._journal
+
+    # --- Background ---
+
+    def flush(self, channels: Optional[List[str]] = None) -> int:
+        """Grava o que está pendente (de todos ou só de `channels`). Retorna quantos arquivos foram escritos."""
+        with self._flush_lock:
+            with self._lock:
+                if channels is None:
+                    dirty, self._dirty = self._dirty, {}
+                    journal, self._journal = self._journal, {}
+                else:
+                    dirty = {c: self._dirty.pop(c) for c in channels if c in self._dirty}
+                    journal = {c: self._journal.pop(c) for c in channels if c in self._journal}
+
+            written = 0
+            for channel in set(dirty) | set(journal):
+                kinds = dirty.get(channel, set())
+                entries = journal.get(channel, [])
+                try:
+                    if LOOPS in kinds and self._write_snapshot(channel, LOOPS):
+                        written += 1
+                    if PROFILES in kinds or self._journal_lines_on_disk.get(channel, 0) + len(entries) > self.journal_compact_lines:
+                        if self._write_snapshot(channel, PROFILES):
+                            written += 1
+                        else:
+                            self._requeue(channel, set(), entries)
+                    elif entries:
+                        self._append_journal(channel, entries)
+                        written += 1
+                except Exception as exc:
+                    logging.error("[SocialPersistence] falha ao gravar estado social channel=%s error=%s", channel, exc)
+                    self._requeue(channel, kinds, entries)
+            self.stats["flushes"] += 1
+            return written
+
+    def _requeue(self, channel: str, kinds: set, entries: List[Tuple[str, Optional[dict]]]):
+        with self._lock:
+            if kinds:
+                self._dirty.setdefault(channel, set()).update(kinds)
+            if entries:
+                self._journal[channel] = entries + self._journal.get(channel, [])
+
+    def _write_snapshot(self, channel: str, kind: str) -> bool:
+        data = self._serialize(channel, kind)
+        if data is None:
+            self._requeue(channel, {kind}, [])
+            return False
+        path = self._path_for(channel, kind)
+        atomic_write_json(path, data)
+        if kind == PROFILES:
+            # O snapshot já reflete tudo que estava no journal; o arquivo de journal pode zerar.
+            journal_path = journal_path_for(path)
+            if journal_path.exists():
+                journal_path.unlink()
+            self._journal_lines_on_disk[channel] = 0
+        self.stats["snapshots"] += 1
+        return True
+
+    def _append_journal(self, channel: str, entries: List[Tuple[str, Optional[dict]]]):
+        journal_path = journal_path_for(self._path_for(channel, PROFILES))
+        journal_path.parent.mkdir(parents=True, exist_ok=True)
+        lines = "".join(
+            json.dumps({"u": user, "p": serialized}, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for user, serialized in entries
+        )
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_lines_on_disk[channel] = self._journal_lines_on_disk.get(channel, 0) + len(entries)
+        self.stats["journal_lines"] += len(entries)
+
+    def start_flush_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def stop_flush_thread(self):
+        """Para a thread e grava o que ainda estiver pendente (usado no shutdown)."""
+        self._stop.set()
+        self.flush()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            if self.has_pending():
+                self.flush()
+            if self._on_tick:
+                try:
+                    self._on_tick()
+                except Exception as exc:
+                    logging.error("[SocialPersistence] falha na manutenção periódica error=%s", exc)
@@ -1,10 +1,14 @@
+import hashlib
+import json
 import logging
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 
-from .emote_classifier import classify_emote_name
+from .emote_classifier import EmoteClassificationMemo, classify_emotes_batch
+from .storage import get_store
 
 TWITCH_USERS_URL = "https://api.twitch.tv/helix/users"
 SEVENTV_USER_URL = "https://7tv.io/v3/users/twitch/{twitch_id}"
@@ -14,6 +18,13 @@ SEVENTV_GLOBAL_SET_FALLBACK_ID = "62cdd34e72a832540de95857"
 REFRESH_INTERVAL_SECONDS = 6 * 60 * 60  # 6h
 ZERO_WIDTH_FLAG = 1 << 8  # 256 -- bit da flag zero_width no 7TV v3
 
+CACHE_DB_PATH = "glorpinia_emotes.db"
+GLOBAL_SET_KEY = "__global__"
+
+HELIX_USERS_BATCH_SIZE = 100  # limite de `login` por chamada no /helix/users
+USER_ID_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60  # 7d -- login pode mudar de dono
+SYNC_MAX_WORKERS = 4
+
 
 class SevenTVChannelSync:
     """
@@ -22,76 +33,369 @@ class SevenTVChannelSync:
     emoção/intenção via emote_classifier, e injeta isso no EmoteManager
     através de load_from_seventv() -- sem alterar a API do EmoteManager,
     então choose_emote() e o resto do bot continuam iguais.
+
+    Cada set sincronizado fica gravado em disco (`seventv_sets`) com a hora
+    do fetch, um hash do conteúdo e a emoção já classificada de cada emote.
+    No startup `load_cached_sets` injeta tudo de forma síncrona, então o
+    vocabulário completo está disponível desde a primeira mensagem; o fetch
+    em background só acontece para sets velhos (REFRESH_INTERVAL_SECONDS) e,
+    se o conteúdo não mudou, nada é reclassificado.
+
+    Com `start_live_updates`, mudanças feitas pelo streamer chegam pela
+    EventAPI do 7TV (ver seventv_events.py) e são aplicadas como diff; o
+    fetch completo vira só reconciliação (startup, *emotesync, reconexão).
+
+    No startup, `sync_channels_async` coordena tudo: resolve os IDs da Twitch
+    em lote (até 100 logins por chamada, com cache login->ID em disco) e busca
+    os sets do 7TV num pool limitado de workers, reaproveitando conexões.
     """
 
-    def __init__(self, bot):
+    def __init__(self, bot, cache_path=CACHE_DB_PATH):
         self.bot = bot
         self._last_sync = {}
+        self._cached_sets = {}
+        self._set_keys_by_id = {}
+        self._cache_lock = threading.Lock()
+        self.event_subscriber = None
+        self._user_ids = {}
+        self.http = requests.Session()
+        self.store = get_store(cache_path)
+        try:
+            self.store.transaction(self._initialize_cache)
+        except Exception as e:
+            logging.error("[SevenTVSync] Falha ao inicializar o cache de emotes: %s", e)
+        self.classification_memo = EmoteClassificationMemo(self.store)
         print("[Feature] SevenTVChannelSync Initialized.")
 
+    def _initialize_cache(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS seventv_sets (
+                set_key TEXT PRIMARY KEY,
+                fetched_at REAL NOT NULL,
+                content_hash TEXT NOT NULL,
+                emotes TEXT NOT NULL
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(seventv_sets)")}
+        if "set_id" not in columns:
+            conn.execute("ALTER TABLE seventv_sets ADD COLUMN set_id TEXT")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS twitch_user_ids (
+                login TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                resolved_at REAL NOT NULL
+            )
+        """)
 
     def sync_channel_async(self, channel, force=False):
+        if not force and self._recently_synced(channel.lower()):
+            return
         t = threading.Thread(target=self._sync_channel, args=(channel, force))
         t.daemon = True
         t.start()
 
     def sync_global_async(self, force=False):
+        if not force and self._recently_synced(GLOBAL_SET_KEY):
+            return
         t = threading.Thread(target=self._sync_global, args=(force,))
         t.daemon = True
         t.start()
 
+    def sync_channels_async(self, channels, force=False, include_global=True):
+        """
+        Sincroniza vários canais (e o set global) numa thread coordenadora:
+        um lote de IDs na Helix + fetch do 7TV em pool limitado. Retorna a thread.
+        """
+        t = threading.Thread(target=self._sync_channels, args=(list(channels), force, include_global))
+        t.daemon = True
+        t.start()
+        return t
 
-    def _resolve_twitch_user_id(self, channel_login):
+    def _sync_channels(self, channels, force, include_global):
+        started = time.perf_counter()
+        pending = sorted({
+            channel.lower() for channel in channels
+            if force or not self._recently_synced(channel.lower())
+        })
+        sync_global = include_global and (force or not self._recently_synced(GLOBAL_SET_KEY))
+        if not pending and not sync_global:
+            return
+
+        user_ids = {}
+        if pending:
+            try:
+                user_ids = self.resolve_twitch_user_ids(pending)
+            except Exception as e:
+                logging.error("[SevenTVSync] Falha ao resolver IDs da Twitch em lote: %s", e)
+
+        with ThreadPoolExecutor(max_workers=SYNC_MAX_WORKERS, thread_name_prefix="seventv-sync") as pool:
+            futures = []
+            if sync_global:
+                futures.append(pool.submit(self._sync_global, force))
+            for channel in pending:
+                if channel not in user_ids:
+                    logging.error("[SevenTVSync] Falha ao sincronizar #%s: usuário Twitch não encontrado.", channel)
+                    continue
+                futures.append(pool.submit(self._sync_channel, channel, force, user_ids[channel]))
+            for future in as_completed(futures):
+                future.result()
+
+        logging.info(
+            "[SevenTVSync] Sync de %s canais%s concluído em %.2fs.",
+            len(pending),
+            " + set global" if sync_global else "",
+            time.perf_counter() - started,
+        )
+
+    # --- Cache em disco ---
+
+    def load_cached_sets(self, channels):
+        """
+        Carrega (síncrono) o set global e os sets dos canais a partir do cache,
+        sem rede. Retorna quantos sets foram aplicados no EmoteManager.
+        """
+        keys = [GLOBAL_SET_KEY] + [channel.lower() for channel in channels]
+        placeholders = ", ".join("?" for _ in keys)
+        try:
+            rows = self.store.query(
+                f"SELECT set_key, fetched_at, content_hash, emotes, set_id FROM seventv_sets WHERE set_key IN ({placeholders})",
+                keys,
+            )
+        except Exception as e:
+            logging.error("[SevenTVSync] Falha ao ler o cache de emotes: %s", e)
+            return 0
+
+        loaded = 0
+        for set_key, fetched_at, content_hash, emotes_json, set_id in rows:
+            entries = json.loads(emotes_json)
+            self._cached_sets[set_key] = (content_hash, entries)
+            self._last_sync[set_key] = fetched_at
+            self._remember_set_id(set_key, set_id)
+            if entries:
+                self._apply_entries(set_key, entries)
+                loaded += 1
+
+        logging.info("[SevenTVSync] %s sets de emotes carregados do cache local.", loaded)
+        return loaded
+
+    def _save_cached_set(self, set_key, content_hash, entries, fetched_at, set_id=None):
+        self.store.execute(
+            """
+            INSERT INTO seventv_sets (set_key, fetched_at, content_hash, emotes, set_id) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(set_key) DO UPDATE SET
+                fetched_at = excluded.fetched_at,
+                content_hash = excluded.content_hash,
+                emotes = excluded.emotes,
+                set_id = COALESCE(excluded.set_id, seventv_sets.set_id)
+            """,
+            (set_key, fetched_at, content_hash, json.dumps(entries, ensure_ascii=False), set_id),
+        )
+        self._cached_sets[set_key] = (content_hash, entries)
+
+    def _remember_set_id(self, set_key, set_id):
+        """Associa o ID do emote-set ao canal e assina as mudanças dele na EventAPI."""
+        if not set_id:
+            return
+        self._set_keys_by_id[set_id] = set_key
+        if self.event_subscriber:
+            self.event_subscriber.subscribe(set_id)
+
+    # --- Atualizações ao vivo (EventAPI) ---
+
+    def start_live_updates(self):
+        """Liga o assinante da EventAPI do 7TV para os sets já conhecidos."""
+        from .seventv_events import SevenTVEventSubscriber
+
+        if self.event_subscriber:
+            return self.event_subscriber
+        self.event_subscriber = SevenTVEventSubscriber(self)
+        for set_id in list(self._set_keys_by_id):
+            self.event_subscriber.subscribe(set_id)
+        self.event_subscriber.start()
+        return self.event_subscriber
+
+    def stop_live_updates(self):
+        if self.event_subscriber:
+            self.event_subscriber.stop()
+
+    def reconcile_async(self):
+        """Fetch completo de todos os sets conhecidos (ex.: após perder eventos numa reconexão)."""
+        set_keys = set(self._set_keys_by_id.values())
+        channels = [set_key for set_key in set_keys if set_key != GLOBAL_SET_KEY]
+        self.sync_channels_async(channels, force=True, include_global=GLOBAL_SET_KEY in set_keys)
+
+    def apply_emote_set_update(self, body):
+        """
+        Aplica um `emote_set.update` da EventAPI. `pushed` = emotes adicionados,
+        `pulled` = removidos, `updated` = renomeados/flags alteradas.
+        Retorna True se o set era conhecido e algo mudou.
+        """
+        set_key = self._set_keys_by_id.get(body.get("id"))
+        if set_key is None:
+            return False
+
+        def emote_changes(field):
+            return [change for change in body.get(field) or [] if change.get("key") == "emotes"]
+
+        removed = set()
+        added = []
+        for change in emote_changes("pulled"):
+            old = change.get("old_value") or {}
+            if old.get("name"):
+                removed.add(old["name"])
+        for change in emote_changes("pushed"):
+            new = change.get("value") or {}
+            if new.get("name"):
+                added.append({"name": new["name"], "flags": new.get("flags") or 0})
+        for change in emote_changes("updated"):
+            old = change.get("old_value") or {}
+            new = change.get("value") or {}
+            if old.get("name"):
+                removed.add(old["name"])
+            if new.get("name"):
+                added.append({"name": new["name"], "flags": new.get("flags") or 0})
+
+        if not removed and not added:
+            return False
+
+        with self._cache_lock:
+            _, cached_entries = self._cached_sets.get(set_key, (None, []))
+            known_emotions = {entry["name"]: entry["emotion"] for entry in cached_entries}
+            added_names = {entry["name"] for entry in added}
+            classified_added = self._classify_emotes(added, known_emotions)
+            entries = [
+                entry for entry in cached_entries
+                if entry["name"] not in removed and entry["name"] not in added_names
+            ] + classified_added
+
+            by_emotion, zero_width_names = self._group_entries(classified_added)
+            channel = None if set_key == GLOBAL_SET_KEY else set_key
+            self.bot.emote_manager.apply_seventv_diff(
+                channel, by_emotion, removed_names=removed, zero_width_names=zero_width_names
+            )
+            self._save_cached_set(set_key, self._content_hash(entries), entries, time.time())
+
+        logging.info(
+            "[SevenTVSync] EventAPI: %s atualizado ao vivo (+%s -%s).",
+            "set global" if set_key == GLOBAL_SET_KEY else f"#{set_key}",
+            len(added),
+            len(removed),
+        )
+        return True
+
+    def _touch_cached_set(self, set_key, fetched_at):
+        self.store.execute("UPDATE seventv_sets SET fetched_at = ? WHERE set_key = ?", (fetched_at, set_key))
+
+    @staticmethod
+    def _content_hash(emote_entries):
+        canonical = sorted((entry["name"], entry.get("flags", 0)) for entry in emote_entries)
+        return hashlib.sha256(json.dumps(canonical).encode("utf-8")).hexdigest()
+
+
+    def resolve_twitch_user_ids(self, logins):
+        """
+        Retorna {login: user_id} para os logins que existem. Usa o cache
+        (memória/disco) e busca o resto na Helix em lotes de HELIX_USERS_BATCH_SIZE.
+        """
+        now = time.time()
+        logins = sorted({login.lower() for login in logins})
+        resolved = {}
+        missing = []
+        for login in logins:
+            cached = self._user_ids.get(login)
+            if cached and now - cached[1] < USER_ID_CACHE_TTL_SECONDS:
+                resolved[login] = cached[0]
+            else:
+                missing.append(login)
+
+        if missing:
+            placeholders = ", ".join("?" for _ in missing)
+            rows = self.store.query(
+                f"SELECT login, user_id, resolved_at FROM twitch_user_ids WHERE login IN ({placeholders})",
+                missing,
+            )
+            for login, user_id, resolved_at in rows:
+                if now - resolved_at < USER_ID_CACHE_TTL_SECONDS:
+                    self._user_ids[login] = (user_id, resolved_at)
+                    resolved[login] = user_id
+            missing = [login for login in missing if login not in resolved]
+
+        fetched = []
+        for start in range(0, len(missing), HELIX_USERS_BATCH_SIZE):
+            batch = missing[start:start + HELIX_USERS_BATCH_SIZE]
+            for user in self._fetch_twitch_users(batch):
+                login = user["login"].lower()
+                resolved[login] = user["id"]
+                self._user_ids[login] = (user["id"], now)
+                fetched.append((login, user["id"], now))
+
+        if fetched:
+            self.store.executemany(
+                """
+                INSERT INTO twitch_user_ids (login, user_id, resolved_at) VALUES (?, ?, ?)
+                ON CONFLICT(login) DO UPDATE SET user_id = excluded.user_id, resolved_at = excluded.resolved_at
+                """,
+                fetched,
+            )
+        return resolved
+
+    def _fetch_twitch_users(self, logins):
         headers = {
             "Client-Id": self.bot.auth.client_id,
             "Authorization": f"Bearer {self.bot.auth.access_token}",
         }
-        r = requests.get(
+        r = self.http.get(
             TWITCH_USERS_URL,
             headers=headers,
-            params={"login": channel_login.lower()},
+            params=[("login", login) for login in logins],
             timeout=10,
         )
         r.raise_for_status()
-        data = r.json().get("data", [])
-        if not data:
+        return r.json().get("data", [])
+
+    def _resolve_twitch_user_id(self, channel_login):
+        user_id = self.resolve_twitch_user_ids([channel_login]).get(channel_login.lower())
+        if not user_id:
             raise RuntimeError(f"Usuário Twitch '{channel_login}' não encontrado.")
-        return data[0]["id"]
+        return user_id
 
 
-    def _fetch_channel_emotes(self, channel_login):
-        """Retorna lista de dicts {name, flags} -- flags cru do 7TV, sem filtrar nada."""
-        twitch_id = self._resolve_twitch_user_id(channel_login)
-        r = requests.get(SEVENTV_USER_URL.format(twitch_id=twitch_id), timeout=10)
+    def _fetch_channel_emotes(self, channel_login, twitch_id=None):
+        """
+        Retorna (set_id, lista de dicts {name, flags}) -- flags cru do 7TV,
+        sem filtrar nada.
+        """
+        twitch_id = twitch_id or self._resolve_twitch_user_id(channel_login)
+        r = self.http.get(SEVENTV_USER_URL.format(twitch_id=twitch_id), timeout=10)
 
         if r.status_code == 404:
             logging.info("[SevenTVSync] Canal %s não tem conta/emote-set no 7TV.", channel_login)
-            return []
+            return None, []
 
         r.raise_for_status()
         data = r.json()
         emote_set = data.get("emote_set") or {}
         emotes = emote_set.get("emotes") or []
-        return [
+        return emote_set.get("id"), [
             {"name": e["name"], "flags": e.get("flags") or 0}
             for e in emotes if e.get("name")
         ]
 
     def _fetch_global_emotes(self):
-        """Retorna lista de dicts {name, flags} do set global."""
+        """Retorna (set_id, lista de dicts {name, flags}) do set global."""
         try:
-            r = requests.get(SEVENTV_GLOBAL_ALIAS_URL, timeout=10)
+            r = self.http.get(SEVENTV_GLOBAL_ALIAS_URL, timeout=10)
             r.raise_for_status()
         except requests.exceptions.HTTPError:
             logging.info("[SevenTVSync] Alias 'global' falhou, tentando ID fixo de fallback.")
-            r = requests.get(
+            r = self.http.get(
                 f"https://7tv.io/v3/emote-sets/{SEVENTV_GLOBAL_SET_FALLBACK_ID}", timeout=10
             )
             r.raise_for_status()
 
         data = r.json()
         emotes = data.get("emotes") or []
-        return [
+        return data.get("id"), [
             {"name": e["name"], "flags": e.get("flags") or 0}
             for e in emotes if e.get("name")
         ]
@@ -101,33 +405,94 @@ class SevenTVChannelSync:
         return bool(emote_entry.get("flags", 0) & ZERO_WIDTH_FLAG)
 
 
-    def _classify_emotes(self, emote_entries):
+    def _classify_emotes(self, emote_entries, known_emotions=None):
         """
         emote_entries: lista de {name, flags}.
-        Retorna (by_emotion, zero_width_names).
+        known_emotions: {name: emoção} já classificados (cache do set); o resto
+        vai em lote para o classify_emotes_batch, que usa o memo persistente
+        compartilhado entre todos os sets.
+        Retorna a lista de entradas com a chave `emotion` preenchida.
         """
-        by_emotion = {}
-        zero_width_names = set()
+        known_emotions = known_emotions or {}
+        guesses = classify_emotes_batch(
+            [entry["name"] for entry in emote_entries if entry["name"] not in known_emotions],
+            memo=self.classification_memo,
+        )
+        classified = []
         for entry in emote_entries:
             name = entry["name"]
-            emotion = classify_emote_name(name) or "neutral"
-            by_emotion.setdefault(emotion, []).append(name)
+            emotion = known_emotions.get(name) or guesses.get(name) or "neutral"
+            classified.append({"name": name, "flags": entry.get("flags", 0), "emotion": emotion})
+        return classified
+
+    def _group_entries(self, classified_entries):
+        """Retorna (by_emotion, zero_width_names) no formato do load_from_seventv."""
+        by_emotion = {}
+        zero_width_names = set()
+        for entry in classified_entries:
+            by_emotion.setdefault(entry["emotion"], []).append(entry["name"])
             if self._is_zero_width(entry):
-                zero_width_names.add(name)
+                zero_width_names.add(entry["name"])
         return by_emotion, zero_width_names
 
-    def _sync_channel(self, channel, force):
+    def _apply_entries(self, set_key, classified_entries, removed_names=None):
+        """
+        Sem `removed_names` é um merge (load_from_seventv). Com eles (o set
+        encolheu desde o último fetch, ex.: emotes tirados com a EventAPI fora
+        do ar) vira um diff, para os removidos saírem do índice ao vivo.
+        """
+        by_emotion, zero_width_names = self._group_entries(classified_entries)
+        channel = None if set_key == GLOBAL_SET_KEY else set_key
+        if removed_names:
+            self.bot.emote_manager.apply_seventv_diff(
+                channel, by_emotion, removed_names=removed_names, zero_width_names=zero_width_names
+            )
+        else:
+            self.bot.emote_manager.load_from_seventv(channel, by_emotion, zero_width_names=zero_width_names)
+        return by_emotion, zero_width_names
+
+    def _refresh_set(self, set_key, emote_entries, set_id=None):
+        """
+        Compara o set recém-buscado com o cache. Sem mudança: só renova a hora
+        do fetch. Com mudança: classifica apenas os emotes novos, aplica e grava.
+        Retorna (by_emotion, zero_width_names), ou None se nada mudou.
+        """
+        now = time.time()
+        content_hash = self._content_hash(emote_entries)
+        with self._cache_lock:
+            cached_hash, cached_entries = self._cached_sets.get(set_key, (None, []))
+            if content_hash == cached_hash:
+                self._touch_cached_set(set_key, now)
+                self._last_sync[set_key] = now
+                self._remember_set_id(set_key, set_id)
+                return None
+
+            known_emotions = {entry["name"]: entry["emotion"] for entry in cached_entries}
+            classified = self._classify_emotes(emote_entries, known_emotions)
+            removed = set(known_emotions) - {entry["name"] for entry in classified}
+            if classified or removed:
+                result = self._apply_entries(set_key, classified, removed_names=removed)
+            else:
+                result = ({}, set())
+            self._save_cached_set(set_key, content_hash, classified, now, set_id=set_id)
+            self._last_sync[set_key] = now
+        self._remember_set_id(set_key, set_id)
+        return result
+
+    def _sync_channel(self, channel, force, twitch_id=None):
         normalized = channel.lower()
         if not force and self._recently_synced(normalized):
             return
         try:
-            emote_entries = self._fetch_channel_emotes(normalized)
+            set_id, emote_entries = self._fetch_channel_emotes(normalized, twitch_id=twitch_id)
+            result = self._refresh_set(normalized, emote_entries, set_id=set_id)
             if not emote_entries:
                 logging.info("[SevenTVSync] Nenhum emote 7TV encontrado pra #%s.", normalized)
                 return
-            by_emotion, zero_width_names = self._classify_emotes(emote_entries)
-            self.bot.emote_manager.load_from_seventv(normalized, by_emotion, zero_width_names=zero_width_names)
-            self._last_sync[normalized] = time.time()
+            if result is None:
+                logging.info("[SevenTVSync] #%s sem mudanças desde o último sync (%s emotes).", normalized, len(emote_entries))
+                return
+            by_emotion, zero_width_names = result
             logging.info(
                 "[SevenTVSync] #%s sincronizado: %s emotes em %s categorias (%s zero_width).",
                 normalized, len(emote_entries), len(by_emotion), len(zero_width_names),
@@ -136,13 +501,15 @@ class SevenTVChannelSync:
             logging.error("[SevenTVSync] Falha ao sincronizar #%s: %s", normalized, e)
 
     def _sync_global(self, force):
-        if not force and self._recently_synced("__global__"):
+        if not force and self._recently_synced(GLOBAL_SET_KEY):
             return
         try:
-            emote_entries = self._fetch_global_emotes()
-            by_emotion, zero_width_names = self._classify_emotes(emote_entries)
-            self.bot.emote_manager.load_from_seventv(None, by_emotion, zero_width_names=zero_width_names)
-            self._last_sync["__global__"] = time.time()
+            set_id, emote_entries = self._fetch_global_emotes()
+            result = self._refresh_set(GLOBAL_SET_KEY, emote_entries, set_id=set_id)
+            if result is None:
+                logging.info("[SevenTVSync] Set global sem mudanças desde o último sync (%s emotes).", len(emote_entries))
+                return
+            by_emotion, zero_width_names = result
             logging.info(
                 "[SevenTVSync] Set global sincronizado: %s emotes em %s categorias (%s zero_width).",
                 len(emote_entries), len(by_emotion), len(zero_width_names),
@@ -0,0 +1,158 @@
+import json
+import logging
+import threading
+import time
+
+SEVENTV_EVENTS_URL = "wss://events.7tv.io/v3"
+
+# Opcodes da EventAPI v3 do 7TV.
+OP_DISPATCH = 0
+OP_HELLO = 1
+OP_HEARTBEAT = 2
+OP_RECONNECT = 4
+OP_ACK = 5
+OP_ERROR = 6
+OP_END_OF_STREAM = 7
+OP_SUBSCRIBE = 35
+
+EMOTE_SET_UPDATE = "emote_set.update"
+DEFAULT_HEARTBEAT_MS = 45000
+# Sem nenhuma mensagem (nem heartbeat) por esse múltiplo do intervalo, a conexão é dada como morta.
+HEARTBEAT_TOLERANCE = 3
+RECONNECT_BACKOFF_MAX_SECONDS = 60
+
+
+class SevenTVEventSubscriber:
+    """
+    Assina `emote_set.update` na EventAPI do 7TV e repassa cada diff para o
+    `SevenTVChannelSync.apply_emote_set_update`. Roda numa thread daemon com
+    reconexão e backoff; depois de uma queda pede uma reconciliação (fetch
+    completo), já que eventos podem ter sido perdidos no meio.
+    """
+
+    def __init__(self, channel_sync, url=SEVENTV_EVENTS_URL, connect=None):
+        self.channel_sync = channel_sync
+        self.url = url
+        self._connect = connect
+        self._set_ids = set()
+        # Protege `_set_ids` e a transição para `connected`: um set novo ou entra
+        # na leva assinada pela sessão ou vê `connected` e assina sozinho.
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._ws = None
+        self.running = False
+        self.connected = threading.Event()
+        self.thread = None
+        self.stats = {"connections": 0, "events": 0, "applied": 0}
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def subscribe(self, set_id):
+        """Registra o set; se já estiver conectado, assina na hora."""
+        with self._lock:
+            if set_id in self._set_ids:
+                return
+            self._set_ids.add(set_id)
+            ws = self._ws if self.connected.is_set() else None
+        if ws is not None:
+            self._send_subscribe(ws, set_id)
+
+    def _send_subscribe(self, ws, set_id):
+        payload = json.dumps({
+            "op": OP_SUBSCRIBE,
+            "d": {"type": EMOTE_SET_UPDATE, "condition": {"object_id": set_id}},
+        })
+        with self._send_lock:
+            ws.send(payload)
+
+    def _open(self):
+        if self._connect:
+            return self._connect(self.url)
+        import websocket
+
+        return websocket.create_connection(self.url, timeout=10)
+
+    def _run(self):
+        backoff = 1
+        while self.running:
+            try:
+                ws = self._open()
+                self._ws = ws
+                self._session(ws)
+                backoff = 1
+            except Exception as e:
+                if self.running:
+                    logging.warning("[SevenTVEvents] Conexão com a EventAPI caiu: %s", e)
+            finally:
+                self.connected.clear()
+                if self._ws is not None:
+                    try:
+                        self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+
+            if self.running:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX_SECONDS)
+
+    def _session(self, ws):
+        hello = json.loads(ws.recv())
+        if hello.get("op") != OP_HELLO:
+            raise RuntimeError(f"esperava HELLO, recebeu op={hello.get('op')}")
+        heartbeat_ms = (hello.get("d") or {}).get("heartbeat_interval") or DEFAULT_HEARTBEAT_MS
+        ws.settimeout(heartbeat_ms / 1000 * HEARTBEAT_TOLERANCE)
+
+        self.stats["connections"] += 1
+        if self.stats["connections"] > 1:
+            # Reconexão: o que mudou enquanto estávamos fora não vai chegar como evento.
+            self.channel_sync.reconcile_async()
+
+        # Assina em levas até não sobrar nada pendente; `connected` só liga sob
+        # o lock, então um `subscribe` concorrente nunca fica sem ser enviado.
+        subscribed = set()
+        while True:
+            with self._lock:
+                pending = self._set_ids - subscribed
+                if not pending:
+                    self.connected.set()
+                    break
+            for set_id in pending:
+                self._send_subscribe(ws, set_id)
+            subscribed |= pending
+        logging.info("[SevenTVEvents] Conectado à EventAPI (%s sets assinados).", len(subscribed))
+
+        while self.running:
+            raw = ws.recv()
+            if not raw:
+                raise RuntimeError("conexão fechada pelo servidor")
+            message = json.loads(raw)
+            op = message.get("op")
+            if op == OP_DISPATCH:
+                self._handle_dispatch(message.get("d") or {})
+            elif op in (OP_RECONNECT, OP_END_OF_STREAM):
+                raise RuntimeError(f"servidor pediu reconexão (op={op})")
+            elif op == OP_ERROR:
+                logging.warning("[SevenTVEvents] Erro da EventAPI: %s", message.get("d"))
+
+    def _handle_dispatch(self, data):
+        if data.get("type") != EMOTE_SET_UPDATE:
+            return
+        self.stats["events"] += 1
+        try:
+            if self.channel_sync.apply_emote_set_update(data.get("body") or {}):
+                self.stats["applied"] += 1
+        except Exception as e:
+            logging.error("[SevenTVEvents] Falha ao aplicar evento do 7TV: %s", e)
@@ -0,0 +1,245 @@
+"""Camada de armazenamento SQLite compartilhada (WAL + conexões persistentes).
+
+Cada arquivo de banco ganha um único `SQLiteStore` (ver `get_store`) com:
+
+- uma conexão de escrita, dona de uma thread que consome uma fila de jobs e
+  agrupa vários jobs num mesmo commit (cada job isolado por SAVEPOINT);
+- um pool de conexões de leitura (`query_only`), que no modo WAL não esperam
+  pelo escritor;
+- pragmas ajustados (`journal_mode=WAL`, `synchronous=NORMAL`, `cache_size`) e
+  cache de statements preparados do próprio módulo `sqlite3`.
+
+Jobs de escrita recebem a conexão e rodam dentro de `BEGIN IMMEDIATE`; quem
+chama bloqueia até o commit, então a semântica continua síncrona.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Optional
+
+READ_POOL_SIZE = 4
+WRITE_BATCH_SIZE = 64
+CACHED_STATEMENTS = 256
+CACHE_SIZE_KIB = 8192
+BUSY_TIMEOUT_MS = 30000
+
+_STOP = object()
+
+
+class SQLiteStore:
+    def __init__(self, db_path: str, read_pool_size: int = READ_POOL_SIZE):
+        self.db_path = db_path
+        self._read_pool: queue.LifoQueue = queue.LifoQueue()
+        self._read_pool_size = read_pool_size
+        self._read_connections_created = 0
+        self._read_lock = threading.Lock()
+        self._jobs: queue.Queue = queue.Queue()
+        self._closed = False
+
+        # A conexão de escrita é criada aqui para que o WAL já esteja ativo
+        # antes da primeira leitura.
+        self._writer_conn = self._connect()
+        self._writer_thread = threading.Thread(target=self._writer_loop, name=f"sqlite-writer:{os.path.basename(db_path)}", daemon=True)
+        self._writer_thread.start()
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        if not read_only:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    # --- Escrita ---------------------------------------------------------
+
+    def _writer_loop(self):
+        conn = self._writer_conn
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                break
+
+            batch = [job]
+            stop_after_batch = False
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    next_job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if next_job is _STOP:
+                    stop_after_batch = True
+                    break
+                batch.append(next_job)
+
+            self._run_batch(conn, batch)
+            if stop_after_batch:
+                break
+
+        conn.close()
+
+    def _run_batch(self, conn: sqlite3.Connection, batch: list):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, transactional, future in batch:
+                if not transactional:
+                    outcomes.append((future, None, None, fn))
+                    continue
+                conn.execute("SAVEPOINT store_job")
+                try:
+                    result = fn(conn)
+                    conn.execute("RELEASE store_job")
+                    outcomes.append((future, result, None, None))
+                except BaseException as e:
+                    conn.execute("ROLLBACK TO store_job")
+                    conn.execute("RELEASE store_job")
+                    outcomes.append((future, None, e, None))
+            conn.execute("COMMIT")
+        except BaseException as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for fn, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Só confirma para quem chamou depois do COMMIT.
+        for future, result, error, maintenance_fn in outcomes:
+            if maintenance_fn is not None:
+                # Jobs de manutenção (ex.: VACUUM) rodam fora de transação.
+                try:
+                    future.set_result(maintenance_fn(conn))
+                except BaseException as e:
+                    future.set_exception(e)
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _submit(self, fn: Callable[[sqlite3.Connection], Any], transactional: bool = True) -> Any:
+        if threading.current_thread() is self._writer_thread:
+            # Job de escrita chamando outra escrita: já estamos na transação.
+            return fn(self._writer_conn)
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"SQLiteStore de {self.db_path} já foi fechado")
+
+        future: Future = Future()
+        self._jobs.put((fn, transactional, future))
+        return future.result()
+
+    def transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Executa `fn(conn)` atomicamente na conexão de escrita e devolve o resultado."""
+        return self._submit(fn)
+
+    def maintenance(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Executa `fn(conn)` fora de transação (necessário para VACUUM)."""
+        return self._submit(fn, transactional=False)
+
+    def execute(self, sql: str, params: Iterable = ()) -> tuple[int, Optional[int]]:
+        """Escrita simples. Retorna `(rowcount, lastrowid)`."""
+
+        def run(conn):
+            cursor = conn.execute(sql, tuple(params))
+            return cursor.rowcount, cursor.lastrowid
+
+        return self._submit(run)
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Iterable]) -> int:
+        rows = [tuple(params) for params in seq_of_params]
+
+        def run(conn):
+            return conn.executemany(sql, rows).rowcount
+
+        return self._submit(run)
+
+    # --- Leitura ---------------------------------------------------------
+
+    @contextmanager
+    def reader(self):
+        """Empresta uma conexão de leitura do pool."""
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            with self._read_lock:
+                can_create = self._read_connections_created < self._read_pool_size
+                if can_create:
+                    self._read_connections_created += 1
+            conn = self._connect(read_only=True) if can_create else self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._read_pool.put(conn)
+
+    def query(self, sql: str, params: Iterable = ()) -> list:
+        with self.reader() as conn:
+            return conn.execute(sql, tuple(params)).fetchall()
+
+    def query_one(self, sql: str, params: Iterable = ()):
+        with self.reader() as conn:
+            return conn.execute(sql, tuple(params)).fetchone()
+
+    # --- Ciclo de vida ---------------------------------------------------
+
+    def close(self):
+        """Drena a fila de escrita (tudo que já foi enfileirado é gravado) e fecha as conexões."""
+        if self._closed:
+            return
+        self._closed = True
+        self._jobs.put(_STOP)
+        self._writer_thread.join()
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_stores: dict[str, SQLiteStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(db_path: str) -> SQLiteStore:
+    """Retorna o `SQLiteStore` compartilhado do arquivo (um por caminho absoluto)."""
+    key = os.path.abspath(db_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None or store._closed:
+            store = SQLiteStore(db_path)
+            _stores[key] = store
+            logging.debug(f"[Storage] SQLite em WAL aberto: {db_path}")
+        return store
+
+
+def close_store(db_path: str) -> None:
+    with _stores_lock:
+        store = _stores.pop(os.path.abspath(db_path), None)
+    if store is not None:
+        store.close()
+
+
+def close_all_stores() -> None:
+    """Usado no shutdown: garante que escritas enfileiradas cheguem ao disco."""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
@@ -0,0 +1,289 @@
+"""Formato de snapshot das memórias vetoriais (sem pickle).
+
+Cada usuário/canal vira um diretório `*.vsnap` com um arquivo `CURRENT`,
+que nomeia a versão publicada, e um subdiretório por versão com três arquivos:
+
+    manifest.json    versão do formato, dimensão, quantidade e métrica
+    vectors.f32      matriz float32 little-endian (count x dim), mapeada com np.memmap
+    docstore.sqlite  tabela `docs(position, doc_id, text, metadata)` com metadata em JSON
+
+Publicar uma versão é um único `os.replace` do `CURRENT`: um crash em
+qualquer ponto deixa a versão anterior ou a nova, nunca nenhuma. Snapshots do
+layout antigo (arquivos direto no `*.vsnap`) e sobras `*.vsnap.old-<pid>` da
+troca em dois passos antiga continuam sendo lidos.
+
+Nada é desserializado com pickle, então abrir um snapshot é seguro. Os
+documentos podem ser lidos só com a stdlib (`iter_documents`), o que permite
+que os scripts de exportação funcionem sem LangChain/NumPy instalados.
+
+Sem cópia só a leitura da matriz crua (`open_vectors`). O `load_faiss` copia
+os vetores para um `IndexFlatL2` em memória e lê o docstore inteiro, ou seja,
+O(N·dim) em tempo e memória residente: o `MemoryManager` adiciona e apaga
+memórias no vectorstore carregado, e um índice FAISS mapeado do disco é
+somente leitura. O ganho do formato na carga é não passar por pickle.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from array import array
+from typing import Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SNAPSHOT_FORMAT = "glorpinia-vsnap"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".vsnap"
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+DOCSTORE_FILE = "docstore.sqlite"
+CURRENT_FILE = "CURRENT"
+
+
+class SnapshotError(ValueError):
+    """Snapshot ausente, corrompido ou de uma versão desconhecida."""
+
+
+def _has_manifest(directory: str) -> bool:
+    return os.path.isfile(os.path.join(directory, MANIFEST_FILE))
+
+
+def resolve_snapshot(path: str) -> Optional[str]:
+    """
+    Diretório com os arquivos da versão publicada de `path`, ou None. Sem
+    `CURRENT` cai no layout antigo e, por fim, na sobra `.old-*` mais nova
+    (crash entre os dois `os.replace` da versão anterior deste módulo).
+    """
+    try:
+        with open(os.path.join(path, CURRENT_FILE), "r", encoding="utf-8") as f:
+            version_dir = os.path.join(path, f.read().strip())
+        if _has_manifest(version_dir):
+            return version_dir
+    except OSError:
+        pass
+    if _has_manifest(path):
+        return path
+
+    parent, name = os.path.split(path)
+    try:
+        leftovers = [
+            os.path.join(parent, entry)
+            for entry in os.listdir(parent or ".")
+            if entry.startswith(f"{name}.old-")
+        ]
+    except OSError:
+        return None
+    leftovers = [candidate for candidate in leftovers if _has_manifest(candidate)]
+    return max(leftovers, key=os.path.getmtime) if leftovers else None
+
+
+def is_snapshot(path: Optional[str]) -> bool:
+    return bool(path) and resolve_snapshot(path) is not None
+
+
+def _snapshot_dir(path: str) -> str:
+    directory = resolve_snapshot(path)
+    if directory is None:
+        raise SnapshotError(f"Nenhum snapshot publicado em {path}")
+    return directory
+
+
+def read_manifest(path: str) -> dict:
+    """Lê e valida o manifesto (formato, versão e tamanho do arquivo de vetores)."""
+    path = _snapshot_dir(path)
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Manifesto inválido em {path}: {e}") from e
+
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Formato desconhecido em {path}: {manifest.get('format')!r}")
+    if int(manifest.get("version", 0)) > SNAPSHOT_VERSION:
+        raise SnapshotError(f"Versão {manifest.get('version')} do snapshot não suportada em {path}")
+
+    count, dim = int(manifest.get("count", 0)), int(manifest.get("dim", 0))
+    expected_bytes = count * dim * 4
+    vectors_path = os.path.join(path, VECTORS_FILE)
+    if not os.path.exists(vectors_path) or os.path.getsize(vectors_path) != expected_bytes:
+        raise SnapshotError(f"Arquivo de vetores inconsistente com o manifesto em {path}")
+    return manifest
+
+
+def write_snapshot(path: str, vectors, doc_ids: list, texts: list, metadatas: list) -> None:
+    """
+    Grava uma versão nova dentro de `path` e só então aponta o `CURRENT` para
+    ela, para que um crash no meio da escrita nunca deixe um snapshot pela
+    metade nem apague o anterior.
+    `vectors` pode ser um array NumPy (count x dim) ou uma lista de listas.
+    """
+    count = len(doc_ids)
+    if not (len(texts) == len(metadatas) == count):
+        raise SnapshotError("doc_ids, texts e metadatas precisam ter o mesmo tamanho")
+
+    os.makedirs(path, exist_ok=True)
+    version = f"v{time.time_ns():x}-{os.getpid()}"
+    tmp_path = os.path.join(path, version)
+    os.makedirs(tmp_path)
+
+    try:
+        vectors_path = os.path.join(tmp_path, VECTORS_FILE)
+        if np is not None and hasattr(vectors, "shape"):
+            matrix = np.ascontiguousarray(vectors, dtype="<f4")
+            dim = int(matrix.shape[1]) if matrix.ndim == 2 else 0
+            matrix.tofile(vectors_path)
+        else:
+            rows = [list(row) for row in vectors]
+            dim = len(rows[0]) if rows else 0
+            flat = array("f", (value for row in rows for value in row))
+            if sys.byteorder != "little":
+                flat.byteswap()
+            with open(vectors_path, "wb") as f:
+                flat.tofile(f)
+
+        conn = sqlite3.connect(os.path.join(tmp_path, DOCSTORE_FILE))
+        conn.execute(
+            "CREATE TABLE docs (position INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, text TEXT NOT NULL, metadata TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO docs (position, doc_id, text, metadata) VALUES (?, ?, ?, ?)",
+            [
+                (position, str(doc_id), text, json.dumps(metadata or {}, ensure_ascii=False))
+                for position, (doc_id, text, metadata) in enumerate(zip(doc_ids, texts, metadatas))
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "count": count,
+            "dim": dim,
+            "dtype": "float32",
+            "metric": "l2",
+        }
+        # O manifesto é o último arquivo escrito: sem ele o diretório não é um snapshot.
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    pointer_tmp = os.path.join(path, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(path, CURRENT_FILE))
+    _fsync_dir(path)
+    _remove_stale_versions(path, version)
+
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _remove_stale_versions(path: str, current: str) -> None:
+    """Depois de publicar: apaga versões antigas, arquivos do layout antigo e sobras `.old-*`."""
+    for entry in os.listdir(path):
+        if entry in (current, CURRENT_FILE):
+            continue
+        stale = os.path.join(path, entry)
+        if os.path.isdir(stale):
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    parent, name = os.path.split(path)
+    for entry in os.listdir(parent or "."):
+        if entry.startswith(f"{name}.old-"):
+            shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+
+def iter_documents(path: str) -> Iterator[tuple[str, str, dict]]:
+    """Itera `(doc_id, text, metadata)` na ordem dos vetores. Só usa a stdlib."""
+    path = _snapshot_dir(path)
+    read_manifest(path)
+    conn = sqlite3.connect(f"file:{os.path.join(path, DOCSTORE_FILE)}?mode=ro", uri=True)
+    try:
+        for doc_id, text, metadata in conn.execute("SELECT doc_id, text, metadata FROM docs ORDER BY position"):
+            yield doc_id, text, json.loads(metadata or "{}")
+    finally:
+        conn.close()
+
+
+def open_vectors(path: str):
+    """Mapeia a matriz de vetores em memória (somente leitura, sem cópia)."""
+    if np is None:
+        raise RuntimeError("NumPy é necessário para mapear os vetores do snapshot.")
+    path = _snapshot_dir(path)
+    manifest = read_manifest(path)
+    shape = (int(manifest["count"]), int(manifest["dim"]))
+    if shape[0] == 0:
+        return np.zeros(shape, dtype="<f4")
+    return np.memmap(os.path.join(path, VECTORS_FILE), dtype="<f4", mode="r", shape=shape)
+
+
+def save_faiss(vectorstore, path: str) -> None:
+    """Converte um `langchain_community` FAISS em snapshot."""
+    index = vectorstore.index
+    count = index.ntotal
+    doc_ids = [vectorstore.index_to_docstore_id[position] for position in range(count)]
+    docs = [vectorstore.docstore.search(doc_id) for doc_id in doc_ids]
+    vectors = index.reconstruct_n(0, count) if count else np.zeros((0, index.d), dtype="<f4")
+    write_snapshot(
+        path,
+        vectors,
+        doc_ids,
+        [doc.page_content for doc in docs],
+        [dict(doc.metadata or {}) for doc in docs],
+    )
+
+
+def load_faiss(path: str, embeddings):
+    """
+    Reconstrói o vectorstore FAISS a partir do snapshot, sem pickle. Os
+    vetores são copiados para um índice mutável (não é carga sem cópia).
+    """
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    vectors = open_vectors(path)
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    if len(vectors):
+        index.add(vectors)
+
+    documents = {}
+    index_to_docstore_id = {}
+    for position, (doc_id, text, metadata) in enumerate(iter_documents(path)):
+        documents[doc_id] = Document(page_content=text, metadata=metadata)
+        index_to_docstore_id[position] = doc_id
+
+    logging.debug(f"[GLORP-MEMORY] Snapshot {path} carregado ({len(documents)} documentos).")
+    return FAISS(embeddings, index, InMemoryDocstore(documents), index_to_docstore_id)
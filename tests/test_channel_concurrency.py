@@ -0,0 +1,89 @@
+import random
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from glorpinia_bot.emote_manager import EmoteManager
+from glorpinia_bot.narrative.social_dynamics import SocialDynamicsEngine
+
+CHANNELS = ["glorp", "moon", "nave", "cassino"]
+TEXTS = ["boa glorp mandou bem", "kkkk zoeira", "alguém sabe quando começa?", "caos total", "salve", "cala boca bot ruim"]
+
+
+class ChannelConcurrencyStressTests(unittest.TestCase):
+    """
+    Websocket + threads de geração (comment/listen/8ball/fortune) tocando os
+    mesmos canais ao mesmo tempo. Sem o lock por canal isso perde contagens ou
+    explode com "dictionary/deque mutated during iteration".
+    """
+
+    WORKERS_PER_CHANNEL = 3
+    MESSAGES_PER_WORKER = 400
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self._switch_interval)
+        self._tmpdir.cleanup()
+
+    def test_parallel_channels_do_not_lose_updates_or_corrupt_state(self):
+        engine = SocialDynamicsEngine(Path(self._tmpdir.name) / "loops.json")
+        manager = EmoteManager(base_path=str(Path(__file__).resolve().parent.parent))
+        errors = []
+        stop_flushing = threading.Event()
+
+        def chat_worker(channel, seed):
+            rng = random.Random(seed)
+            try:
+                for i in range(self.MESSAGES_PER_WORKER):
+                    author = f"viewer{rng.randrange(40)}"
+                    engine.observe_message(channel, author, rng.choice(TEXTS), bot_nick="glorpinia")
+                    if i % 5 == 0:
+                        engine.get_injection_payload(channel, author=author)
+                        engine.register_bot_message(channel)
+                    if i % 17 == 0:
+                        engine.add_memory_loop(channel, f"tema {rng.randrange(12)}", users=[author], weight=0.6)
+                    if i % 7 == 0:
+                        engine.get_debug_snapshot(channel)
+                    phrase = manager.ensure_unique_phrase(channel, rng.choice(TEXTS))
+                    manager.choose_emote(channel, phrase)
+                    manager.get_debug_state(channel)
+            except Exception as exc:  # pragma: no cover - só aparece quando há corrida
+                errors.append(exc)
+
+        def flusher():
+            while not stop_flushing.is_set():
+                try:
+                    engine.persistence.flush()
+                except Exception as exc:  # pragma: no cover
+                    errors.append(exc)
+
+        threads = [
+            threading.Thread(target=chat_worker, args=(channel, index * 100 + worker))
+            for index, channel in enumerate(CHANNELS)
+            for worker in range(self.WORKERS_PER_CHANNEL)
+        ]
+        flush_thread = threading.Thread(target=flusher)
+        flush_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stop_flushing.set()
+        flush_thread.join()
+
+        self.assertEqual(errors, [])
+        expected = self.WORKERS_PER_CHANNEL * self.MESSAGES_PER_WORKER
+        for channel in CHANNELS:
+            self.assertEqual(engine.channel_states[channel].message_count, expected)
+            self.assertLessEqual(len(engine.channel_states[channel].memory_loops), engine.MAX_LOOPS)
+        self.assertEqual(len(manager.global_emote_history), manager.history_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
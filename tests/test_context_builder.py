@@ -0,0 +1,71 @@
+import unittest
+
+from glorpinia_bot.narrative.context_builder import build_context_prompt, ranked_section, recency_section
+from glorpinia_bot.narrative.token_budget import TokenEstimator, estimate_tokens
+
+
+class ContextBudgetTests(unittest.TestCase):
+    def _build(self, token_budget, persona="Você é a Glorpinia, imperatriz alienígena.", estimate=estimate_tokens):
+        chat = recency_section(
+            "**MENSAGENS RECENTES DO CHAT (Contexto Imediato):**",
+            [f"- viewer{i}: mensagem antiga número {i} sobre o jogo de ontem" for i in range(30)],
+        )
+        memories = ranked_section("**HISTÓRICO RECENTE:**", ["- gosta de pizza", "- perdeu 3 cookies na aposta"])
+        return build_context_prompt(
+            persona_profile=persona,
+            mood="feliz",
+            drama_state={"favorite_of_the_day": "fa", "enemy_of_the_day": "zoeiro", "suspect": None},
+            memory_loop={"topic": "a pizza de abacaxi"},
+            social_memory=None,
+            rag_context=[chat, memories],
+            chat_message="glorp você lembra da pizza?",
+            live_context={"fields": {"jogo": "Minecraft"}},
+            token_budget=token_budget,
+            estimate=estimate,
+        )
+
+    def test_everything_fits_in_a_large_budget(self):
+        prompt = self._build(10_000)
+        self.assertIn("viewer0:", prompt)
+        self.assertIn("jogo: Minecraft", prompt)
+        self.assertLess(prompt.index("Mensagem do usuário"), prompt.index("[SISTEMA: CONTEXTO AUXILIAR]"))
+
+    def test_tight_budget_trims_old_chat_before_dropping_blocks(self):
+        full = self._build(10_000)
+        budget = estimate_tokens(full) // 2
+        prompt = self._build(budget)
+
+        self.assertLessEqual(estimate_tokens(prompt), budget)
+        self.assertIn("Você é a Glorpinia", prompt)
+        self.assertIn('Mensagem do usuário: "glorp você lembra da pizza?"', prompt)
+        self.assertIn("viewer29:", prompt)
+        self.assertNotIn("viewer0:", prompt)
+        self.assertIn("- gosta de pizza", prompt)
+        self.assertIn("[SISTEMA: mood atual = feliz]", prompt)
+        self.assertIn("[SISTEMA: memória recorrente]", prompt)
+
+    def test_calibrated_estimate_with_oversized_persona_keeps_recent_context(self):
+        persona = "Você é a Glorpinia, imperatriz alienígena que adora cookies e caos. " * 40
+        estimator = TokenEstimator()
+        estimator.observe(persona, int(estimate_tokens(persona) * 1.8))
+        budget = estimate_tokens(persona) * 3 // 2
+
+        with self.assertLogs(level="WARNING") as logs:
+            prompt = self._build(budget, persona=persona, estimate=estimator.estimate)
+
+        self.assertIn("estoura o orçamento", "\n".join(logs.output))
+        self.assertIn("Você é a Glorpinia", prompt)
+        self.assertIn('Mensagem do usuário: "glorp você lembra da pizza?"', prompt)
+        self.assertIn("viewer29:", prompt)
+        self.assertIn("[SISTEMA: mood atual = feliz]", prompt)
+        self.assertNotIn("viewer0:", prompt)
+
+    def test_estimator_calibrates_towards_real_counts(self):
+        estimator = TokenEstimator()
+        text = "salve glorp, bora jogar hoje?"
+        estimator.observe(text, estimate_tokens(text) * 2)
+        self.assertEqual(estimator.estimate(text), estimate_tokens(text) * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
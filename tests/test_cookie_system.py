@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from glorpinia_bot.features.cookie_system import CookieSystem
+from glorpinia_bot.storage import close_store
+
+
+class CookieAccrualTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "cookies.db")
+
+    def tearDown(self):
+        close_store(self.db_path)
+        self._tmpdir.cleanup()
+
+    def test_buffered_accruals_are_visible_and_survive_a_crash(self):
+        cookies = CookieSystem(None, db_path=self.db_path)
+        for _ in range(3):
+            cookies.handle_interaction("Moon")
+        cookies.add_cookies("moon", 10)
+
+        self.assertEqual(cookies.get_cookies("moon"), 13)
+
+        # "Crash": o processo morre sem flush; só o journal sobrevive.
+        cookies._journal_file.close()
+        close_store(self.db_path)
+
+        recovered = CookieSystem(None, db_path=self.db_path)
+        self.assertEqual(recovered.get_cookies("moon"), 13)
+        self.assertFalse(os.path.exists(recovered.journal_path))
+
+    def test_journal_already_applied_is_not_replayed_twice(self):
+        cookies = CookieSystem(None, db_path=self.db_path)
+        cookies.handle_interaction("moon")
+        cookies._journal_file.flush()
+        shutil.copy(cookies.journal_path, f"{cookies.journal_path}.copy")
+        cookies.flush_accruals()
+        # Crash entre o commit e a remoção do journal em rotação.
+        os.replace(f"{cookies.journal_path}.copy", f"{cookies.journal_path}.flushing")
+        close_store(self.db_path)
+
+        recovered = CookieSystem(None, db_path=self.db_path)
+
+        self.assertEqual(recovered.get_cookies("moon"), 1)
+
+    def test_ledger_keeps_supply_at_zero_and_rejects_overdraft(self):
+        cookies = CookieSystem(None, db_path=self.db_path)
+        cookies.add_cookies("moon", 50)
+        cookies.handle_interaction("sun")
+        for nick in ("a", "b", "c"):
+            cookies.add_cookies(nick, 5)
+
+        self.assertTrue(cookies.transfer_cookies("moon", "sun", 30, require_funds=True))
+        self.assertFalse(cookies.transfer_cookies("moon", "sun", 30, require_funds=True))
+
+        self.assertEqual(cookies.get_cookies("moon"), 20)
+        self.assertEqual(cookies.get_total_supply(), 0)
+        self.assertEqual(cookies.get_leaderboard(2), [("sun", 31), ("moon", 20)])
+        self.assertEqual(cookies.store.query_one("SELECT COUNT(*) FROM cookie_ledger WHERE reason = 'transfer'")[0], 1)
+
+    def test_daily_bonus_is_applied_lazily_per_epoch(self):
+        cookies = CookieSystem(None, db_path=self.db_path)
+        epoch = [100]
+        cookies._current_epoch = lambda: epoch[0]
+        cookies.add_cookies("moon", 10)
+        cookies.add_cookies("sun", 12)
+        self.assertEqual(cookies.get_leaderboard(2), [("sun", 12), ("moon", 10)])
+
+        epoch[0] = 102
+        self.assertEqual(cookies.get_cookies("moon"), 20)
+        self.assertEqual(cookies.get_leaderboard(2), [("sun", 22), ("moon", 20)])
+        # Com o bônus liquidado na escrita, o saldo efetivo cobre a transferência.
+        self.assertTrue(cookies.transfer_cookies("moon", "sun", 20, require_funds=True))
+
+        self.assertEqual(cookies.get_cookies("moon"), 0)
+        self.assertEqual(cookies.get_cookies("sun"), 42)
+        self.assertEqual(cookies.get_total_supply(), 0)
+
+    def test_concurrent_spending_never_overdraws_or_leaks_supply(self):
+        cookies = CookieSystem(None, db_path=self.db_path)
+        cookies.add_cookies("moon", 100)
+
+        def spend():
+            for _ in range(20):
+                cookies.transfer_cookies("moon", "sun", 1, require_funds=True)
+                cookies.handle_interaction("sun")
+
+        threads = [threading.Thread(target=spend) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(cookies.get_cookies("moon"), 0)
+        self.assertEqual(cookies.get_cookies("sun"), 100 + 160)
+        self.assertEqual(cookies.get_total_supply(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from glorpinia_bot import emote_classifier
+from glorpinia_bot.emote_classifier import EmoteClassificationMemo, classify_emote_name, classify_emotes_batch
+from glorpinia_bot.storage import close_store, get_store
+
+
+class EmoteClassifierTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "emotes.db")
+
+    def tearDown(self):
+        close_store(self.db_path)
+        self._tmpdir.cleanup()
+
+    def test_fused_names_match_roots_through_the_trie(self):
+        self.assertEqual(classify_emote_name("peeposadge"), "sad")
+        self.assertEqual(classify_emote_name("catdancing2"), "dancing")
+        self.assertEqual(classify_emote_name("PeepoSadge"), "sad")
+        self.assertIsNone(classify_emote_name("xqcL"))
+
+    def test_batch_dedups_names_and_reuses_the_persistent_memo(self):
+        memo = EmoteClassificationMemo(get_store(self.db_path))
+        names = ["PogU", "peepoClap", "PogU", "xqcL", "peepoClap"]
+        with mock.patch.object(emote_classifier, "classify_emote_name", wraps=classify_emote_name) as classify:
+            first = classify_emotes_batch(names, memo=memo)
+        self.assertEqual(classify.call_count, 3)
+        self.assertEqual(first, {"PogU": "hype", "peepoClap": "clap", "xqcL": None})
+
+        restarted = EmoteClassificationMemo(get_store(self.db_path))
+        with mock.patch.object(emote_classifier, "classify_emote_name") as classify:
+            self.assertEqual(classify_emotes_batch(names, memo=restarted), first)
+        classify.assert_not_called()
+
+        bumped = EmoteClassificationMemo(get_store(self.db_path), version=emote_classifier.CLASSIFIER_VERSION + 1)
+        self.assertEqual(bumped.get_many(names), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
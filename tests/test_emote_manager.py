@@ -0,0 +1,78 @@
+import re
+import sys
+import threading
+import unittest
+
+from glorpinia_bot.emote_manager import EmoteManager
+from glorpinia_bot.emotion_rules import EmotionRuleEngine
+
+
+class EmoteManagerTests(unittest.TestCase):
+    def setUp(self):
+        self.manager = EmoteManager(base_path="/nonexistent")
+        self.manager.global_emote_map = {"neutral": ["Kappa", "KappaPride"]}
+        self.manager.channel_emote_map = {}
+
+    def test_spacing_matcher_prefers_longest_emote_and_follows_seventv_sync(self):
+        self.assertEqual(
+            self.manager.normalize_emote_spacing("boa KappaPride! kappa?? Kappas!"),
+            "boa KappaPride ! kappa ?? Kappas!",
+        )
+
+        self.manager.load_from_seventv("glorp", {"hype": ["PogU"]})
+
+        self.assertEqual(self.manager.normalize_emote_spacing("PogU!! BALD."), "PogU !! BALD .")
+
+    def test_seventv_sync_publishes_a_new_snapshot_without_touching_the_old_one(self):
+        self.manager.channel_emote_map = {"glorp": {"hype": ["PogU"]}}
+        before = self.manager.emote_index
+
+        self.manager.load_from_seventv("glorp", {"hype": ["Pog", "PogU"], "neutral": ["Overlay"]}, zero_width_names={"Overlay"})
+        after = self.manager.emote_index
+
+        self.assertGreater(after.version, before.version)
+        self.assertEqual(before.candidate_pool("glorp", "hype"), ("PogU", "Kappa", "KappaPride"))
+        self.assertEqual(after.candidate_pool("glorp", "hype"), ("PogU", "Pog", "Overlay"))
+        self.assertEqual(after.candidate_pool("outro", "hype"), ("Kappa", "KappaPride"))
+        self.assertNotIn("Overlay", before.all_emotes)
+        self.assertNotIn("Overlay", after.non_zero_width)
+        self.assertIn(self.manager._find_zero_width_companion("Overlay", ["Overlay"]), after.non_zero_width)
+
+    def test_concurrent_seventv_writers_do_not_lose_each_others_updates(self):
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+
+        def writer(worker):
+            for i in range(50):
+                self.manager.load_from_seventv("glorp", {"hype": [f"Emote{worker}_{i}"]})
+
+        threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.manager.channel_emote_map["glorp"]["hype"]), 200)
+
+    def test_rule_engine_scores_overlapping_rules_in_one_pass(self):
+        engine = EmotionRuleEngine([
+            ("denial", r"\b(n[aã]o|jamais)\b"),
+            ("shock", r"\b(nossa|n[aã]o creio)\b"),
+            ("laugh", r"\b(kkk+|ri\w+)\b"),
+        ])
+
+        self.assertEqual(dict(engine.score("não creio kkkkk")), {"denial": 2, "shock": 2, "laugh": 2})
+        self.assertEqual(dict(engine.score("rindo")), {"laugh": 2})
+        self.assertEqual(dict(engine.score("naoo")), {})
+
+    def test_rule_engine_matches_like_one_search_per_rule_for_unusual_rules(self):
+        rules = [("a", r"\bsim|yes"), ("b", r"(?i)\bGLORP"), ("c", r"(k)\1{2,}"), ("d", r"\b(ab)?c")]
+        engine = EmotionRuleEngine(rules)
+        for text in ["yes sir", "eyes", "glorp!", "kkk", "c abc", "nada"]:
+            expected = {index for index, (_, pattern) in enumerate(rules) if re.search(pattern, text)}
+            self.assertEqual(engine.matching_rules(text), expected, text)
+
+
+if __name__ == "__main__":
+    unittest.main()
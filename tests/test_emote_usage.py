@@ -0,0 +1,72 @@
+import os
+import random
+import tempfile
+import unittest
+
+from glorpinia_bot.emote_manager import EmoteManager
+from glorpinia_bot.emote_usage import HALF_LIFE_SECONDS, ChannelEmoteUsage, EmoteUsageTracker
+from glorpinia_bot.storage import close_store
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+class EmoteUsageTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "emotes.db")
+        self.manager = EmoteManager(base_path=ROOT)
+        self.manager.global_emote_map = {"laugh": ["KEKW", "LUL", "OMEGALUL"]}
+        self.manager.channel_emote_map = {}
+
+    def tearDown(self):
+        close_store(self.db_path)
+        self._tmpdir.cleanup()
+
+    def test_sketch_memory_is_bounded_and_old_usage_decays(self):
+        usage = ChannelEmoteUsage(now=0)
+        baseline = usage.memory_bytes()
+        for i in range(5000):
+            usage.add(f"Emote{i}", emotion="hype", now=0)
+        for _ in range(200):
+            usage.add("KEKW", emotion="laugh", now=0)
+
+        self.assertEqual(usage.memory_bytes(), baseline + usage.top_k * 100)
+        self.assertEqual(usage.top_emotes(1, now=0)[0][0], "KEKW")
+        self.assertGreaterEqual(usage.estimate("KEKW", emotion="laugh", now=0), 200)
+        self.assertAlmostEqual(usage.estimate("KEKW", now=HALF_LIFE_SECONDS) / usage.estimate("KEKW", now=0), 0.5)
+
+    def test_weeks_without_usage_do_not_overflow_the_decay(self):
+        week = 7 * 24 * 3600
+        usage = ChannelEmoteUsage(now=0)
+        usage.add("KEKW", now=0)
+
+        self.assertAlmostEqual(usage.peak(now=4 * week), 0.0)
+        usage.add("LUL", now=4 * week)
+        self.assertAlmostEqual(usage.estimate("LUL", now=4 * week), 1.0)
+        self.assertEqual(usage.top_emotes(1, now=4 * week)[0][0], "LUL")
+
+        # Snapshot de semanas atrás carregado num restart.
+        restored = ChannelEmoteUsage.from_snapshot(usage.to_snapshot(), now=8 * week)
+        self.assertAlmostEqual(restored.peak(now=8 * week), 0.0)
+        self.assertEqual(restored.landmark, 8 * week)
+
+    def test_chat_usage_biases_choice_and_survives_restart(self):
+        tracker = EmoteUsageTracker(self.manager, db_path=self.db_path)
+        for _ in range(50):
+            self.assertEqual(tracker.observe("Glorp", "kkkkk OMEGALUL OMEGALUL"), 2)
+        self.assertEqual(tracker.observe("glorp", "sem emote nenhum"), 0)
+        self.assertEqual(tracker.save_snapshots(), 1)
+
+        restarted = EmoteUsageTracker(self.manager, db_path=self.db_path)
+        self.assertEqual(restarted.load_snapshots(), 1)
+        self.assertAlmostEqual(restarted.popularity("glorp", "OMEGALUL", emotion="laugh"), 1.0, places=3)
+        self.assertEqual(restarted.popularity("glorp", "LUL"), 0.0)
+
+        self.manager.usage_tracker = restarted
+        random.seed(3)
+        picks = [self.manager._pick_candidate("glorp", ["KEKW", "LUL", "OMEGALUL"], "laugh") for _ in range(600)]
+        self.assertGreater(picks.count("OMEGALUL"), 2 * picks.count("LUL"))
+
+
+if __name__ == "__main__":
+    unittest.main()
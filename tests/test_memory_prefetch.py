@@ -0,0 +1,47 @@
+import threading
+import unittest
+
+from glorpinia_bot.memory_prefetch import MemoryPrefetcher
+
+
+class _SlowMemoryManager:
+    vector_memory_enabled = True
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.warmed = []
+        self.embedded = []
+
+    def is_memory_loaded(self, channel, user):
+        return (channel, user) in self.warmed
+
+    def warm_user_memory(self, channel, user):
+        self.release.wait(5)
+        self.warmed.append((channel, user))
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+
+
+class MemoryPrefetcherTests(unittest.TestCase):
+    def test_concurrency_limit_drops_requests_instead_of_blocking(self):
+        memory_mgr = _SlowMemoryManager()
+        prefetcher = MemoryPrefetcher(memory_mgr, max_concurrency=1)
+
+        self.assertTrue(prefetcher.prefetch("glorp", "moon", query="glorpinia lembra do Hades?"))
+        self.assertFalse(prefetcher.prefetch("glorp", "sun"))
+        memory_mgr.release.set()
+
+        for _ in range(50):
+            if memory_mgr.embedded:
+                break
+            threading.Event().wait(0.02)
+
+        self.assertEqual(memory_mgr.warmed, [("glorp", "moon")])
+        self.assertEqual(memory_mgr.embedded, ["glorpinia lembra do Hades?"])
+        self.assertEqual(prefetcher.stats["skipped_busy"], 1)
+        self.assertFalse(prefetcher.prefetch("glorp", "moon"))
+
+
+if __name__ == "__main__":
+    unittest.main()
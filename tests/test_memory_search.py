@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from glorpinia_bot.memory_manager import MemoryManager
+from glorpinia_bot.storage import close_store
+
+
+class SQLiteMemorySearchTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "memory.db")
+        os.environ["GLORPINIA_FORCE_SQLITE"] = "1"
+
+    def tearDown(self):
+        close_store(self.db_path)
+        os.environ.pop("GLORPINIA_FORCE_SQLITE", None)
+        self._tmpdir.cleanup()
+
+    def test_legacy_database_is_migrated_and_indexed(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE interactions (channel TEXT, user TEXT, query TEXT, response TEXT, ts TEXT)")
+        conn.execute(
+            "INSERT INTO interactions VALUES (?, ?, ?, ?, ?)",
+            ("glorp", "moon", "eu gosto de Elden Ring", "", datetime.now()),
+        )
+        conn.commit()
+        conn.close()
+
+        manager = MemoryManager(db_path=self.db_path)
+
+        self.assertEqual(
+            manager.search_memory("glorp", "moon", "você joga elden ring?"),
+            "- Memória sobre moon em glorp: eu gosto de Elden Ring",
+        )
+
+    def test_recent_memories_win_ties_and_other_users_are_ignored(self):
+        manager = MemoryManager(db_path=self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT INTO interactions (channel, user, query, response, ts) VALUES (?, ?, ?, ?, ?)",
+            [
+                ("glorp", "moon", "gosto de pizza velha", "", datetime.now() - timedelta(days=120)),
+                ("glorp", "moon", "gosto de pizza nova", "", datetime.now()),
+                ("glorp", "outro", "gosto de pizza", "", datetime.now()),
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+        result = manager.search_memory("glorp", "moon", "pizza", k=1)
+
+        self.assertEqual(result, "- Memória sobre moon em glorp: gosto de pizza nova")
+
+    def test_stale_emotion_signals_and_near_duplicates_are_dropped(self):
+        manager = MemoryManager(db_path=self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT INTO interactions (channel, user, query, response, ts) VALUES (?, ?, ?, ?, ?)",
+            [
+                ("glorp", "moon", "[emotion_signal] moon estava triste com o jogo", "", datetime.now() - timedelta(days=60)),
+                ("glorp", "moon", "[preference] moon gosta do jogo Hades", "", datetime.now() - timedelta(days=2)),
+                ("glorp", "moon", "[preference] moon gosta do jogo Hades!", "", datetime.now() - timedelta(days=1)),
+                ("glorp", "moon", "[fact] moon zerou o jogo Celeste", "", datetime.now() - timedelta(days=3)),
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+        result = manager.search_memory("glorp", "moon", "qual jogo?", k=2).splitlines()
+
+        self.assertEqual(len(result), 2)
+        self.assertIn("Hades!", result[0])
+        self.assertIn("Celeste", result[1])
+
+    def test_expired_memories_are_hidden_and_compacted(self):
+        manager = MemoryManager(db_path=self.db_path)
+        manager.save_user_memory("glorp", "moon", "[emotion_signal] moon está cansada do jogo", "", ttl_days=7)
+        manager.save_user_memory("glorp", "moon", "[fact] moon joga Hades", "", ttl_days=365)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "UPDATE interactions SET expires_at = ? WHERE memory_type = 'emotion_signal'",
+            ((datetime.now() - timedelta(days=1)).isoformat(),),
+        )
+        conn.commit()
+        conn.close()
+
+        self.assertNotIn("cansada", manager.search_memory("glorp", "moon", "cansada jogo"))
+
+        stats = manager.compact()
+
+        self.assertEqual(stats["deleted_rows"], 1)
+        conn = sqlite3.connect(self.db_path)
+        remaining = conn.execute("SELECT memory_type FROM interactions").fetchall()
+        conn.close()
+        self.assertEqual(remaining, [("fact",)])
+
+    def test_near_duplicate_memories_are_merged(self):
+        manager = MemoryManager(db_path=self.db_path)
+        manager.save_user_memory("glorp", "moon", "[preference] moon indicou uma preferência: gosto de Elden Ring", "")
+        manager.save_user_memory("glorp", "moon", "[preference] moon indicou uma preferência: eu gosto de Elden Ring!!", "")
+        manager.save_user_memory("glorp", "moon", "[preference] moon indicou uma preferência: gosto de pizza", "")
+
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT query, hits FROM interactions ORDER BY id").fetchall()
+        conn.close()
+
+        self.assertEqual([hits for _, hits in rows], [2, 1])
+        self.assertEqual(manager.dedup_stats, {"checked": 3, "merged": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
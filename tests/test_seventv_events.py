@@ -0,0 +1,197 @@
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+
+from glorpinia_bot.emote_manager import EmoteManager
+from glorpinia_bot.seventv_channel_sync import SevenTVChannelSync
+from glorpinia_bot.seventv_events import OP_DISPATCH, OP_HELLO, OP_SUBSCRIBE, SevenTVEventSubscriber
+from glorpinia_bot.storage import close_store
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class _FakeEventServer:
+    """Servidor WebSocket mínimo (um cliente) que fala o protocolo da EventAPI do 7TV."""
+
+    def __init__(self):
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.url = f"ws://127.0.0.1:{self._listener.getsockname()[1]}"
+        self.subscriptions = []
+        self._client = None
+        self._connected = threading.Event()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        client, _ = self._listener.accept()
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += client.recv(4096)
+        key = next(
+            line.split(":", 1)[1].strip()
+            for line in request.decode().split("\r\n")
+            if line.lower().startswith("sec-websocket-key")
+        )
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        client.sendall(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        self._client = client
+        self.send({"op": OP_HELLO, "d": {"heartbeat_interval": 10000, "session_id": "fake"}})
+        self._connected.set()
+        while True:
+            try:
+                message = self._read_frame()
+            except OSError:
+                return
+            if message is None:
+                return
+            payload = json.loads(message)
+            if payload.get("op") == OP_SUBSCRIBE:
+                self.subscriptions.append(payload["d"]["condition"]["object_id"])
+
+    def _recv_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self._client.recv(size - len(data))
+            if not chunk:
+                raise OSError("cliente desconectou")
+            data += chunk
+        return data
+
+    def _read_frame(self):
+        header = self._recv_exact(2)
+        opcode = header[0] & 0x0F
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self._recv_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self._recv_exact(8))[0]
+        mask = self._recv_exact(4)
+        data = bytes(b ^ mask[i % 4] for i, b in enumerate(self._recv_exact(length)))
+        return None if opcode == 0x8 else data.decode()
+
+    def send(self, payload):
+        data = json.dumps(payload).encode()
+        header = bytes([0x81])
+        if len(data) < 126:
+            header += bytes([len(data)])
+        else:
+            header += bytes([126]) + struct.pack(">H", len(data))
+        self._client.sendall(header + data)
+
+    def wait_connected(self, timeout=5):
+        return self._connected.wait(timeout)
+
+    def close(self):
+        if self._client:
+            self._client.close()
+        self._listener.close()
+
+
+def _wait_for(condition, timeout=5):
+    event = threading.Event()
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return True
+        event.wait(0.02)
+    return condition()
+
+
+class SevenTVEventTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self._tmpdir.name, "emotes.db")
+        bot = SimpleNamespace(emote_manager=EmoteManager(base_path="/nonexistent"))
+        bot.emote_manager.global_emote_map = {}
+        bot.emote_manager.channel_emote_map = {}
+        self.sync = SevenTVChannelSync(bot, cache_path=self.cache_path)
+        self.sync._refresh_set("glorp", [{"name": "PogU", "flags": 0}, {"name": "Sadge", "flags": 0}], set_id="set-1")
+        self.server = _FakeEventServer()
+
+    def tearDown(self):
+        self.subscriber.stop()
+        self.server.close()
+        close_store(self.cache_path)
+        self._tmpdir.cleanup()
+
+    def test_emote_set_updates_are_applied_incrementally(self):
+        self.subscriber = SevenTVEventSubscriber(self.sync, url=self.server.url)
+        self.subscriber.subscribe("set-1")
+        self.subscriber.start()
+        self.assertTrue(self.server.wait_connected())
+        self.assertTrue(_wait_for(lambda: self.server.subscriptions == ["set-1"]))
+
+        self.server.send({"op": OP_DISPATCH, "d": {"type": "emote_set.update", "body": {
+            "id": "set-1",
+            "pushed": [{"key": "emotes", "index": 2, "value": {"id": "a", "name": "KEKW", "flags": 0}}],
+            "pulled": [{"key": "emotes", "index": 1, "old_value": {"id": "b", "name": "Sadge", "flags": 0}}],
+            "updated": [{"key": "emotes", "index": 0,
+                         "old_value": {"id": "c", "name": "PogU", "flags": 0},
+                         "value": {"id": "c", "name": "PogOverlay", "flags": 256}}],
+        }}})
+
+        manager = self.sync.bot.emote_manager
+        self.assertTrue(_wait_for(lambda: self.subscriber.stats["applied"] == 1))
+        self.assertEqual(manager.channel_emote_map["glorp"], {"laugh": ["KEKW"], "hype": ["PogOverlay"]})
+        self.assertIn("PogOverlay", manager.zero_width_emotes)
+        cached = {entry["name"] for entry in self.sync._cached_sets["glorp"][1]}
+        self.assertEqual(cached, {"KEKW", "PogOverlay"})
+
+
+    def test_subscribe_during_session_handshake_is_not_lost(self):
+        subscriber = None
+
+        def connect(url):
+            import websocket
+
+            ws = websocket.create_connection(url, timeout=10)
+            original_send = ws.send
+
+            def send(payload):
+                original_send(payload)
+                # Outro set registrado no meio da leva inicial de assinaturas.
+                subscriber.subscribe("set-2")
+
+            ws.send = send
+            return ws
+
+        subscriber = self.subscriber = SevenTVEventSubscriber(self.sync, url=self.server.url, connect=connect)
+        subscriber.subscribe("set-1")
+        subscriber.start()
+        self.assertTrue(subscriber.connected.wait(5))
+        self.assertTrue(_wait_for(lambda: sorted(self.server.subscriptions) == ["set-1", "set-2"]))
+
+    def test_refetch_after_reconnect_drops_emotes_removed_while_offline(self):
+        self.subscriber = SevenTVEventSubscriber(self.sync, url=self.server.url)
+        manager = self.sync.bot.emote_manager
+        manager.load_from_seventv(None, {"hype": ["Overlay"]}, zero_width_names={"Overlay"})
+        self.sync._refresh_set(
+            "glorp",
+            [{"name": "PogU", "flags": 0}, {"name": "Sadge", "flags": 0}, {"name": "Overlay", "flags": 256}],
+            set_id="set-1",
+        )
+        self.assertIn("Sadge", manager.emote_index.all_emotes)
+
+        # O que a reconciliação busca depois da reconexão: o set encolheu.
+        self.sync._refresh_set("glorp", [{"name": "PogU", "flags": 0}], set_id="set-1")
+
+        channel_names = {name for names in manager.channel_emote_map["glorp"].values() for name in names}
+        self.assertEqual(channel_names, {"PogU"})
+        self.assertNotIn("Sadge", manager.emote_index.all_emotes)
+        # Overlay saiu do canal, mas continua zero-width no set global.
+        self.assertIn("Overlay", manager.zero_width_emotes)
+
+        manager.apply_seventv_diff(None, removed_names={"Overlay"})
+        self.assertNotIn("Overlay", manager.zero_width_emotes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from glorpinia_bot import emote_classifier, seventv_channel_sync
+from glorpinia_bot.emote_manager import EmoteManager
+from glorpinia_bot.seventv_channel_sync import GLOBAL_SET_KEY, SevenTVChannelSync
+from glorpinia_bot.storage import close_store
+
+
+class SevenTVCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self._tmpdir.name, "emotes.db")
+
+    def tearDown(self):
+        close_store(self.cache_path)
+        self._tmpdir.cleanup()
+
+    def _new_sync(self):
+        bot = SimpleNamespace(emote_manager=EmoteManager(base_path="/nonexistent"))
+        bot.emote_manager.global_emote_map = {}
+        bot.emote_manager.channel_emote_map = {}
+        return SevenTVChannelSync(bot, cache_path=self.cache_path)
+
+    def test_cached_sets_load_at_startup_and_unchanged_emotes_are_not_reclassified(self):
+        sync = self._new_sync()
+        sync._refresh_set("glorp", [{"name": "PogU", "flags": 0}, {"name": "Overlay", "flags": 256}])
+
+        restarted = self._new_sync()
+        self.assertEqual(restarted.load_cached_sets(["glorp"]), 1)
+        self.assertEqual(restarted.bot.emote_manager.channel_emote_map["glorp"]["hype"], ["PogU"])
+        self.assertIn("Overlay", restarted.bot.emote_manager.zero_width_emotes)
+        self.assertTrue(restarted._recently_synced("glorp"))
+        self.assertFalse(restarted._recently_synced(GLOBAL_SET_KEY))
+
+        with mock.patch.object(emote_classifier, "classify_emote_name", return_value="sad") as classify:
+            self.assertIsNone(restarted._refresh_set("glorp", [{"name": "Overlay", "flags": 256}, {"name": "PogU", "flags": 0}]))
+            restarted._refresh_set("glorp", [{"name": "PogU", "flags": 0}, {"name": "Sadge", "flags": 0}])
+
+        classify.assert_called_once_with("Sadge")
+
+    def test_bulk_sync_resolves_logins_in_batches_and_caches_ids_on_disk(self):
+        sync = self._new_sync()
+        sync.bot.auth = SimpleNamespace(client_id="client", access_token="token")
+        sync.http = _FakeHttp()
+        channels = [f"canal{i}" for i in range(150)]
+
+        sync.sync_channels_async(channels).join(timeout=10)
+
+        helix_calls = [params for url, params in sync.http.calls if url == seventv_channel_sync.TWITCH_USERS_URL]
+        self.assertEqual([len(params) for params in helix_calls], [100, 50])
+        self.assertEqual(sync.bot.emote_manager.channel_emote_map["canal149"]["hype"], ["PogU"])
+        self.assertIn("Sadge", sync.bot.emote_manager.global_emote_map["sad"])
+
+        restarted = self._new_sync()
+        restarted.bot.auth = sync.bot.auth
+        restarted.http = _FakeHttp()
+        self.assertEqual(restarted.resolve_twitch_user_ids(["Canal7", "canal8"]), {"canal7": "id-canal7", "canal8": "id-canal8"})
+        self.assertEqual(restarted.http.calls, [])
+
+
+class _FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class _FakeHttp:
+    """Twitch Helix + 7TV em memória; guarda (url, params) de cada chamada."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None, **kwargs):
+        self.calls.append((url, params))
+        if url == seventv_channel_sync.TWITCH_USERS_URL:
+            return _FakeResponse({"data": [{"id": f"id-{login}", "login": login} for _, login in params]})
+        if url == seventv_channel_sync.SEVENTV_GLOBAL_ALIAS_URL:
+            return _FakeResponse({"id": "global", "emotes": [{"name": "Sadge", "flags": 0}]})
+        twitch_id = url.rsplit("/", 1)[-1]
+        return _FakeResponse({"emote_set": {"id": f"set-{twitch_id}", "emotes": [{"name": "PogU", "flags": 0}]}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from glorpinia_bot.narrative.lexicon import LexiconMatcher
+from glorpinia_bot.narrative.social_dynamics import RecentUsers, SocialDynamicsEngine
+from glorpinia_bot.narrative.social_persistence import journal_path_for
+
+
+class SocialDynamicsTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.engine = SocialDynamicsEngine(Path(self._tmpdir.name) / "loops.json")
+        random.seed(5)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_profiles_expire_from_the_heap_at_the_same_point_as_a_full_scan(self):
+        self.engine.observe_message("glorp", "fa", "boa glorp mandou bem")
+        self.engine.observe_message("glorp", "lurker", "salve")
+        state = self.engine.channel_states["glorp"]
+        self.assertIn("fa", state.user_profiles)
+        self.assertNotIn("lurker", state.user_profiles)
+
+        profile = state.user_profiles["fa"]
+        expires_at = self.engine._profile_expiry_message(profile)
+        self.assertFalse(self.engine._is_profile_expired(profile, expires_at - 1))
+        self.assertTrue(self.engine._is_profile_expired(profile, expires_at))
+
+        while state.message_count < expires_at - 1:
+            self.engine.observe_message("glorp", "lurker", "salve")
+        self.assertIn("fa", state.user_profiles)
+        self.engine.observe_message("glorp", "lurker", "salve")
+        self.assertNotIn("fa", state.user_profiles)
+        self.assertLessEqual(len(state.expiry_heap), 2 * (len(state.user_profiles) + len(state.memory_loops)) + 64)
+
+    def test_chat_path_does_no_disk_io_and_journal_replays_after_restart(self):
+        storage = Path(self._tmpdir.name)
+        self.engine.observe_message("glorp", "fa", "boa glorp mandou bem")
+        self.engine.observe_message("glorp", "zoeiro", "kkkk zoeira glorp")
+        self.assertEqual(list(storage.iterdir()), [])
+
+        self.engine.persistence.flush()
+        profiles_path = self.engine._profile_storage_path_for_channel("glorp")
+        journal_path = journal_path_for(profiles_path)
+        self.assertFalse(profiles_path.exists())
+        self.assertTrue(journal_path.exists())
+        self.assertTrue(self.engine._storage_path_for_channel("glorp").exists())
+
+        self.engine.observe_message("glorp", "fa", "idiota")
+        self.engine.persistence.flush()
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write('{"u":"fa","p":{"positive')  # crash no meio de uma linha
+
+        restarted = SocialDynamicsEngine(storage / "loops.json")
+        expected = self.engine.channel_states["glorp"].user_profiles
+        self.assertEqual(restarted._get_channel_state("glorp").user_profiles.keys(), expected.keys())
+        self.assertEqual(
+            restarted._serialize_for_persistence("glorp", "profiles"),
+            self.engine._serialize_for_persistence("glorp", "profiles"),
+        )
+
+        restarted.persistence.journal_compact_lines = 1
+        restarted.observe_message("glorp", "zoeiro", "kkkk")
+        restarted.persistence.flush()
+        self.assertTrue(profiles_path.exists())
+        self.assertFalse(journal_path.exists())
+
+    def test_users_seen_is_bounded_and_time_windowed(self):
+        recent = RecentUsers(max_users=3, window_seconds=60)
+        for i, user in enumerate(["a", "b", "c", "d"]):
+            recent.add(user, now=1000 + i)
+        self.assertEqual(len(recent), 3)
+        self.assertNotIn("a", recent)
+        recent.add("b", now=1050)
+        recent.add("e", now=1064)
+        self.assertEqual([user for user, _ in recent.to_list()], ["b", "e"])
+
+    def test_idle_channel_is_hibernated_and_reloaded_on_next_message(self):
+        engine = SocialDynamicsEngine(Path(self._tmpdir.name) / "loops.json", idle_hibernate_seconds=0)
+        engine.observe_message("glorp", "fa", "boa glorp mandou bem")
+        engine.observe_message("glorp", "zoeiro", "kkkk zoeira glorp")
+        before = engine.channel_states["glorp"]
+        profiles = {user: vars(profile) for user, profile in before.user_profiles.items()}
+
+        self.assertEqual(engine.hibernate_idle_channels(), ["glorp"])
+        self.assertNotIn("glorp", engine.channel_states)
+        self.assertEqual(engine.memory_stats()["channels_hibernated"], 1)
+
+        engine.observe_message("glorp", "fa", "salve")
+        after = engine.channel_states["glorp"]
+        self.assertEqual(after.message_count, 3)
+        self.assertEqual(sorted(after.users_seen), ["fa", "zoeiro"])
+        self.assertEqual({user: vars(profile) for user, profile in after.user_profiles.items() if user != "fa"},
+                         {user: data for user, data in profiles.items() if user != "fa"})
+        self.assertEqual(engine.memory_stats()["channels_hibernated"], 0)
+
+    def test_lexicon_matches_whole_words_and_overlapping_phrases_in_one_pass(self):
+        lexicon = LexiconMatcher([
+            ("praise", "te amo"),
+            ("praise", "boa"),
+            ("second_person", "te"),
+            ("laughter", "/k{2,}/"),
+        ])
+        self.assertEqual(lexicon.categories("te amo glorp kkkk"), {"praise", "second_person", "laughter"})
+        self.assertEqual(lexicon.categories("a gente viu os boatos"), frozenset())
+        self.assertEqual(lexicon.categories("te odeio"), {"second_person"})
+
+        self.assertEqual(self.engine._infer_teasing_style("boatos de gente"), "neutral")
+        self.assertEqual(self.engine._infer_contextual_mood_event("você é idiota", "x", {"glorp"}), "angry")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from glorpinia_bot.storage import SQLiteStore
+
+
+class SQLiteStoreTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.store = SQLiteStore(os.path.join(self._tmpdir.name, "store.db"))
+        self.store.execute("CREATE TABLE counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def tearDown(self):
+        self.store.close()
+        self._tmpdir.cleanup()
+
+    def test_concurrent_writes_are_serialized_and_failed_jobs_roll_back_alone(self):
+        def bump(count):
+            for _ in range(count):
+                self.store.execute(
+                    "INSERT INTO counters VALUES ('hits', 1) ON CONFLICT(name) DO UPDATE SET value = value + 1"
+                )
+
+        threads = [threading.Thread(target=bump, args=(50,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+
+        def broken(conn):
+            conn.execute("INSERT INTO counters VALUES ('broken', 1)")
+            raise ValueError("falha proposital")
+
+        with self.assertRaises(ValueError):
+            self.store.transaction(broken)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.store.query("SELECT name, value FROM counters"), [("hits", 400)])
+        self.assertEqual(self.store.query_one("PRAGMA journal_mode")[0], "wal")
+        with self.assertRaises(sqlite3.OperationalError):
+            with self.store.reader() as conn:
+                conn.execute("DELETE FROM counters")
+
+
+if __name__ == "__main__":
+    unittest.main()
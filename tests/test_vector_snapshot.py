@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from glorpinia_bot import vector_snapshot
+
+
+class VectorSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmpdir.name, "memory_glorp_moon.vsnap")
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_roundtrip_and_overwrite_without_langchain(self):
+        vector_snapshot.write_snapshot(
+            self.path,
+            [[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]],
+            ["a", "b"],
+            ["Memória sobre moon em glorp: gosta de Hades", "Memória sobre moon em glorp: zerou Celeste"],
+            [{"memory_type": "preference"}, {"memory_type": "fact"}],
+        )
+        vector_snapshot.write_snapshot(
+            self.path,
+            [[0.5, 0.5, 0.5]],
+            ["c"],
+            ["Memória sobre moon em glorp: joga Hollow Knight"],
+            [{"memory_type": "fact", "hits": 2}],
+        )
+
+        manifest = vector_snapshot.read_manifest(self.path)
+        documents = list(vector_snapshot.iter_documents(self.path))
+
+        self.assertEqual((manifest["version"], manifest["count"], manifest["dim"]), (1, 1, 3))
+        self.assertEqual(
+            documents,
+            [("c", "Memória sobre moon em glorp: joga Hollow Knight", {"memory_type": "fact", "hits": 2})],
+        )
+        self.assertEqual(sorted(os.listdir(self._tmpdir.name)), ["memory_glorp_moon.vsnap"])
+
+    def test_truncated_vectors_are_rejected(self):
+        vector_snapshot.write_snapshot(self.path, [[1.0, 2.0]], ["a"], ["texto"], [{}])
+        with open(os.path.join(vector_snapshot.resolve_snapshot(self.path), vector_snapshot.VECTORS_FILE), "r+b") as f:
+            f.truncate(4)
+
+        with self.assertRaises(vector_snapshot.SnapshotError):
+            vector_snapshot.read_manifest(self.path)
+
+    def test_crash_before_publishing_keeps_the_previous_snapshot(self):
+        vector_snapshot.write_snapshot(self.path, [[1.0, 2.0]], ["a"], ["antigo"], [{}])
+        real_replace = os.replace
+
+        def crash_on_publish(src, dst):
+            if os.path.basename(dst) == vector_snapshot.CURRENT_FILE:
+                raise OSError("crash simulado")
+            real_replace(src, dst)
+
+        with mock.patch("os.replace", crash_on_publish), self.assertRaises(OSError):
+            vector_snapshot.write_snapshot(self.path, [[3.0, 4.0]], ["b"], ["novo"], [{}])
+
+        self.assertEqual([doc_id for doc_id, _, _ in vector_snapshot.iter_documents(self.path)], ["a"])
+        vector_snapshot.write_snapshot(self.path, [[3.0, 4.0]], ["b"], ["novo"], [{}])
+        self.assertEqual([doc_id for doc_id, _, _ in vector_snapshot.iter_documents(self.path)], ["b"])
+        self.assertEqual(len(os.listdir(self.path)), 2)
+
+    def test_leftover_from_interrupted_legacy_swap_is_recovered(self):
+        # Troca antiga em dois passos parada no meio: só sobrou `<path>.old-<pid>`.
+        staging = os.path.join(self._tmpdir.name, "staging.vsnap")
+        vector_snapshot.write_snapshot(staging, [[1.0, 2.0]], ["a"], ["memória antiga"], [{}])
+        os.replace(vector_snapshot.resolve_snapshot(staging), f"{self.path}.old-4242")
+        shutil.rmtree(staging)
+
+        self.assertTrue(vector_snapshot.is_snapshot(self.path))
+        self.assertEqual([text for _, text, _ in vector_snapshot.iter_documents(self.path)], ["memória antiga"])
+
+        vector_snapshot.write_snapshot(self.path, [[1.0, 2.0]], ["a"], ["memória antiga"], [{}])
+        self.assertEqual(sorted(os.listdir(self._tmpdir.name)), ["memory_glorp_moon.vsnap"])
+
+if __name__ == "__main__":
+    unittest.main()